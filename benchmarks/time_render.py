@@ -5,7 +5,7 @@ import os
 # god-awful hack to get data from the test recipes
 import sys
 
-from conda_build import api
+from conda_build import api, jinja_context
 
 _thisdir = os.path.dirname(__file__)
 sys.path.append(os.path.dirname(_thisdir))
@@ -36,3 +36,28 @@ def time_single_top_level_multi_output():
         finalize=False,
         bypass_env_check=True,
     )
+
+
+def time_top_level_variant_render_cold_template_cache():
+    # start from an empty cache, so the templates are compiled (once) during the render
+    jinja_context.template_cache.clear()
+    jinja_context._environments.clear()
+    api.render(
+        os.path.join(variant_dir, "02_python_version"),
+        finalize=False,
+        bypass_env_check=True,
+    )
+
+
+def time_top_level_variant_render_warm_template_cache():
+    # rendered once by setup, so the compiled templates are reused
+    api.render(
+        os.path.join(variant_dir, "02_python_version"),
+        finalize=False,
+        bypass_env_check=True,
+    )
+
+
+time_top_level_variant_render_warm_template_cache.setup = (
+    time_top_level_variant_render_cold_template_cache
+)
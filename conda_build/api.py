@@ -53,10 +53,32 @@ def render(
        templates evaluated.
 
     Returns a list of (metadata, need_download, need_reparse in env) tuples"""
-    from .render import render_metadata_tuples, render_recipe
+    from copy import deepcopy
+
+    from .render import (
+        load_cached_render,
+        render_cache_key,
+        render_metadata_tuples,
+        render_recipe,
+        store_cached_render,
+    )
 
     config = get_or_merge_config(config, **kwargs)
 
+    options = {
+        "permit_unsatisfiable_variants": permit_unsatisfiable_variants,
+        "finalize": finalize,
+        "bypass_env_check": bypass_env_check,
+    }
+    if config.render_cache:
+        # rendering changes the config (and maybe the variants), key the cache by
+        #   them as they were passed
+        cache_config = config.copy()
+        cache_variants = deepcopy(variants)
+        key = render_cache_key(recipe_path, cache_config, cache_variants, **options)
+        if key and (cached := load_cached_render(config, key)) is not None:
+            return cached
+
     metadata_tuples = render_recipe(
         recipe_path,
         bypass_env_check=bypass_env_check,
@@ -65,13 +87,19 @@ def render(
         variants=variants,
         permit_unsatisfiable_variants=permit_unsatisfiable_variants,
     )
-    return render_metadata_tuples(
+    metadata_tuples = render_metadata_tuples(
         metadata_tuples,
         config=config,
         permit_unsatisfiable_variants=permit_unsatisfiable_variants,
         finalize=finalize,
         bypass_env_check=bypass_env_check,
     )
+    # rendering may have indexed the local channel, key the result by the state it saw
+    if config.render_cache and (
+        key := render_cache_key(recipe_path, cache_config, cache_variants, **options)
+    ):
+        store_cached_render(config, key, metadata_tuples)
+    return metadata_tuples
 
 
 def output_yaml(
@@ -8,6 +8,7 @@ from __future__ import annotations
 
 import fnmatch
 import json
+import mmap
 import os
 import random
 import re
@@ -19,6 +20,8 @@ import sys
 import time
 import warnings
 from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack, nullcontext
 from os.path import dirname, isdir, isfile, islink, join
 from pathlib import Path
 from typing import TYPE_CHECKING
@@ -59,7 +62,7 @@ from .exceptions import (
     CondaBuildUserError,
     DependencyNeedsBuildingError,
 )
-from .index import _delegated_update_index, get_build_index
+from .index import _delegated_update_index, local_channel_index
 from .metadata import FIELDS, MetaData
 from .os_utils import external
 from .post import (
@@ -68,6 +71,7 @@ from .post import (
     post_build,
     post_process,
 )
+from .profiler import metadata_args, profiler, span
 from .render import (
     add_upstream_pins,
     bldpkg_path,
@@ -102,6 +106,7 @@ if on_win:
 
 if TYPE_CHECKING:
     from collections.abc import Iterable
+    from concurrent.futures import Future
     from typing import Any
 
 if "bsd" in sys.platform:
@@ -215,7 +220,7 @@ def chunks(line, n):
             yield line[start : i + 1]
         elif size > n:
             yield line[start : i + 1]
-            start = i
+            start = i + 1
             size = 0
 
 
@@ -225,6 +230,48 @@ def get_bytes_or_text_as_bytes(parent):
     return parent["text"].encode("utf-8")
 
 
+def _rg_json_matches(args, prefix):
+    """
+    Run one ``rg --json`` invocation and consume its events as they are written.
+
+    :return: rg's return code and, per matched file (relative to ``prefix``), whether rg
+             saw binary data in it and the ``(text, start, end)`` of every submatch
+    """
+    matches = {}
+    with subprocess.Popen(args, stdout=subprocess.PIPE, shell=False) as process:
+        for line in process.stdout:
+            event = json.loads(line)
+            if event["type"] not in ("match", "end"):
+                continue
+            data = event["data"]
+            filename = data["path"]["text"][len(prefix) + 1 :].replace(os.sep, "/")
+            if event["type"] == "match":
+                # Get stuff from the 'line' (to be consistent with the python version we ignore this).
+                # match_line = get_bytes_or_text_as_bytes(match['data']['lines'])
+                # match_line_number = match['data']['line_number']
+                offset = data["absolute_offset"]
+                spans = matches.setdefault(filename, [False, []])[1]
+                for submatch in data["submatches"]:
+                    spans.append(
+                        (
+                            get_bytes_or_text_as_bytes(submatch["match"]),
+                            submatch["start"] + offset,
+                            submatch["end"] + offset,
+                        )
+                    )
+            elif filename in matches:
+                # rg reads the whole file (--no-mmap) and reports the first NUL byte
+                matches[filename][0] = data.get("binary_offset") is not None
+    return process.returncode, matches
+
+
+def _submatch_key(submatch):
+    return tuple(
+        submatch[field]
+        for field in ("tag", "text", "start", "end", "regex_re", "replacement_re")
+    )
+
+
 def regex_files_rg(
     files,
     prefix,
@@ -235,17 +282,19 @@ def regex_files_rg(
     also_binaries=False,
     debug_this=False,
     match_records=OrderedDict(),
+    max_workers=None,
 ):
     # If we run out of space for args (could happen) we'll need to either:
     # 1. Batching the calls.
     # 2. Call for all (text?) files by passing just 'prefix' then filter out ones we don't care about (slow).
     # 3. Use a shell prefixed with `cd prefix && ` (could still hit size limits, just later).
-    # I have gone for batching!
+    # I have gone for batching! The batches are searched by concurrent rg processes.
     args_base = [
         rg.encode("utf-8"),
         b"--unrestricted",
         b"--no-heading",
         b"--with-filename",
+        b"--no-mmap",
         b"--json",
         regex_rg,
     ]
@@ -257,104 +306,51 @@ def regex_files_rg(
     file_lists = list(
         chunks(prefix_files, (32760 if utils.on_win else 131071) - args_len)
     )
+    if not file_lists:
+        return sort_matches(match_records)
+    all_args = []
     for file_list in file_lists:
         args = args_base[:] + file_list
-        # This will not work now our args are binary strings:
-        # from conda.utils import quote_for_shell
-        # print(quote_for_shell(args))
-        try:
-            if utils.on_win:
-                args = [a.decode("utf-8") for a in args]
-            matches = (
-                subprocess.check_output(args, shell=False).rstrip(b"\n").split(b"\n")
-            )
-            matches = b"[" + b",".join(matches) + b"]\n"
-            matches = json.loads(matches)
-        except subprocess.CalledProcessError as _:  # noqa
-            # Just means rg returned 1 as no matches were found.
-            continue
-        except Exception as e:
-            raise e
-        if matches:
-            stage = "pre-begin"
-            for match in matches:
-                new_stage = match["type"]
-                if new_stage == "begin":
-                    stage = new_stage
-                    match_filename_begin = match["data"]["path"]["text"][
-                        len(prefix) + 1 :
-                    ].replace(os.sep, "/")
-                    match_filename_type = "unknown"
-                    # TODO :: Speed this up, and generalise it, the python version does similar.
-                    with open(os.path.join(prefix, match_filename_begin), "rb") as fh:
-                        data = mmap_or_read(fh)
-                        match_filename_type = (
-                            "binary" if data.find(b"\x00") != -1 else "text"
-                        )
-                    assert match_filename_type != "unknown"
-                elif new_stage == "match":
-                    old_stage = stage
-                    assert stage == "begin" or stage == "match" or stage == "end"
-                    stage = new_stage
-                    match_filename = match["data"]["path"]["text"][
-                        len(prefix) + 1 :
-                    ].replace(os.sep, "/")
-                    # Get stuff from the 'line' (to be consistent with the python version we ignore this).
-                    # match_line = get_bytes_or_text_as_bytes(match['data']['lines'])
-                    # match_line_number = match['data']['line_number']
-                    # match_absolute_offset = match['data']['absolute_offset']
-                    if old_stage == "begin":
-                        assert match_filename_begin == match_filename, (
-                            f"{match_filename_begin} != \n {match_filename}"
-                        )
-                    if match_filename not in match_records:
-                        if debug_this:
-                            # We could add: #'line': match_line, 'line_number': match_line_number but it would
-                            # break our ability to compare against the python code.
-                            match_records[match_filename] = {
-                                "type": match_filename_type,
-                                "submatches": [],
-                            }
-                        else:
-                            match_records[match_filename] = {
-                                "type": match_filename_type,
-                                "submatches": [],
-                            }
-                    for submatch in match["data"]["submatches"]:
-                        submatch_match_text = get_bytes_or_text_as_bytes(
-                            submatch["match"]
-                        )
-                        submatch_start = (
-                            submatch["start"] + match["data"]["absolute_offset"]
-                        )
-                        submatch_end = (
-                            submatch["end"] + match["data"]["absolute_offset"]
-                        )
-                        # print("{}({}) :: {}..{} = {}".format(
-                        #       match_filename, match_line_number,
-                        #       submatch_start, submatch_end, submatch_match_text))
-                        submatch_record = {
-                            "tag": tag,
-                            "text": submatch_match_text,
-                            "start": submatch_start,
-                            "end": submatch_end,
-                            "regex_re": regex_rg,
-                            "replacement_re": replacement_re,
-                        }
-                        if (
-                            submatch_record
-                            not in match_records[match_filename]["submatches"]
-                        ):
-                            match_records[match_filename]["submatches"].append(
-                                submatch_record
-                            )
-                elif new_stage == "end":
-                    assert stage == "match"
-                    stage = new_stage
-                elif new_stage == "elpased_total":
-                    assert stage == "end"
-                    stage = new_stage
-                    print("ELAPSED TOTAL")
+        if utils.on_win:
+            args = [a.decode("utf-8") for a in args]
+        all_args.append(args)
+
+    # submatches already recorded, per file
+    seen = {}
+    max_workers = min(utils.get_max_workers(max_workers), len(all_args))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for returncode, matches in executor.map(
+            _rg_json_matches, all_args, [prefix] * len(all_args)
+        ):
+            if returncode != 0:
+                # Just means rg returned 1 as no matches were found.
+                continue
+            for match_filename, (binary, spans) in matches.items():
+                if binary and not also_binaries:
+                    continue
+                if match_filename not in match_records:
+                    match_records[match_filename] = {
+                        "type": "binary" if binary else "text",
+                        "submatches": [],
+                    }
+                submatches = match_records[match_filename]["submatches"]
+                if match_filename not in seen:
+                    seen[match_filename] = {
+                        _submatch_key(submatch) for submatch in submatches
+                    }
+                for text, start, end in spans:
+                    submatch_record = {
+                        "tag": tag,
+                        "text": text,
+                        "start": start,
+                        "end": end,
+                        "regex_re": regex_rg,
+                        "replacement_re": replacement_re,
+                    }
+                    key = _submatch_key(submatch_record)
+                    if key not in seen[match_filename]:
+                        seen[match_filename].add(key)
+                        submatches.append(submatch_record)
     return sort_matches(match_records)
 
 
@@ -366,6 +362,15 @@ def mmap_or_read(fh):
     return mm
 
 
+def _submatch_span(match):
+    """Return the ``(text, start, end)`` that is recorded for a regex match."""
+    g_index = len(match.groups())
+    if g_index == 0:
+        # Complete match.
+        return match.group(), match.start(), match.end()
+    return match.groups(g_index)[0], match.start(g_index), match.end(g_index)
+
+
 def regex_files_py(
     files,
     prefix,
@@ -401,16 +406,9 @@ def regex_files_py(
                     #                 match_records[file]['absolute_offset'],
                     #             )
                     #         )
-                    g_index = len(match.groups())
-                    if g_index == 0:
-                        # Complete match.
-                        submatch_match_text = match.group()
-                        submatch_start = match.start()
-                        submatch_end = match.end()
-                    else:
-                        submatch_match_text = match.groups(g_index)[0]
-                        submatch_start = match.start(g_index)
-                        submatch_end = match.end(g_index)
+                    submatch_match_text, submatch_start, submatch_end = _submatch_span(
+                        match
+                    )
                     # print("found {} ({}..{})".format(submatch_match_text, submatch_start, submatch_end))
                     match_records[file]["submatches"].append(
                         {
@@ -604,14 +602,144 @@ def rewrite_file_with_new_prefix(path, data, old_prefix, new_prefix):
     return data
 
 
-def perform_replacements(matches, prefix, verbose=False, diff=None):
+def _replacement_spans(filename, match):
+    """
+    Compute the ``(start, end, original, new_string)`` of every submatch of ``match``.
+
+    Binary replacements are padded with NUL bytes to the length of the original text.
+    """
+    spans = []
+    for submatch in sorted(match["submatches"], key=lambda x: x["start"]):
+        original = submatch["text"]
+        # Ideally you wouldn't pass to this function any submatches with replacement_re of None,
+        # Still, it's easily handled.
+        if submatch["replacement_re"]:
+            replacement_re = submatch["replacement_re"]
+            if not isinstance(replacement_re, (bytes, bytearray)):
+                replacement_re = replacement_re.encode("utf-8")
+            new_string = re.sub(submatch["regex_re"], replacement_re, original)
+        else:
+            new_string = original
+        if match["type"] == "binary":
+            if len(original) < len(new_string):
+                print(
+                    f"ERROR :: Cannot replace {original} with {new_string} in binary file {filename}"
+                )
+            new_string = new_string.ljust(len(original), b"\0")
+            assert len(new_string) == len(original)
+        spans.append(
+            (submatch["start"], submatch["start"] + len(original), original, new_string)
+        )
+    return spans
+
+
+def _writev_all(fd, segments):
+    """Write all ``segments`` to ``fd`` with as few ``writev`` calls as possible."""
+    if not hasattr(os, "writev"):
+        for segment in segments:
+            os.write(fd, segment)
+        return
+    try:
+        iov_max = os.sysconf("SC_IOV_MAX")
+    except (AttributeError, ValueError, OSError):
+        iov_max = 1024
+    segments = [memoryview(segment) for segment in segments if len(segment)]
+    while segments:
+        batch = segments[:iov_max]
+        written = os.writev(fd, batch)
+        # drop what was written, writev may stop short
+        done = 0
+        while done < len(batch) and written >= len(batch[done]):
+            written -= len(batch[done])
+            done += 1
+        segments = segments[done:]
+        if written:
+            segments[0] = segments[0][written:]
+
+
+def _replace_in_file(prefix, file, match, diff=None):
+    """
+    Apply all replacements of ``match`` to ``file`` in a single pass.
+
+    Equal length replacements (which includes every binary replacement) are patched
+    in place through a writable mmap. Otherwise the unchanged slices and the new strings
+    are written to a temporary file with ``writev``, which then replaces the original.
+    """
+    filename = os.path.join(prefix, file)
+    filename_short = filename.replace(prefix + os.sep, "")
+    spans = _replacement_spans(filename, match)
+    st = os.stat(filename)
+    # hardlinked files are rewritten instead so the other links do not change with them
+    in_place = (
+        not diff
+        and st.st_size
+        and st.st_nlink == 1
+        and all(len(original) == len(new) for _, _, original, new in spans)
+    )
+    if in_place:
+        with open(filename, "r+b") as fh:
+            mm = utils.mmap_mmap(fh.fileno(), 0, flags=utils.mmap_MAP_SHARED)
+            try:
+                for start, end, original, new_string in spans:
+                    if match["type"] == "binary":
+                        assert mm[start:end] == original
+                    if new_string != original:
+                        mm[start:end] = new_string
+                mm.flush()
+            finally:
+                mm.close()
+        return None
+
+    filename_tmp = filename + ".cbpatch.tmp"
+    if os.path.exists(filename_tmp):
+        os.unlink(filename_tmp)
+    with open(filename, "rb") as fh:
+        data = mmap_or_read(fh) if st.st_size else b""
+        view = memoryview(data)
+        try:
+            segments = []
+            last_index = 0
+            for start, end, original, new_string in spans:
+                assert start >= last_index
+                if match["type"] == "binary":
+                    # discarded (but also verified)
+                    assert data[start:end] == original
+                segments.append(view[last_index:start])
+                segments.append(new_string)
+                last_index = end
+            # Write the remainder.
+            segments.append(view[last_index:])
+            fd = os.open(filename_tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            try:
+                _writev_all(fd, segments)
+            finally:
+                os.close(fd)
+        finally:
+            del segments
+            view.release()
+            if isinstance(data, mmap.mmap):
+                data.close()
+    shutil.copymode(filename, filename_tmp)
+
+    diffo = None
+    if diff and match["type"] == "text":
+        diffo = f"Diff returned no difference after patching {filename_short}"
+        # Always expect an exception.
+        try:
+            diffo = subprocess.check_output(
+                [diff, "-urN", filename, filename_tmp], stderr=subprocess.PIPE
+            )
+            print(f'WARNING :: Non-deferred patching of "{filename}" did not change it')
+        except subprocess.CalledProcessError as e:
+            diffo = e.output
+        diffo = diffo.decode("utf-8")
+    os.replace(filename_tmp, filename)
+    return diffo
+
+
+def perform_replacements(matches, prefix, verbose=False, diff=None, max_workers=None):
     for file, match in matches.items():
-        filename = os.path.join(prefix, file)
-        filename_tmp = filename + ".cbpatch.tmp"
-        if os.path.exists(filename_tmp):
-            os.unlink()
-        shutil.copy2(filename, filename_tmp)
-        filename_short = filename.replace(prefix + os.sep, "")
+        filename_short = os.path.join(prefix, file).replace(prefix + os.sep, "")
         print(
             "Patching '{}' in {} {}".format(
                 filename_short,
@@ -619,62 +747,20 @@ def perform_replacements(matches, prefix, verbose=False, diff=None):
                 "places" if len(match["submatches"]) > 1 else "place",
             )
         )
-        with open(filename_tmp, "wb+") as file_tmp:
-            file_tmp.truncate()
-            with open(filename, "rb") as file:
-                last_index = 0
-                for submatch in match["submatches"]:
-                    length = submatch["start"] - last_index
-                    data = file.read(length)
-                    assert len(data) == length
-                    file_tmp.write(data)
-                    original = submatch["text"]
-                    # Ideally you wouldn't pass to this function any submatches with replacement_re of None,
-                    # Still, it's easily handled.
-                    if submatch["replacement_re"]:
-                        replacement_re = submatch["replacement_re"]
-                        if not isinstance(replacement_re, (bytes, bytearray)):
-                            replacement_re = replacement_re.encode("utf-8")
-                        new_string = re.sub(
-                            submatch["regex_re"], replacement_re, original
-                        )
-                    else:
-                        new_string = original
-                    if match["type"] == "binary":
-                        if len(original) < len(new_string):
-                            print(
-                                f"ERROR :: Cannot replace {original} with {new_string} in binary file {filename}"
-                            )
-                        new_string = new_string.ljust(len(original), b"\0")
-                        assert len(new_string) == len(original)
-                    file_tmp.write(new_string)
-                    # discarded (but also verified)
-                    actual_original = file.read(len(original))
-                    if match["type"] == "binary":
-                        assert actual_original == original
-                    last_index += length + len(original)
-                    if submatch == match["submatches"][len(match["submatches"]) - 1]:
-                        # Write the remainder.
-                        data = file.read()
-                        file_tmp.write(data)
-        # Could assert the lengths of binaries are the same here for extra safety.
-        if os.path.exists(filename_tmp):
-            if diff and match["type"] == "text":
-                diffo = f"Diff returned no difference after patching {filename_short}"
-                # Always expect an exception.
-                try:
-                    diffo = subprocess.check_output(
-                        [diff, "-urN", filename, filename_tmp], stderr=subprocess.PIPE
-                    )
-                    print(
-                        f'WARNING :: Non-deferred patching of "{filename}" did not change it'
-                    )
-                except subprocess.CalledProcessError as e:
-                    diffo = e.output
-                print(diffo.decode("utf-8"))
-            if os.path.exists(filename):
-                os.unlink(filename)
-            shutil.move(filename_tmp, filename)
+    if not matches:
+        return
+    # every file is rewritten independently
+    max_workers = min(utils.get_max_workers(max_workers), len(matches))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for diffo in executor.map(
+            _replace_in_file,
+            [prefix] * len(matches),
+            matches.keys(),
+            matches.values(),
+            [diff] * len(matches),
+        ):
+            if diffo is not None:
+                print(diffo)
 
 
 def _copy_top_level_recipe(path, config, dest_dir, destination_subdir=None):
@@ -1006,6 +1092,188 @@ def get_all_replacements(variant):
     return repl
 
 
+class _PrefixFileScanner:
+    """
+    Single-pass scanner run (possibly in a worker process) by :func:`scan_prefix_files`.
+
+    Each file is mmap'd once and classified as text or binary, searched for the prefix
+    variants and searched for every replacement regex whose glob patterns matched it.
+    """
+
+    def __init__(self, prefix, prefix_re, replacement_res, ignore_types):
+        self.prefix = prefix
+        self.prefix_re = prefix_re
+        self.replacement_res = replacement_res
+        self.ignore_types = ignore_types
+
+    def __call__(self, job):
+        filename, search_prefix, replacement_indices = job
+        prefixes = set()
+        submatches = []
+        with open(join(self.prefix, filename), "rb") as fh:
+            if not os.fstat(fh.fileno()).st_size:
+                return FileMode.text.name, prefixes, submatches
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                mode = (
+                    FileMode.binary.name
+                    if data.find(b"\x00") != -1
+                    else FileMode.text.name
+                )
+                if search_prefix and mode not in self.ignore_types:
+                    for match in self.prefix_re.finditer(data):
+                        prefixes.add(_submatch_span(match)[0])
+                # replacements are never applied to binaries
+                if mode == FileMode.text.name:
+                    for index in replacement_indices:
+                        for match in self.replacement_res[index].finditer(data):
+                            submatches.append((index, *_submatch_span(match)))
+        return mode, prefixes, submatches
+
+
+# below this many files the cost of starting worker processes outweighs the scan itself
+_PARALLEL_SCAN_MIN_FILES = 256
+
+
+def scan_prefix_files(
+    files,
+    prefix,
+    prefix_re,
+    prefix_files,
+    replacements,
+    ignore_types=(),
+    max_workers=None,
+    rg=None,
+    debug=False,
+):
+    """
+    Scan files for the prefix and for all replacement regexes, reading each file once.
+
+    With ``rg``, files are searched by ripgrep instead (once per regex, see
+    :func:`have_regex_files`), which honours the ``regex_rg`` pre-filter of replacements
+    and, with ``debug``, cross-checks ripgrep against the Python scanner.
+
+    :param files: Sorted filenames (relative to ``prefix``) to consider
+    :param prefix: Prefix in which to search for these files
+    :param prefix_re: The regex (bytes) matching every prefix variant
+    :param prefix_files: Filenames that should be searched for ``prefix_re``
+    :param replacements: The ``all_replacements`` entries (see :func:`get_all_replacements`)
+    :param ignore_types: File modes (text/binary) that are never searched for the prefix
+    :param max_workers: Size of the worker pool (see :func:`utils.get_max_workers`)
+    :param rg: Path to the ripgrep executable, if it should be used
+    :param debug: Check the matches (see :func:`check_matches`)
+    :return: tuple of ``(files_with_prefix, match_records)``, matching what
+             :func:`have_regex_files` produces for the prefix and the replacements
+    """
+    if rg:
+        return _scan_prefix_files_rg(
+            files, prefix, prefix_re, prefix_files, replacements, ignore_types, debug
+        )
+
+    prefix_files = set(prefix_files)
+    replacement_res = []
+    for replacement in replacements:
+        regex_re = replacement["regex_re"] or replacement.get("regex_rg")
+        if not isinstance(regex_re, (bytes, bytearray)):
+            regex_re = regex_re.encode("utf-8")
+        replacement_res.append(re.compile(regex_re))
+
+    jobs = []
+    for file in files:
+        replacement_indices = tuple(
+            index
+            for index, replacement in enumerate(replacements)
+            if any(
+                fnmatch.fnmatch(file, pattern)
+                for pattern in replacement["glob_patterns"]
+            )
+        )
+        if file in prefix_files or replacement_indices:
+            jobs.append((file, file in prefix_files, replacement_indices))
+
+    scanner = _PrefixFileScanner(
+        prefix, re.compile(prefix_re), replacement_res, frozenset(ignore_types)
+    )
+    max_workers = min(utils.get_max_workers(max_workers), len(jobs))
+    if max_workers > 1 and len(jobs) >= _PARALLEL_SCAN_MIN_FILES:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(
+                executor.map(
+                    scanner, jobs, chunksize=max(1, len(jobs) // (max_workers * 4))
+                )
+            )
+    else:
+        results = [scanner(job) for job in jobs]
+
+    files_with_prefix = []
+    match_records = OrderedDict()
+    for (file, _, _), (mode, prefixes, submatches) in zip(jobs, results):
+        files_with_prefix.extend((pfx.decode("utf-8"), mode, file) for pfx in prefixes)
+        if submatches:
+            match_records[file] = {
+                "type": mode,
+                "submatches": [
+                    {
+                        "tag": replacements[index]["tag"],
+                        "text": text,
+                        "start": start,
+                        "end": end,
+                        "regex_re": replacement_res[index].pattern,
+                        "replacement_re": replacements[index]["replacement_re"],
+                    }
+                    for index, text, start, end in submatches
+                ],
+            }
+    if debug:
+        check_matches(prefix, match_records)
+    return sorted(files_with_prefix), sort_matches(match_records)
+
+
+def _scan_prefix_files_rg(
+    files, prefix, prefix_re, prefix_files, replacements, ignore_types, debug
+):
+    """The ripgrep backend of :func:`scan_prefix_files`."""
+    prefix_files = set(prefix_files)
+    pfx_matches = have_regex_files(
+        [file for file in files if file in prefix_files],
+        prefix=prefix,
+        tag="prefix",
+        regex_re=prefix_re,
+        # prefix matches are never replaced here, only recorded
+        replacement_re=None,
+        also_binaries=True,
+        match_records={},
+        debug=debug,
+    )
+    files_with_prefix = [
+        (pfx.decode("utf-8"), match["type"], filename)
+        for filename, match in pfx_matches.items()
+        if match["type"] not in ignore_types
+        for pfx in {submatch["text"] for submatch in match["submatches"]}
+    ]
+
+    match_records = OrderedDict()
+    for replacement in replacements:
+        match_records = have_regex_files(
+            files=[
+                file
+                for file in files
+                if any(
+                    fnmatch.fnmatch(file, pattern)
+                    for pattern in replacement["glob_patterns"]
+                )
+            ],
+            prefix=prefix,
+            tag=replacement["tag"],
+            regex_re=replacement["regex_re"] or replacement.get("regex_rg"),
+            replacement_re=replacement["replacement_re"],
+            match_records=match_records,
+            regex_rg=replacement.get("regex_rg"),
+            debug=debug,
+        )
+    return sorted(files_with_prefix), sort_matches(match_records)
+
+
+@span("scan_prefix", "post")
 def get_files_with_prefix(m, replacements, files_in, prefix):
     import time
 
@@ -1022,23 +1290,13 @@ def get_files_with_prefix(m, replacements, files_in, prefix):
         "build/detect_binary_files_with_prefix", True if not utils.on_win else False
     ) and not m.get_value("build/binary_has_prefix_files", None):
         ignore_types.update((FileMode.binary.name,))
-    files_with_prefix = [
-        (
-            None,
-            FileMode.binary.name
-            if open(os.path.join(prefix, f), "rb+").read().find(b"\x00") != -1
-            else FileMode.text.name,
-            f,
-        )
+    ignore_files = set(ignore_files)
+    prefix_files = [
+        f
         for f in files
+        if f not in ignore_files
+        and not prefix_replacement_excluded(os.path.join(prefix, f))
     ]
-    ignore_files.extend(
-        f[2]
-        for f in files_with_prefix
-        if (f[1] in ignore_types and f[2] not in ignore_files)
-        or prefix_replacement_excluded(os.path.join(prefix, f[2]))
-    )
-    files_with_prefix = [f for f in files_with_prefix if f[2] not in ignore_files]
 
     prefix_u = prefix.replace("\\", "/") if utils.on_win else prefix
     # If we've cross compiled on Windows to unix, chances are many files will refer to Windows
@@ -1062,62 +1320,22 @@ def get_files_with_prefix(m, replacements, files_in, prefix):
         + b"|".join(v.encode("utf-8").replace(b"\\", b"\\\\") for v in pfx_variants)
         + b")"
     )
-    pfx_matches = have_regex_files(
-        [f[2] for f in files_with_prefix],
-        prefix=prefix,
-        tag="prefix",
-        regex_re=re_test,
-        # We definitely do not want this as a replacement_re as it'd replace
-        # /opt/anaconda1anaconda2anaconda3 with the prefix. As it happens we
-        # do not do any replacement at all here.
-        # replacement_re=prefix.encode('utf-8').replace(b'\\', b'\\\\'),
-        replacement_re=None,
-        also_binaries=True,
-        match_records={},
+    # Without ripgrep, the prefix variants and every replacement are found in a single
+    # read of each file. Prefix matches are never replaced here, only recorded.
+    files_with_prefix, all_matches = scan_prefix_files(
+        files,
+        prefix,
+        prefix_re=re_test,
+        prefix_files=prefix_files,
+        replacements=replacements,
+        ignore_types=ignore_types,
+        rg=external.find_executable("rg"),
         debug=m.config.debug,
     )
-    prefixes_for_file = {}
-    # This is for Windows mainly, though we may want to allow multiple searches at once in a file on
-    # all OSes some-day. It  is harmless to do this on all systems anyway.
-    for filename, match in pfx_matches.items():
-        prefixes_for_file[filename] = {sm["text"] for sm in match["submatches"]}
-    files_with_prefix_new = []
-    for _, mode, filename in files_with_prefix:
-        np = filename
-        if np in prefixes_for_file and np in pfx_matches:
-            for pfx in prefixes_for_file[np]:
-                files_with_prefix_new.append((pfx.decode("utf-8"), mode, filename))
-    files_with_prefix = files_with_prefix_new
-    all_matches = {}
-
-    # variant = m.config.variant if 'replacements' in m.config.variant else m.config.variants
-    replacement_tags = ""
-    if len(replacements):
-        last = len(replacements) - 1
-        for index, replacement in enumerate(replacements):
-            all_matches = have_regex_files(
-                files=[
-                    file
-                    for file in files
-                    if any(
-                        fnmatch.fnmatch(file, pattern)
-                        for pattern in replacement["glob_patterns"]
-                    )
-                ],
-                prefix=prefix,
-                tag=replacement["tag"],
-                regex_re=replacement["regex_re"],
-                replacement_re=replacement["replacement_re"],
-                match_records=all_matches,
-                regex_rg=replacement["regex_rg"] if "regex_rg" in replacement else None,
-                debug=m.config.debug,
-            )
-            replacement_tags = (
-                replacement_tags
-                + '"'
-                + replacement["tag"]
-                + ('"' if index == last else '", ')
-            )
+
+    replacement_tags = ", ".join(
+        f'"{replacement["tag"]}"' for replacement in replacements
+    )
     perform_replacements(all_matches, prefix)
     end = time.time()
     total_replacements = sum(
@@ -1132,7 +1350,7 @@ def get_files_with_prefix(m, replacements, files_in, prefix):
             end - start,
         )
     )
-    return sorted(files_with_prefix)
+    return files_with_prefix
 
 
 def record_prefix_files(m, files_with_prefix):
@@ -1546,45 +1764,48 @@ def _recurse_symlink_to_size(path, seen=None):
     return 0
 
 
+@span("hash_files", "post")
 def build_info_files_json_v1(m, prefix, files, files_with_prefix):
     no_link_files = m.get_value("build/no_link")
     files_json = []
-    files_inodes = get_inodes(files, prefix)
+    # first entry wins, as in has_prefix()
+    prefix_for_file = {}
+    for prefix_placeholder, file_mode, filename in files_with_prefix:
+        prefix_for_file.setdefault(filename, (prefix_placeholder, file_mode))
+    lstats = {fi: os.lstat(join(prefix, fi)) for fi in files}
+    inode_paths = {}
+    for fi in files:
+        inode_paths.setdefault(lstats[fi].st_ino, []).append(fi)
+    file_hash_cache = utils.FileHashCache(m.config.file_hash_cache)
+    checksums = file_hash_cache.sha256_checksums(join(prefix, fi) for fi in files)
     for fi in sorted(files):
-        prefix_placeholder, file_mode = has_prefix(fi, files_with_prefix)
+        prefix_placeholder, file_mode = prefix_for_file.get(fi, (None, None))
         path = os.path.join(prefix, fi)
+        st = lstats[fi]
         short_path = get_short_path(m, fi)
         if short_path:
             short_path = short_path.replace("\\", "/").replace("\\\\", "/")
         file_info = {
             "_path": short_path,
-            "sha256": utils.sha256_checksum(path),
-            "path_type": path_type(path),
+            "sha256": checksums[path],
+            "path_type": PathType.softlink
+            if stat.S_ISLNK(st.st_mode)
+            else PathType.hardlink,
         }
         if file_info["path_type"] == PathType.hardlink:
-            file_info["size_in_bytes"] = os.stat(path).st_size
+            file_info["size_in_bytes"] = st.st_size
         elif file_info["path_type"] == PathType.softlink:
             file_info["size_in_bytes"] = _recurse_symlink_to_size(path)
-        elif isdir(path):
-            file_info["size_in_bytes"] = 0
         no_link = is_no_link(no_link_files, fi)
         if no_link:
             file_info["no_link"] = no_link
         if prefix_placeholder and file_mode:
             file_info["prefix_placeholder"] = prefix_placeholder
             file_info["file_mode"] = file_mode
-        if (
-            file_info.get("path_type") == PathType.hardlink
-            and os.stat(path).st_nlink > 1
-        ):
-            target_short_path_inode = get_inode(path)
-            inode_paths = [
-                files[index]
-                for index, ino in enumerate(files_inodes)
-                if ino == target_short_path_inode
-            ]
-            file_info["inode_paths"] = inode_paths
+        if file_info["path_type"] == PathType.hardlink and st.st_nlink > 1:
+            file_info["inode_paths"] = inode_paths[st.st_ino]
         files_json.append(file_info)
+    file_hash_cache.save()
     return files_json
 
 
@@ -1617,13 +1838,19 @@ def create_info_files_json_v1(m, info_dir, prefix, files, files_with_prefix):
     return checksums
 
 
-def post_process_files(m: MetaData, initial_prefix_files):
+def post_process_files(
+    m: MetaData,
+    initial_prefix_files,
+    prefix_snapshot: utils.PrefixSnapshot | None = None,
+):
     package_name = m.name()
     host_prefix = m.config.host_prefix
-    missing = []
-    for f in initial_prefix_files:
-        if not os.path.exists(os.path.join(host_prefix, f)):
-            missing.append(f)
+    # each step below may add or remove files, the snapshot only re-scans what changed
+    if prefix_snapshot is None:
+        prefix_snapshot = utils.PrefixSnapshot(host_prefix)
+    else:
+        prefix_snapshot.refresh()
+    missing = [f for f in initial_prefix_files if f not in prefix_snapshot.files]
     if len(missing):
         log = utils.get_logger(__name__)
         log.warning(
@@ -1639,7 +1866,7 @@ def post_process_files(m: MetaData, initial_prefix_files):
     # this is new-style noarch, with a value of 'python'
     if m.noarch != "python":
         utils.create_entry_points(m.get_value("build/entry_points"), config=m.config)
-    current_prefix_files = utils.prefix_files(prefix=host_prefix)
+    current_prefix_files = prefix_snapshot.refresh().files
 
     python = (
         m.config.build_python
@@ -1658,7 +1885,7 @@ def post_process_files(m: MetaData, initial_prefix_files):
     )
 
     # The post processing may have deleted some files (like easy-install.pth)
-    current_prefix_files = utils.prefix_files(prefix=host_prefix)
+    current_prefix_files = prefix_snapshot.refresh().files
     new_files = sorted(current_prefix_files - initial_prefix_files)
 
     # filter_files will remove .git, trash directories, and conda-meta directories
@@ -1685,7 +1912,7 @@ def post_process_files(m: MetaData, initial_prefix_files):
         # For non noarch: python ones, we don't need to handle entry points in a special way.
         noarch_python.populate_files(m, pkg_files, host_prefix, [])
 
-    current_prefix_files = utils.prefix_files(prefix=host_prefix)
+    current_prefix_files = prefix_snapshot.refresh().files
     new_files = current_prefix_files - initial_prefix_files
     fix_permissions(new_files, host_prefix)
 
@@ -1698,6 +1925,7 @@ def bundle_conda(
     env,
     stats,
     new_prefix_files: set[str] = set(),
+    package_queue: PackageQueue | None = None,
     **kw,
 ):
     log = utils.get_logger(__name__)
@@ -1714,6 +1942,9 @@ def bundle_conda(
     # Use script from recipe?
     script = utils.ensure_list(metadata.get_value("build/script", None))
 
+    # walked once up front, then refreshed incrementally by each step below
+    prefix_snapshot = None
+
     # need to treat top-level stuff specially.  build/script in top-level stuff should not be
     #     re-run for an output with a similar name to the top-level recipe
     is_output = "package:" not in metadata.get_recipe_text()
@@ -1767,7 +1998,8 @@ def bundle_conda(
         else:
             args = interpreter.split(" ")
 
-        initial_files = utils.prefix_files(metadata.config.host_prefix)
+        prefix_snapshot = utils.PrefixSnapshot(metadata.config.host_prefix)
+        initial_files = set(prefix_snapshot.files)
         env_output = env.copy()
         env_output["TOP_PKG_NAME"] = env["PKG_NAME"]
         env_output["TOP_PKG_VERSION"] = env["PKG_VERSION"]
@@ -1835,7 +2067,11 @@ def bundle_conda(
                 os.path.normpath(pth)
                 for pth in utils.expand_globs(files, metadata.config.host_prefix)
             }
-        pfx_files = set(utils.prefix_files(metadata.config.host_prefix))
+        if prefix_snapshot is None:
+            prefix_snapshot = utils.PrefixSnapshot(metadata.config.host_prefix)
+        else:
+            prefix_snapshot.refresh()
+        pfx_files = prefix_snapshot.files
         initial_files = {
             item
             for item in (pfx_files - keep_files)
@@ -1873,7 +2109,8 @@ def bundle_conda(
                         f"to the host requirements section.  See {link} for more "
                         "info."
                     )
-        initial_files = set(utils.prefix_files(metadata.config.host_prefix))
+        prefix_snapshot = utils.PrefixSnapshot(metadata.config.host_prefix)
+        initial_files = set(prefix_snapshot.files)
 
     for pat in metadata.always_include_files():
         has_matches = False
@@ -1886,7 +2123,7 @@ def bundle_conda(
             log.warning(
                 "Glob %s from always_include_files does not match any files", pat
             )
-    files = post_process_files(metadata, initial_files)
+    files = post_process_files(metadata, initial_files, prefix_snapshot)
 
     if output.get("name") and output.get("name") != "conda":
         assert "bin/conda" not in files and "Scripts/conda.exe" not in files, (
@@ -1906,14 +2143,11 @@ def bundle_conda(
         )
 
     # here we add the info files into the prefix, so we want to re-collect the files list
-    prefix_files = set(utils.prefix_files(metadata.config.host_prefix))
     files = utils.filter_files(
-        prefix_files - initial_files, prefix=metadata.config.host_prefix
+        prefix_snapshot.refresh() - initial_files, prefix=metadata.config.host_prefix
     )
 
     basename = "-".join([output["name"], metadata.version(), metadata.build_id()])
-    tmp_archives = []
-    final_outputs = []
     cph_kwargs = {}
     ext = CondaPkgFormat.V1.ext
     if (
@@ -1926,20 +2160,112 @@ def bundle_conda(
             "zstd",
             f"zstd:compression-level={metadata.config.zstd_compression_level}",
         )
+    try:
+        crossed_subdir = metadata.config.target_subdir
+    except AttributeError:
+        crossed_subdir = metadata.config.host_subdir
+    subdir = "noarch" if (metadata.noarch or metadata.noarch_python) else crossed_subdir
+    if metadata.config.output_folder:
+        output_folder = os.path.join(metadata.config.output_folder, subdir)
+    else:
+        output_folder = os.path.join(
+            os.path.dirname(metadata.config.bldpkgs_dir), subdir
+        )
+    checks_to_ignore = None
+    if getattr(metadata.config, "verify", False):
+        checks_to_ignore = (
+            utils.ensure_list(metadata.config.ignore_verify_codes)
+            + metadata.ignore_verify_codes()
+        )
+
+    # clean out host prefix so that this output's files don't interfere with other outputs
+    #   We have a backup of how things were before any output scripts ran.  That's
+    #   restored elsewhere.
+    prefix = metadata.config.host_prefix
+    if metadata.config.keep_old_work:
+        moved_prefix = os.path.join(
+            os.path.dirname(prefix),
+            "_".join(("_h_env_moved", metadata.dist(), metadata.config.host_subdir)),
+        )
+    else:
+        moved_prefix = None
+
+    if package_queue is None:
+        with span("compress", "package", output=metadata.name()):
+            final_outputs = create_package(
+                prefix,
+                files,
+                basename + ext,
+                output_folder,
+                metadata.config,
+                cph_kwargs=cph_kwargs,
+                checks_to_ignore=checks_to_ignore,
+            )
+        for final_output in final_outputs:
+            local_channel_index.add(final_output)
+        if moved_prefix:
+            shutil_move_more_retrying(prefix, moved_prefix, "host env")
+        else:
+            utils.rm_rf(prefix)
+    else:
+        # Everything from here on only needs this output's files, so stage them by moving
+        #   the host prefix out of the way and let the packaging pool compress and verify
+        #   them while the next output is built.
+        staged_prefix = moved_prefix or os.path.join(
+            os.path.dirname(prefix),
+            "_".join(("_h_env_staged", metadata.dist(), metadata.config.host_subdir)),
+        )
+        utils.rm_rf(staged_prefix)
+        shutil_move_more_retrying(prefix, staged_prefix, "host env")
+        final_outputs = package_queue.submit(
+            metadata.name(),
+            staged_prefix,
+            files,
+            basename + ext,
+            output_folder,
+            metadata.config,
+            cph_kwargs=cph_kwargs,
+            checks_to_ignore=checks_to_ignore,
+            remove_prefix=not moved_prefix,
+        )
+
+    return final_outputs
+
+
+def create_package(
+    prefix: str,
+    files: Iterable[str],
+    filename: str,
+    output_folder: str,
+    config: Config,
+    cph_kwargs: dict[str, Any] | None = None,
+    checks_to_ignore: list[str] | None = None,
+    remove_prefix: bool = False,
+) -> list[str]:
+    """
+    Compress ``files`` from ``prefix`` into ``filename``, check the archive and copy it into
+    ``output_folder``. Runs in a worker process for ``--package-workers``.
+
+    :param checks_to_ignore: conda-verify codes to ignore, or None to skip conda-verify
+    :param remove_prefix: Remove ``prefix`` once the package is created
+    :return: list of the created packages
+    """
+    log = utils.get_logger(__name__)
+    final_outputs = []
     with TemporaryDirectory() as tmp:
         conda_package_handling.api.create(
-            metadata.config.host_prefix,
+            prefix,
             files,
-            basename + ext,
+            filename,
             out_folder=tmp,
-            **cph_kwargs,
+            **(cph_kwargs or {}),
         )
-        tmp_archives = [os.path.join(tmp, basename + ext)]
+        tmp_archives = [os.path.join(tmp, filename)]
 
         # we're done building, perform some checks
         for tmp_path in tmp_archives:
             if tmp_path.endswith(CondaPkgFormat.V1.ext):
-                tarcheck.check_all(tmp_path, metadata.config)
+                tarcheck.check_all(tmp_path, config)
             output_filename = os.path.basename(tmp_path)
 
             # we do the import here because we want to respect logger level context
@@ -1951,67 +2277,88 @@ def bundle_conda(
                     "Importing conda-verify failed. Skipping extra checks...",
                     exc_info=exc,
                 )
-            if getattr(metadata.config, "verify", False) and Verify:
+            if checks_to_ignore is not None and Verify:
                 verifier = Verify()
-                checks_to_ignore = (
-                    utils.ensure_list(metadata.config.ignore_verify_codes)
-                    + metadata.ignore_verify_codes()
-                )
                 try:
                     verifier.verify_package(
                         path_to_package=tmp_path,
                         checks_to_ignore=checks_to_ignore,
-                        exit_on_error=metadata.config.exit_on_verify_error,
+                        exit_on_error=config.exit_on_verify_error,
                     )
                 except KeyError as e:
                     log.warning(
                         "Package doesn't have necessary files.  It might be too old to inspect."
                         f"Legacy noarch packages are known to fail.  Full message was {e}"
                     )
-            try:
-                crossed_subdir = metadata.config.target_subdir
-            except AttributeError:
-                crossed_subdir = metadata.config.host_subdir
-            subdir = (
-                "noarch"
-                if (metadata.noarch or metadata.noarch_python)
-                else crossed_subdir
-            )
-            if metadata.config.output_folder:
-                output_folder = os.path.join(metadata.config.output_folder, subdir)
-            else:
-                output_folder = os.path.join(
-                    os.path.dirname(metadata.config.bldpkgs_dir), subdir
-                )
             final_output = os.path.join(output_folder, output_filename)
             if os.path.isfile(final_output):
                 utils.rm_rf(final_output)
 
             # disable locking here.  It's just a temp folder getting locked.  Removing it proved to be
             #    a major bottleneck.
-            utils.copy_into(
-                tmp_path, final_output, metadata.config.timeout, locking=False
-            )
+            utils.copy_into(tmp_path, final_output, config.timeout, locking=False)
             final_outputs.append(final_output)
-    _delegated_update_index(
-        os.path.dirname(output_folder), verbose=metadata.config.debug, threads=1
-    )
+    if remove_prefix:
+        utils.rm_rf(prefix)
+    return final_outputs
 
-    # clean out host prefix so that this output's files don't interfere with other outputs
-    #   We have a backup of how things were before any output scripts ran.  That's
-    #   restored elsewhere.
 
-    if metadata.config.keep_old_work:
-        prefix = metadata.config.host_prefix
-        dest = os.path.join(
-            os.path.dirname(prefix),
-            "_".join(("_h_env_moved", metadata.dist(), metadata.config.host_subdir)),
-        )
-        shutil_move_more_retrying(prefix, dest, "host env")
-    else:
-        utils.rm_rf(metadata.config.host_prefix)
+class PackageQueue:
+    """
+    Bounded pool of worker processes that run :func:`create_package` for staged outputs.
 
-    return final_outputs
+    :meth:`submit` returns the paths the packages will have, so outputs are still reported
+    in order, while :meth:`wait` blocks until (some of) them exist and are queued for indexing.
+    """
+
+    def __init__(self, max_workers: int):
+        self.executor = ProcessPoolExecutor(max_workers=max_workers)
+        # output name -> futures
+        self.pending: dict[str, list[Future]] = {}
+
+    def submit(
+        self,
+        name: str,
+        prefix: str,
+        files: Iterable[str],
+        filename: str,
+        output_folder: str,
+        *args,
+        **kwargs,
+    ) -> list[str]:
+        future = self.executor.submit(
+            create_package,
+            prefix,
+            list(files),
+            filename,
+            output_folder,
+            *args,
+            **kwargs,
+        )
+        self.pending.setdefault(name, []).append(future)
+        return [os.path.join(output_folder, filename)]
+
+    def wait(self, names: Iterable[str] | None = None) -> None:
+        """Wait for the packages of ``names`` (default: all pending) and queue them for indexing."""
+        names = set(self.pending if names is None else names).intersection(self.pending)
+        for name in sorted(names):
+            for future in self.pending.pop(name):
+                # spans of the worker processes are not recorded, so record how long the
+                #   build waits for them instead
+                with span("compress", "package", output=name):
+                    final_outputs = future.result()
+                for final_output in final_outputs:
+                    local_channel_index.add(final_output)
+
+    def __enter__(self) -> PackageQueue:
+        return self
+
+    def __exit__(self, e_type, e_value, traceback) -> None:
+        try:
+            if e_type is None:
+                self.wait()
+        finally:
+            self.executor.shutdown(wait=True, cancel_futures=e_type is not None)
 
 
 def bundle_wheel(
@@ -2212,6 +2559,9 @@ def create_build_envs(m: MetaData, notest):
 
     m.config._merge_build_host = m.build_is_host
 
+    # all environments are solved before any is created, so that an unsatisfiable test
+    #   environment is noticed early and build and host can be created together
+    host_precs = None
     if m.is_cross and not m.build_is_host:
         host_precs = environ.get_package_records(
             m.config.host_prefix,
@@ -2228,15 +2578,6 @@ def create_build_envs(m: MetaData, notest):
             output_folder=m.config.output_folder,
             channel_urls=tuple(m.config.channel_urls),
         )
-        environ.create_env(
-            m.config.host_prefix,
-            host_precs,
-            env="host",
-            config=m.config,
-            subdir=m.config.host_subdir,
-            is_cross=m.is_cross,
-            is_conda=m.name() == "conda",
-        )
     if m.build_is_host:
         build_ms_deps.extend(host_ms_deps)
     build_precs = environ.get_package_records(
@@ -2293,20 +2634,24 @@ def create_build_envs(m: MetaData, notest):
         if missing_deps:
             e.packages = missing_deps
             raise e
+
+    envs = []
+    if host_precs is not None:
+        envs.append(("host", m.config.host_prefix, host_precs, m.config.host_subdir))
     if (
         not m.config.dirty
         or not os.path.isdir(m.config.build_prefix)
         or not os.listdir(m.config.build_prefix)
     ):
-        environ.create_env(
-            m.config.build_prefix,
-            build_precs,
-            env="build",
-            config=m.config,
-            subdir=m.config.build_subdir,
-            is_cross=m.is_cross,
-            is_conda=m.name() == "conda",
+        envs.append(
+            ("build", m.config.build_prefix, build_precs, m.config.build_subdir)
         )
+    environ.create_envs(
+        envs,
+        config=m.config,
+        is_cross=m.is_cross,
+        is_conda=m.name() == "conda",
+    )
 
 
 def build(
@@ -2341,6 +2686,7 @@ def build(
     host_precs = []
     build_precs = []
     output_metas = []
+    host_snapshot = None
 
     with utils.path_prepended(m.config.build_prefix):
         env = environ.get_dict(m=m)
@@ -2504,7 +2850,8 @@ def build(
             os.makedirs(src_dir)
 
         utils.rm_rf(m.config.info_dir)
-        files1 = utils.prefix_files(prefix=m.config.host_prefix)
+        host_snapshot = utils.PrefixSnapshot(m.config.host_prefix)
+        files1 = host_snapshot.files
         os.makedirs(m.config.build_folder, exist_ok=True)
         with open(join(m.config.build_folder, "prefix_files.txt"), "w") as f:
             f.write("\n".join(sorted(list(files1))))
@@ -2573,13 +2920,14 @@ def build(
 
                         # this should raise if any problems occur while building
                         try:
-                            utils.check_call_env(
-                                cmd,
-                                env=env,
-                                rewrite_stdout_env=rewrite_env,
-                                cwd=src_dir,
-                                stats=build_stats,
-                            )
+                            with span("build_script", "build"):
+                                utils.check_call_env(
+                                    cmd,
+                                    env=env,
+                                    rewrite_stdout_env=rewrite_env,
+                                    cwd=src_dir,
+                                    stats=build_stats,
+                                )
                         except subprocess.CalledProcessError as exc:
                             raise BuildScriptException(str(exc), caused_by=exc) from exc
                         utils.remove_pycache_from_scripts(m.config.host_prefix)
@@ -2593,7 +2941,11 @@ def build(
     if os.path.isfile(prefix_file_list):
         with open(prefix_file_list) as f:
             initial_files = set(f.read().splitlines())
-    new_prefix_files = utils.prefix_files(prefix=m.config.host_prefix) - initial_files
+    if host_snapshot is None:
+        host_snapshot = utils.PrefixSnapshot(m.config.host_prefix)
+    else:
+        host_snapshot.refresh()
+    new_prefix_files = host_snapshot.files - initial_files
 
     new_pkgs = default_return
     if not provision_only and post in [True, None]:
@@ -2619,7 +2971,14 @@ def build(
             else m.config.subdir
         )
 
-        with TemporaryDirectory() as prefix_files_backup:
+        # with --package-workers, outputs are compressed and verified in the background
+        package_workers = m.config.package_workers
+        package_queue_context = (
+            PackageQueue(package_workers) if package_workers > 1 else nullcontext()
+        )
+        with ExitStack() as stack:
+            prefix_files_backup = stack.enter_context(TemporaryDirectory())
+            package_queue = stack.enter_context(package_queue_context)
             # back up new prefix files, because we wipe the prefix before each output build
             for f in new_prefix_files:
                 utils.copy_into(
@@ -2703,6 +3062,12 @@ def build(
 
                         host_ms_deps = m.ms_depends("host")
                         sub_build_ms_deps = m.ms_depends("build")
+                        if package_queue:
+                            # outputs still being packaged must be indexed before any
+                            #    environment that depends on them is solved
+                            package_queue.wait(
+                                ms.name for ms in (*host_ms_deps, *sub_build_ms_deps)
+                            )
                         if m.is_cross and not m.build_is_host:
                             host_precs = environ.get_package_records(
                                 m.config.host_prefix,
@@ -2783,9 +3148,14 @@ def build(
                         getattr(m, "type", m.config.conda_pkg_format)
                         or CondaPkgFormat.V2
                     )
-                    newly_built_packages = bundlers[pkg_type](
-                        output_d, m, env, stats, new_prefix_files
-                    )
+                    bundler = bundlers[pkg_type]
+                    bundler_kwargs = {}
+                    if package_queue and bundler is bundle_conda:
+                        bundler_kwargs["package_queue"] = package_queue
+                    with span("bundle", "output", **metadata_args(m)):
+                        newly_built_packages = bundler(
+                            output_d, m, env, stats, new_prefix_files, **bundler_kwargs
+                        )
                     # warn about overlapping files.
                     if "checksums" in output_d:
                         for file, csum in output_d["checksums"].items():
@@ -2805,35 +3175,8 @@ def build(
                     for built_package in newly_built_packages:
                         new_pkgs[built_package] = (output_d, m)
 
-                    # must rebuild index because conda has no way to incrementally add our last
-                    #    package to the index.
-
-                    index_subdir = (
-                        "noarch"
-                        if (m.noarch or m.noarch_python)
-                        else m.config.host_subdir
-                    )
-                    if m.is_cross:
-                        get_build_index(
-                            subdir=index_subdir,
-                            bldpkgs_dir=m.config.bldpkgs_dir,
-                            output_folder=m.config.output_folder,
-                            channel_urls=m.config.channel_urls,
-                            debug=m.config.debug,
-                            verbose=m.config.verbose,
-                            clear_cache=True,
-                            omit_defaults=False,
-                        )
-                    get_build_index(
-                        subdir=index_subdir,
-                        bldpkgs_dir=m.config.bldpkgs_dir,
-                        output_folder=m.config.output_folder,
-                        channel_urls=m.config.channel_urls,
-                        debug=m.config.debug,
-                        verbose=m.config.verbose,
-                        clear_cache=True,
-                        omit_defaults=False,
-                    )
+                    # the new packages are only queued for the local channel index,
+                    #    get_build_index adds them once the next solve needs them.
     else:
         if not provision_only:
             print("STOPPING BUILD BEFORE POST:", m.dist())
@@ -3558,9 +3901,9 @@ def tests_failed(
             )
         except OSError:
             pass
-        _delegated_update_index(
-            os.path.dirname(os.path.dirname(pkg)), verbose=config.debug, threads=1
-        )
+        local_channel_index.add(pkg)
+        # drop it from the local channel's index right away, it was solved for already
+        local_channel_index.finalize(verbose=config.debug)
     raise CondaBuildUserError("TESTS FAILED: " + os.path.basename(pkg))
 
 
@@ -3588,6 +3931,10 @@ def build_tree(
     built_packages = OrderedDict()
     retried_recipes = []
     initial_time = time.time()
+    if config.trace_file:
+        profiler.enable()
+        # only record the spans of this run
+        profiler.reset()
 
     if build_only:
         post = False
@@ -3603,220 +3950,300 @@ def build_tree(
     #     the loop below.
     metadata = None
 
-    while recipe_list:
-        # This loop recursively builds dependencies if recipes exist
-        try:
-            recipe = recipe_list.popleft()
-            name = recipe.name() if hasattr(recipe, "name") else recipe
-            if hasattr(recipe, "config"):
-                metadata = recipe
-                cfg = metadata.config
-                cfg.anaconda_upload = (
-                    config.anaconda_upload
-                )  # copy over anaconda_upload setting
-
-                # this code is duplicated below because we need to be sure that the build id is set
-                #    before downloading happens - or else we lose where downloads are
-                if cfg.set_build_id and metadata.name() not in cfg.build_id:
-                    cfg.compute_build_id(metadata.name(), reset=True)
-                recipe_parent_dir = os.path.dirname(metadata.path)
-                to_build_recursive.append(metadata.name())
-
-                if not metadata.final:
-                    variants_ = (
-                        dict_of_lists_to_list_of_dicts(variants)
-                        if variants
-                        else get_package_variants(metadata)
-                    )
+    try:
+        while recipe_list:
+            # This loop recursively builds dependencies if recipes exist
+            try:
+                recipe = recipe_list.popleft()
+                name = recipe.name() if hasattr(recipe, "name") else recipe
+                if hasattr(recipe, "config"):
+                    metadata = recipe
+                    cfg = metadata.config
+                    cfg.anaconda_upload = (
+                        config.anaconda_upload
+                    )  # copy over anaconda_upload setting
+
+                    # this code is duplicated below because we need to be sure that the build id is set
+                    #    before downloading happens - or else we lose where downloads are
+                    if cfg.set_build_id and metadata.name() not in cfg.build_id:
+                        cfg.compute_build_id(metadata.name(), reset=True)
+                    recipe_parent_dir = os.path.dirname(metadata.path)
+                    to_build_recursive.append(metadata.name())
+
+                    if not metadata.final:
+                        variants_ = (
+                            dict_of_lists_to_list_of_dicts(variants)
+                            if variants
+                            else get_package_variants(metadata)
+                        )
 
-                    # This is where reparsing happens - we need to re-evaluate the meta.yaml for any
-                    #    jinja2 templating
-                    metadata_tuples = distribute_variants(
-                        metadata, variants_, permit_unsatisfiable_variants=False
-                    )
+                        # This is where reparsing happens - we need to re-evaluate the meta.yaml for any
+                        #    jinja2 templating
+                        metadata_tuples = distribute_variants(
+                            metadata, variants_, permit_unsatisfiable_variants=False
+                        )
+                    else:
+                        metadata_tuples = ((metadata, False, False),)
                 else:
-                    metadata_tuples = ((metadata, False, False),)
-            else:
-                cfg = config
-
-                recipe_parent_dir = os.path.dirname(recipe)
-                recipe = recipe.rstrip("/").rstrip("\\")
-                to_build_recursive.append(os.path.basename(recipe))
-
-                # each tuple is:
-                #    metadata, need_source_download, need_reparse_in_env =
-                # We get one tuple per variant
-                metadata_tuples = render_recipe(
-                    recipe,
-                    config=cfg,
-                    variants=variants,
-                    permit_unsatisfiable_variants=False,
-                    reset_build_id=not cfg.dirty,
-                    bypass_env_check=True,
-                )
-
-            if post in (True, False):
-                metadata_tuples = metadata_tuples[:1]
-
-            # This is the "TOP LEVEL" loop. Only vars used in the top-level
-            # recipe are looped over here.
-
-            for metadata, need_source_download, need_reparse_in_env in metadata_tuples:
-                get_all_replacements(metadata.config.variant)
-                if post is None:
-                    utils.rm_rf(metadata.config.host_prefix)
-                    utils.rm_rf(metadata.config.build_prefix)
-                    utils.rm_rf(metadata.config.test_prefix)
-                if metadata.name() not in metadata.config.build_folder:
-                    metadata.config.compute_build_id(
-                        metadata.name(), metadata.version(), reset=True
+                    cfg = config
+
+                    recipe_parent_dir = os.path.dirname(recipe)
+                    recipe = recipe.rstrip("/").rstrip("\\")
+                    to_build_recursive.append(os.path.basename(recipe))
+
+                    # each tuple is:
+                    #    metadata, need_source_download, need_reparse_in_env =
+                    # We get one tuple per variant
+                    metadata_tuples = render_recipe(
+                        recipe,
+                        config=cfg,
+                        variants=variants,
+                        permit_unsatisfiable_variants=False,
+                        reset_build_id=not cfg.dirty,
+                        bypass_env_check=True,
                     )
 
-                packages_from_this = build(
+                if post in (True, False):
+                    metadata_tuples = metadata_tuples[:1]
+
+                # This is the "TOP LEVEL" loop. Only vars used in the top-level
+                # recipe are looped over here.
+
+                for (
                     metadata,
-                    stats,
-                    post=post,
-                    need_source_download=need_source_download,
-                    need_reparse_in_env=need_reparse_in_env,
-                    built_packages=built_packages,
-                    notest=notest,
-                )
-                if not notest:
-                    for pkg, dict_and_meta in packages_from_this.items():
-                        if pkg.endswith(CONDA_PACKAGE_EXTENSIONS) and os.path.isfile(
-                            pkg
-                        ):
-                            # we only know how to test conda packages
-                            test(pkg, config=metadata.config.copy(), stats=stats)
-                        _, meta = dict_and_meta
-                        downstreams = meta.meta.get("test", {}).get("downstreams")
-                        if downstreams:
-                            channel_urls = tuple(
-                                utils.ensure_list(metadata.config.channel_urls)
-                                + [
-                                    utils.path2url(
-                                        os.path.abspath(
-                                            os.path.dirname(os.path.dirname(pkg))
-                                        )
+                    need_source_download,
+                    need_reparse_in_env,
+                ) in metadata_tuples:
+                    get_all_replacements(metadata.config.variant)
+                    if post is None:
+                        utils.rm_rf(metadata.config.host_prefix)
+                        utils.rm_rf(metadata.config.build_prefix)
+                        utils.rm_rf(metadata.config.test_prefix)
+                    if metadata.name() not in metadata.config.build_folder:
+                        metadata.config.compute_build_id(
+                            metadata.name(), metadata.version(), reset=True
+                        )
+
+                    with span("build", "output", **metadata_args(metadata)):
+                        packages_from_this = build(
+                            metadata,
+                            stats,
+                            post=post,
+                            need_source_download=need_source_download,
+                            need_reparse_in_env=need_reparse_in_env,
+                            built_packages=built_packages,
+                            notest=notest,
+                        )
+                    if not notest:
+                        for pkg, dict_and_meta in packages_from_this.items():
+                            if pkg.endswith(
+                                CONDA_PACKAGE_EXTENSIONS
+                            ) and os.path.isfile(pkg):
+                                # we only know how to test conda packages
+                                with span(
+                                    "test", "test", package=os.path.basename(pkg)
+                                ):
+                                    test(
+                                        pkg, config=metadata.config.copy(), stats=stats
                                     )
-                                ]
-                            )
-                            log = utils.get_logger(__name__)
-                            # downstreams can be a dict, for adding capability for worker labels
-                            if hasattr(downstreams, "keys"):
-                                downstreams = list(downstreams.keys())
-                                log.warning(
-                                    "Dictionary keys for downstreams are being "
-                                    "ignored right now.  Coming soon..."
+                            _, meta = dict_and_meta
+                            downstreams = meta.meta.get("test", {}).get("downstreams")
+                            if downstreams:
+                                channel_urls = tuple(
+                                    utils.ensure_list(metadata.config.channel_urls)
+                                    + [
+                                        utils.path2url(
+                                            os.path.abspath(
+                                                os.path.dirname(os.path.dirname(pkg))
+                                            )
+                                        )
+                                    ]
                                 )
-                            else:
-                                downstreams = utils.ensure_list(downstreams)
-                            for dep in downstreams:
-                                log.info(f"Testing downstream package: {dep}")
-                                # resolve downstream packages to a known package
-
-                                r_string = "".join(
-                                    random.choice(
-                                        string.ascii_uppercase + string.digits
+                                log = utils.get_logger(__name__)
+                                # downstreams can be a dict, for adding capability for worker labels
+                                if hasattr(downstreams, "keys"):
+                                    downstreams = list(downstreams.keys())
+                                    log.warning(
+                                        "Dictionary keys for downstreams are being "
+                                        "ignored right now.  Coming soon..."
                                     )
-                                    for _ in range(10)
-                                )
-                                specs = meta.ms_depends("run") + [
-                                    MatchSpec(dep),
-                                    MatchSpec(" ".join(meta.dist().rsplit("-", 2))),
-                                ]
-                                specs = [
-                                    utils.ensure_valid_spec(spec) for spec in specs
-                                ]
-                                try:
-                                    with TemporaryDirectory(
-                                        prefix="_", suffix=r_string
-                                    ) as tmpdir:
-                                        precs = environ.get_package_records(
-                                            tmpdir,
-                                            specs,
-                                            env="run",
-                                            subdir=meta.config.host_subdir,
-                                            bldpkgs_dirs=meta.config.bldpkgs_dirs,
-                                            channel_urls=channel_urls,
+                                else:
+                                    downstreams = utils.ensure_list(downstreams)
+                                for dep in downstreams:
+                                    log.info(f"Testing downstream package: {dep}")
+                                    # resolve downstream packages to a known package
+
+                                    r_string = "".join(
+                                        random.choice(
+                                            string.ascii_uppercase + string.digits
                                         )
-                                except (
-                                    UnsatisfiableError,
-                                    DependencyNeedsBuildingError,
-                                ) as e:
-                                    log.warning(
-                                        f"Skipping downstream test for spec {dep}; was "
-                                        f"unsatisfiable.  Error was {e}"
+                                        for _ in range(10)
                                     )
-                                    continue
-                                # make sure to download that package to the local cache if not there
-                                local_file = execute_download_actions(
-                                    meta,
-                                    precs,
-                                    "host",
-                                    package_subset=[dep],
-                                    require_files=True,
-                                )
-                                # test that package, using the local channel so that our new
-                                #    upstream dep gets used
-                                test(
-                                    list(local_file.values())[0][0],
-                                    config=meta.config.copy(),
-                                    stats=stats,
+                                    specs = meta.ms_depends("run") + [
+                                        MatchSpec(dep),
+                                        MatchSpec(" ".join(meta.dist().rsplit("-", 2))),
+                                    ]
+                                    specs = [
+                                        utils.ensure_valid_spec(spec) for spec in specs
+                                    ]
+                                    try:
+                                        with TemporaryDirectory(
+                                            prefix="_", suffix=r_string
+                                        ) as tmpdir:
+                                            precs = environ.get_package_records(
+                                                tmpdir,
+                                                specs,
+                                                env="run",
+                                                subdir=meta.config.host_subdir,
+                                                bldpkgs_dirs=meta.config.bldpkgs_dirs,
+                                                channel_urls=channel_urls,
+                                            )
+                                    except (
+                                        UnsatisfiableError,
+                                        DependencyNeedsBuildingError,
+                                    ) as e:
+                                        log.warning(
+                                            f"Skipping downstream test for spec {dep}; was "
+                                            f"unsatisfiable.  Error was {e}"
+                                        )
+                                        continue
+                                    # make sure to download that package to the local cache if not there
+                                    local_file = execute_download_actions(
+                                        meta,
+                                        precs,
+                                        "host",
+                                        package_subset=[dep],
+                                        require_files=True,
+                                    )
+                                    # test that package, using the local channel so that our new
+                                    #    upstream dep gets used
+                                    test(
+                                        list(local_file.values())[0][0],
+                                        config=meta.config.copy(),
+                                        stats=stats,
+                                    )
+
+                            built_packages.update({pkg: dict_and_meta})
+                    else:
+                        built_packages.update(packages_from_this)
+
+                    if os.path.exists(metadata.config.work_dir) and not (
+                        metadata.config.dirty
+                        or metadata.config.keep_old_work
+                        or metadata.get_value("build/no_move_top_level_workdir_loops")
+                    ):
+                        # force the build string to include hashes as necessary
+                        metadata.final = True
+                        dest = os.path.join(
+                            os.path.dirname(metadata.config.work_dir),
+                            "_".join(
+                                (
+                                    "work_moved",
+                                    metadata.dist(),
+                                    metadata.config.host_subdir,
+                                    "main_build_loop",
                                 )
+                            ),
+                        )
+                        # Needs to come after create_files in case there's test/source_files
+                        shutil_move_more_retrying(
+                            metadata.config.work_dir, dest, "work"
+                        )
 
-                        built_packages.update({pkg: dict_and_meta})
-                else:
-                    built_packages.update(packages_from_this)
+                # each metadata element here comes from one recipe, thus it will share one build id
+                #    cleaning on the last metadata in the loop should take care of all of the stuff.
+                metadata.clean()
+
+                # We *could* delete `metadata_conda_debug.yaml` here, but the user may want to debug
+                # failures that happen after this point and we may as well not make that impossible.
+                # os.unlink(os.path.join(metadata.config.work_dir, 'metadata_conda_debug.yaml'))
+
+            except DependencyNeedsBuildingError as e:
+                skip_names = ["python", "r", "r-base", "mro-base", "perl", "lua"]
+                built_package_paths = [
+                    entry[1][1].path for entry in built_packages.items()
+                ]
+                add_recipes = []
+                # add the failed one back in at the beginning - but its deps may come before it
+                recipe_list.extendleft([recipe])
+                for pkg, matchspec in zip(e.packages, e.matchspecs):
+                    pkg_name = pkg.split(" ")[0].split("=")[0]
+                    # if we hit missing dependencies at test time, the error we get says that our
+                    #    package that we just built needs to be built.  Very confusing.  Bomb out
+                    #    if any of our output metadatas are in the exception list of pkgs.
+                    if metadata and any(
+                        pkg_name == output_meta.name()
+                        for (_, output_meta) in metadata.get_output_metadata_set(
+                            permit_undefined_jinja=True
+                        )
+                    ):
+                        raise
+                    if pkg in to_build_recursive:
+                        cfg.clean(remove_folders=False)
+                        raise RuntimeError(
+                            f"Can't build {recipe} due to environment creation error:\n"
+                            + str(e.message)
+                            + "\n"
+                            + extra_help
+                        )
 
-                if os.path.exists(metadata.config.work_dir) and not (
-                    metadata.config.dirty
-                    or metadata.config.keep_old_work
-                    or metadata.get_value("build/no_move_top_level_workdir_loops")
-                ):
-                    # force the build string to include hashes as necessary
-                    metadata.final = True
-                    dest = os.path.join(
-                        os.path.dirname(metadata.config.work_dir),
-                        "_".join(
-                            (
-                                "work_moved",
-                                metadata.dist(),
-                                metadata.config.host_subdir,
-                                "main_build_loop",
-                            )
-                        ),
-                    )
-                    # Needs to come after create_files in case there's test/source_files
-                    shutil_move_more_retrying(metadata.config.work_dir, dest, "work")
-
-            # each metadata element here comes from one recipe, thus it will share one build id
-            #    cleaning on the last metadata in the loop should take care of all of the stuff.
-            metadata.clean()
-
-            # We *could* delete `metadata_conda_debug.yaml` here, but the user may want to debug
-            # failures that happen after this point and we may as well not make that impossible.
-            # os.unlink(os.path.join(metadata.config.work_dir, 'metadata_conda_debug.yaml'))
-
-        except DependencyNeedsBuildingError as e:
-            skip_names = ["python", "r", "r-base", "mro-base", "perl", "lua"]
-            built_package_paths = [entry[1][1].path for entry in built_packages.items()]
-            add_recipes = []
-            # add the failed one back in at the beginning - but its deps may come before it
-            recipe_list.extendleft([recipe])
-            for pkg, matchspec in zip(e.packages, e.matchspecs):
-                pkg_name = pkg.split(" ")[0].split("=")[0]
-                # if we hit missing dependencies at test time, the error we get says that our
-                #    package that we just built needs to be built.  Very confusing.  Bomb out
-                #    if any of our output metadatas are in the exception list of pkgs.
-                if metadata and any(
-                    pkg_name == output_meta.name()
-                    for (_, output_meta) in metadata.get_output_metadata_set(
-                        permit_undefined_jinja=True
+                    if pkg in skip_names:
+                        to_build_recursive.append(pkg)
+                        extra_help = (
+                            "Typically if a conflict is with the Python or R\n"
+                            "packages, the other package or one of its dependencies\n"
+                            "needs to be rebuilt (e.g., a conflict with 'python 3.5*'\n"
+                            "and 'x' means 'x' or one of 'x' dependencies isn't built\n"
+                            "for Python 3.5 and needs to be rebuilt."
+                        )
+
+                    recipe_glob = glob(os.path.join(recipe_parent_dir, pkg_name))
+                    # conda-forge style.  meta.yaml lives one level deeper.
+                    if not recipe_glob:
+                        recipe_glob = glob(
+                            os.path.join(recipe_parent_dir, "..", pkg_name)
+                        )
+                    feedstock_glob = glob(
+                        os.path.join(recipe_parent_dir, pkg_name + "-feedstock")
                     )
+                    if not feedstock_glob:
+                        feedstock_glob = glob(
+                            os.path.join(
+                                recipe_parent_dir, "..", pkg_name + "-feedstock"
+                            )
+                        )
+                    available = False
+                    if recipe_glob or feedstock_glob:
+                        for recipe_dir in recipe_glob + feedstock_glob:
+                            if not any(
+                                path.startswith(recipe_dir)
+                                for path in built_package_paths
+                            ):
+                                dep_metas = render_recipe(
+                                    recipe_dir, config=metadata.config
+                                )
+                                for dep_meta in dep_metas:
+                                    if utils.match_peer_job(
+                                        MatchSpec(matchspec), dep_meta[0], metadata
+                                    ):
+                                        print(
+                                            f"Missing dependency {pkg}, but found "
+                                            f"recipe directory, so building "
+                                            f"{pkg} first"
+                                        )
+                                        add_recipes.append(recipe_dir)
+                                        available = True
+                    if not available:
+                        cfg.clean(remove_folders=False)
+                        raise
+                # if we failed to render due to unsatisfiable dependencies, we should only bail out
+                #    if we've already retried this recipe.
+                if (
+                    not metadata
+                    and retried_recipes.count(recipe)
+                    and retried_recipes.count(recipe)
+                    >= len(metadata.ms_depends("build"))
                 ):
-                    raise
-                if pkg in to_build_recursive:
                     cfg.clean(remove_folders=False)
                     raise RuntimeError(
                         f"Can't build {recipe} due to environment creation error:\n"
@@ -3824,117 +4251,70 @@ def build_tree(
                         + "\n"
                         + extra_help
                     )
+                retried_recipes.append(os.path.basename(name))
+                recipe_list.extendleft(add_recipes)
 
-                if pkg in skip_names:
-                    to_build_recursive.append(pkg)
-                    extra_help = (
-                        "Typically if a conflict is with the Python or R\n"
-                        "packages, the other package or one of its dependencies\n"
-                        "needs to be rebuilt (e.g., a conflict with 'python 3.5*'\n"
-                        "and 'x' means 'x' or one of 'x' dependencies isn't built\n"
-                        "for Python 3.5 and needs to be rebuilt."
-                    )
+        tarballs = [f for f in built_packages if f.endswith(CONDA_PACKAGE_EXTENSIONS)]
+        if post in [True, None]:
+            # TODO: could probably use a better check for pkg type than this...
+            wheels = [f for f in built_packages if f.endswith(".whl")]
+            handle_anaconda_upload(tarballs, config=config)
+            handle_pypi_upload(wheels, config=config)
 
-                recipe_glob = glob(os.path.join(recipe_parent_dir, pkg_name))
-                # conda-forge style.  meta.yaml lives one level deeper.
-                if not recipe_glob:
-                    recipe_glob = glob(os.path.join(recipe_parent_dir, "..", pkg_name))
-                feedstock_glob = glob(
-                    os.path.join(recipe_parent_dir, pkg_name + "-feedstock")
-                )
-                if not feedstock_glob:
-                    feedstock_glob = glob(
-                        os.path.join(recipe_parent_dir, "..", pkg_name + "-feedstock")
-                    )
-                available = False
-                if recipe_glob or feedstock_glob:
-                    for recipe_dir in recipe_glob + feedstock_glob:
-                        if not any(
-                            path.startswith(recipe_dir) for path in built_package_paths
-                        ):
-                            dep_metas = render_recipe(
-                                recipe_dir, config=metadata.config
-                            )
-                            for dep_meta in dep_metas:
-                                if utils.match_peer_job(
-                                    MatchSpec(matchspec), dep_meta[0], metadata
-                                ):
-                                    print(
-                                        f"Missing dependency {pkg}, but found "
-                                        f"recipe directory, so building "
-                                        f"{pkg} first"
-                                    )
-                                    add_recipes.append(recipe_dir)
-                                    available = True
-                if not available:
-                    cfg.clean(remove_folders=False)
-                    raise
-            # if we failed to render due to unsatisfiable dependencies, we should only bail out
-            #    if we've already retried this recipe.
-            if (
-                not metadata
-                and retried_recipes.count(recipe)
-                and retried_recipes.count(recipe) >= len(metadata.ms_depends("build"))
-            ):
-                cfg.clean(remove_folders=False)
-                raise RuntimeError(
-                    f"Can't build {recipe} due to environment creation error:\n"
-                    + str(e.message)
-                    + "\n"
-                    + extra_help
-                )
-            retried_recipes.append(os.path.basename(name))
-            recipe_list.extendleft(add_recipes)
-
-    tarballs = [f for f in built_packages if f.endswith(CONDA_PACKAGE_EXTENSIONS)]
-    if post in [True, None]:
-        # TODO: could probably use a better check for pkg type than this...
-        wheels = [f for f in built_packages if f.endswith(".whl")]
-        handle_anaconda_upload(tarballs, config=config)
-        handle_pypi_upload(wheels, config=config)
-
-    # Print the variant information for each package because it is very opaque and never printed.
-    from .inspect_pkg import get_hash_input
+        # Print the variant information for each package because it is very opaque and never printed.
+        from .inspect_pkg import get_hash_input
 
-    hash_inputs = get_hash_input(tarballs)
-    print(
-        "\nINFO :: The inputs making up the hashes for the built packages are as follows:"
-    )
-    print(json.dumps(hash_inputs, sort_keys=True, indent=2))
-    print("\n")
+        hash_inputs = get_hash_input(tarballs)
+        print(
+            "\nINFO :: The inputs making up the hashes for the built packages are as follows:"
+        )
+        print(json.dumps(hash_inputs, sort_keys=True, indent=2))
+        print("\n")
 
-    total_time = time.time() - initial_time
-    max_memory_used = max([step.get("rss") for step in stats.values()] or [0])
-    total_disk = sum([step.get("disk") for step in stats.values()] or [0])
-    total_cpu_sys = sum([step.get("cpu_sys") for step in stats.values()] or [0])
-    total_cpu_user = sum([step.get("cpu_user") for step in stats.values()] or [0])
+        total_time = time.time() - initial_time
+        max_memory_used = max([step.get("rss") for step in stats.values()] or [0])
+        total_disk = sum([step.get("disk") for step in stats.values()] or [0])
+        total_cpu_sys = sum([step.get("cpu_sys") for step in stats.values()] or [0])
+        total_cpu_user = sum([step.get("cpu_user") for step in stats.values()] or [0])
 
-    print(
-        "{bar}\n"
-        "Resource usage summary:\n"
-        "\n"
-        "Total time: {elapsed}\n"
-        "CPU usage: sys={cpu_sys}, user={cpu_user}\n"
-        "Maximum memory usage observed: {memory}\n"
-        "Total disk usage observed (not including envs): {disk}".format(
-            bar="#" * 84,
-            elapsed=utils.seconds2human(total_time),
-            cpu_sys=utils.seconds2human(total_cpu_sys),
-            cpu_user=utils.seconds2human(total_cpu_user),
-            memory=utils.bytes2human(max_memory_used),
-            disk=utils.bytes2human(total_disk),
+        print(
+            "{bar}\n"
+            "Resource usage summary:\n"
+            "\n"
+            "Total time: {elapsed}\n"
+            "CPU usage: sys={cpu_sys}, user={cpu_user}\n"
+            "Maximum memory usage observed: {memory}\n"
+            "Total disk usage observed (not including envs): {disk}".format(
+                bar="#" * 84,
+                elapsed=utils.seconds2human(total_time),
+                cpu_sys=utils.seconds2human(total_cpu_sys),
+                cpu_user=utils.seconds2human(total_cpu_user),
+                memory=utils.bytes2human(max_memory_used),
+                disk=utils.bytes2human(total_disk),
+            )
         )
-    )
-
-    stats["total"] = {
-        "time": total_time,
-        "memory": max_memory_used,
-        "disk": total_disk,
-    }
 
-    if config.stats_file:
-        with open(config.stats_file, "w") as f:
-            json.dump(stats, f)
+        stats["total"] = {
+            "time": total_time,
+            "memory": max_memory_used,
+            "disk": total_disk,
+        }
+    finally:
+        # add whatever was built since the last solve to the local channel's index,
+        #     also when a build or its tests failed
+        local_channel_index.finalize(verbose=config.debug)
+
+        # statistics and traces of failed builds are the most interesting ones
+        if profiler.enabled:
+            stats["spans"] = profiler.summary()
+
+        if config.stats_file:
+            with open(config.stats_file, "w") as f:
+                json.dump(stats, f)
+
+        if config.trace_file:
+            profiler.write_chrome_trace(config.trace_file)
+        profiler.disable()
 
     return list(built_packages.keys())
 
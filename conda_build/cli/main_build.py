@@ -20,9 +20,12 @@ from .. import api, build, source, utils
 from .._rattler_build.compat import check_arguments_rattler, run_rattler
 from ..config import (
     CondaPkgFormat,
+    concurrent_envs_default,
     conda_pkg_format_default,
+    env_templates_default,
     get_channel_urls,
     get_or_merge_config,
+    package_workers_default,
     zstd_compression_level_default,
 )
 from ..utils import LoggingContext, is_v1_recipe
@@ -417,6 +420,43 @@ def parse_args(args: Sequence[str] | None) -> tuple[ArgumentParser, Namespace]:
         ),
         default=context.conda_build.get("long_test_prefix", "true").lower() == "true",
     )
+    parser.add_argument(
+        "--env-templates",
+        action="store_true",
+        help=(
+            "Store every build, host and test environment as a template in the "
+            "env_templates folder of croot, and create environments with the same "
+            "packages and prefix length by cloning the template (with reflinks or "
+            "hardlinks) instead of installing the packages again. Linux and macOS only."
+        ),
+        default=context.conda_build.get("env_templates", env_templates_default).lower()
+        == "true",
+    )
+    parser.add_argument(
+        "--concurrent-envs",
+        action="store_true",
+        help=(
+            "Link the packages of the build and host environments in parallel threads "
+            "instead of one environment after the other. Experimental: conda does not "
+            "guarantee that concurrent link transactions are safe."
+        ),
+        default=context.conda_build.get(
+            "concurrent_envs", concurrent_envs_default
+        ).lower()
+        == "true",
+    )
+    parser.add_argument(
+        "--package-workers",
+        help=(
+            "Number of outputs to compress and verify concurrently. Each output's files "
+            "are staged into their own folder so the next output can be built meanwhile. "
+            f"Defaults to {package_workers_default}."
+        ),
+        type=int,
+        default=int(
+            context.conda_build.get("package_workers", package_workers_default)
+        ),
+    )
     parser.add_argument(
         "--keep-going",
         "-k",
@@ -464,6 +504,16 @@ def parse_args(args: Sequence[str] | None) -> tuple[ArgumentParser, Namespace]:
         "--stats-file",
         help="File path to save build statistics to.  Stats are in JSON format",
     )
+    parser.add_argument(
+        "--trace-file",
+        help=(
+            "File path to save a timeline of the build's phases (rendering, solving, "
+            "environment creation, source download, packaging, testing, ...) to. "
+            "The timeline is in Chrome trace-event JSON format and can be loaded into "
+            "chrome://tracing, Perfetto or speedscope. Work done by --package-workers "
+            "and --render-workers processes is not broken down into phases."
+        ),
+    )
     parser.add_argument(
         "--extra-deps",
         nargs="+",
@@ -13,7 +13,12 @@ from yaml.parser import ParserError
 
 from .. import __version__, api
 from .._rattler_build.compat import check_arguments_rattler, run_rattler
-from ..config import get_channel_urls, get_or_merge_config
+from ..config import (
+    get_channel_urls,
+    get_or_merge_config,
+    render_cache_default,
+    render_workers_default,
+)
 from ..utils import LoggingContext, is_v1_recipe
 from ..variants import get_package_variants, set_language_env_vars
 
@@ -173,6 +178,28 @@ source to try fill in related template variables.",
             'such as "{python: [3.8, 3.9]}"'
         ),
     )
+    p.add_argument(
+        "--render-workers",
+        help=(
+            "Number of top-level variants to render concurrently, each in its own "
+            "process. Recipes that need their source to render are rendered one "
+            f"variant at a time. Defaults to {render_workers_default}."
+        ),
+        type=int,
+        default=int(context.conda_build.get("render_workers", render_workers_default)),
+    )
+    p.add_argument(
+        "--render-cache",
+        action="store_true",
+        help=(
+            "Store rendered recipes in the render_cache folder of croot and reuse them "
+            "as long as the recipe, the variant config files, the configuration, the "
+            "environment variables and the channels' repodata are unchanged. Recipes "
+            "that need their source to render are not cached."
+        ),
+        default=context.conda_build.get("render_cache", render_cache_default).lower()
+        == "true",
+    )
     add_parser_channels(p)
     return p
 
@@ -103,6 +103,11 @@ ignore_verify_codes_default = []
 exit_on_verify_error_default = False
 conda_pkg_format_default = CondaPkgFormat.V2
 zstd_compression_level_default = 19
+package_workers_default = 1
+render_workers_default = 1
+env_templates_default = "false"
+concurrent_envs_default = "false"
+render_cache_default = "false"
 
 
 # we need this to be accessible to the CLI, so it needs to be more static.
@@ -263,6 +268,8 @@ def _get_default_settings():
         Setting("_merge_build_host", False),
         # path to output build statistics to
         Setting("stats_file", None),
+        # path to write a Chrome trace-event timeline of the build to
+        Setting("trace_file", None),
         # extra deps to add to test env creation
         Setting("extra_deps", []),
         # customize this so pip doesn't look in places we don't want.  Per-build path by default.
@@ -273,6 +280,34 @@ def _get_default_settings():
                 "zstd_compression_level", zstd_compression_level_default
             ),
         ),
+        # number of outputs to compress and verify concurrently
+        Setting(
+            "package_workers",
+            int(context.conda_build.get("package_workers", package_workers_default)),
+        ),
+        # clone build, host and test environments from templates in croot/env_templates
+        Setting(
+            "env_templates",
+            context.conda_build.get("env_templates", env_templates_default).lower()
+            == "true",
+        ),
+        # link the build and host environments in parallel threads
+        Setting(
+            "concurrent_envs",
+            context.conda_build.get("concurrent_envs", concurrent_envs_default).lower()
+            == "true",
+        ),
+        # reuse rendered metadata from croot/render_cache
+        Setting(
+            "render_cache",
+            context.conda_build.get("render_cache", render_cache_default).lower()
+            == "true",
+        ),
+        # number of top-level variants to render concurrently
+        Setting(
+            "render_workers",
+            int(context.conda_build.get("render_workers", render_workers_default)),
+        ),
         Setting(
             "conda_pkg_format",
             CondaPkgFormat.normalize(
@@ -792,6 +827,20 @@ class Config:
         os.makedirs(path, exist_ok=True)
         return path
 
+    @property
+    def file_hash_cache(self):
+        """Where checksums of packaged files are cached, keyed by their stat information"""
+        path = join(self.src_cache_root, "file_hash_cache")
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    @property
+    def lief_cache(self):
+        """Where exports and symbols parsed from binaries are cached"""
+        path = join(self.src_cache_root, "lief_cache")
+        os.makedirs(path, exist_ok=True)
+        return path
+
     @property
     def work_dir(self):
         """Where the source for the build is extracted/copied to."""
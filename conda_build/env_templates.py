@@ -0,0 +1,232 @@
+# Copyright (C) 2014 Anaconda, Inc
+# SPDX-License-Identifier: BSD-3-Clause
+"""
+Content-addressed templates of build, host and test environments.
+
+With ``--env-templates``, every environment :func:`conda_build.environ.create_env`
+creates is stored under ``<croot>/env_templates``, keyed by its package records and the
+length of its prefix. An environment with the same packages and an equally long prefix is
+then cloned from the template instead of being fetched, extracted and linked again.
+
+Files which came straight from the package cache are cloned with reflinks where the file
+system supports them and hardlinks otherwise, just like conda links them. Files that conda
+wrote itself (prefix-replaced files, entry points, compiled bytecode, conda-meta, output
+of post-link scripts) are scanned for the prefix once when the template is stored. When
+cloning, the ones containing it are copied with the template's prefix replaced by the new
+one; as both prefixes have the same length this is safe for text and binary files alike.
+"""
+
+from __future__ import annotations
+
+import errno
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import sys
+from os.path import isdir, join
+from typing import TYPE_CHECKING
+
+from conda import __version__ as conda_version
+
+from . import utils
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+    from conda.models.records import PackageRecord
+
+log = utils.get_logger(__name__)
+
+MANIFEST = "template.json"
+#: bumped whenever the layout of templates changes
+TEMPLATE_VERSION = 1
+
+# Linux ioctl to share the extents of a file, see ioctl_ficlone(2)
+FICLONE = 0x40049409
+
+
+def template_key(precs: Iterable[PackageRecord], prefix: str) -> str | None:
+    """
+    Key of the template for an environment of ``precs`` at ``prefix``, ``None`` if some
+    package has no checksum to identify it by.
+    """
+    packages = []
+    for prec in precs:
+        digest = getattr(prec, "sha256", None) or getattr(prec, "md5", None)
+        if not digest:
+            return None
+        packages.append(f"{prec.url or prec.channel}|{prec.fn}|{digest}")
+    key = {
+        "version": TEMPLATE_VERSION,
+        "conda": conda_version,
+        "platform": sys.platform,
+        "packages": sorted(packages),
+        "prefix_length": len(os.fsencode(prefix)),
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _walk(root: str, relative: str = "") -> Iterator[tuple[str, os.DirEntry]]:
+    """Yield (relative path, entry) for everything below ``root``, parents first."""
+    with os.scandir(join(root, relative)) as entries:
+        for entry in entries:
+            path = join(relative, entry.name)
+            yield path, entry
+            if entry.is_dir(follow_symlinks=False):
+                yield from _walk(root, path)
+
+
+def _contains(path: str, needle: bytes) -> bool:
+    with open(path, "rb") as fh:
+        if not os.fstat(fh.fileno()).st_size:
+            return False
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return mm.find(needle) != -1
+
+
+def _reflink(src: str, dst: str) -> bool:
+    """Clone ``src`` to ``dst`` sharing its data, if the platform and file system can."""
+    if sys.platform == "darwin":
+        import ctypes
+
+        libc = ctypes.CDLL(None, use_errno=True)
+        return libc.clonefile(os.fsencode(src), os.fsencode(dst), 0) == 0
+    if not sys.platform.startswith("linux"):
+        return False
+    import fcntl
+
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        except OSError:
+            cloned = False
+        else:
+            cloned = True
+    if cloned:
+        shutil.copystat(src, dst)
+    else:
+        os.unlink(dst)
+    return cloned
+
+
+class _Linker:
+    """Places files, preferring reflinks, then hardlinks (if allowed), then copies."""
+
+    def __init__(self):
+        self.reflinks = True
+
+    def __call__(self, src: str, dst: str, hardlink: bool) -> None:
+        if self.reflinks:
+            if _reflink(src, dst):
+                return
+            self.reflinks = False
+        if hardlink:
+            try:
+                os.link(src, dst)
+                return
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.EMLINK, errno.EPERM):
+                    raise
+        shutil.copy2(src, dst)
+
+
+def _replace_prefix(src: str, dst: str, old: bytes, new: bytes) -> None:
+    with open(src, "rb") as fh:
+        data = fh.read()
+    with open(dst, "wb") as fh:
+        fh.write(data.replace(old, new))
+    shutil.copymode(src, dst)
+
+
+def store(root: str, key: str, prefix: str) -> None:
+    """Store the freshly created environment at ``prefix`` as template ``key``."""
+    template = join(root, key)
+    if isdir(template):
+        return
+    os.makedirs(root, exist_ok=True)
+    staging = join(root, f"{key}.{os.getpid()}.tmp")
+    utils.rm_rf(staging)
+    needle = os.fsencode(prefix)
+    linker = _Linker()
+    hardlinked = []
+    with_prefix = []
+    try:
+        files = join(staging, "prefix")
+        os.makedirs(files)
+        for path, entry in _walk(prefix):
+            dst = join(files, path)
+            if entry.is_symlink():
+                os.symlink(os.readlink(entry.path), dst)
+            elif entry.is_dir():
+                os.makedirs(dst, exist_ok=True)
+            elif entry.is_file():
+                # files with a single link were written by conda (or post-link scripts)
+                #    instead of being linked from the package cache
+                shared = entry.stat(follow_symlinks=False).st_nlink > 1
+                if not shared and _contains(entry.path, needle):
+                    with_prefix.append(path)
+                    shutil.copy2(entry.path, dst)
+                    continue
+                if shared:
+                    hardlinked.append(path)
+                linker(entry.path, dst, hardlink=shared)
+        with open(join(staging, MANIFEST), "w") as fh:
+            json.dump(
+                {
+                    "prefix": prefix,
+                    "hardlinked": hardlinked,
+                    "with_prefix": with_prefix,
+                },
+                fh,
+            )
+        os.rename(staging, template)
+    except OSError as e:
+        # e.g. another process stored the same template first
+        log.debug("Could not store environment template %s: %s", key, e)
+    else:
+        log.debug("Stored environment template %s from %s", key, prefix)
+    finally:
+        utils.rm_rf(staging)
+
+
+def clone(root: str, key: str, prefix: str) -> bool:
+    """
+    Create the environment at ``prefix`` from template ``key``. Returns whether there was
+    such a template.
+    """
+    template = join(root, key)
+    try:
+        with open(join(template, MANIFEST)) as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError):
+        return False
+    old = os.fsencode(manifest["prefix"])
+    new = os.fsencode(prefix)
+    if len(old) != len(new):
+        return False
+    files = join(template, "prefix")
+    hardlinked = set(manifest["hardlinked"])
+    with_prefix = set(manifest["with_prefix"])
+    linker = _Linker()
+    try:
+        os.makedirs(prefix, exist_ok=True)
+        for path, entry in _walk(files):
+            dst = join(prefix, path)
+            if entry.is_symlink():
+                target = os.fsencode(os.readlink(entry.path)).replace(old, new)
+                os.symlink(os.fsdecode(target), dst)
+            elif entry.is_dir():
+                os.makedirs(dst, exist_ok=True)
+            elif path in with_prefix:
+                _replace_prefix(entry.path, dst, old, new)
+            else:
+                linker(entry.path, dst, hardlink=path in hardlinked)
+    except OSError as e:
+        log.warning("Could not clone environment template %s: %s", key, e)
+        for path in os.listdir(prefix):
+            utils.rm_rf(join(prefix, path))
+        return False
+    log.debug("Cloned environment template %s into %s", key, prefix)
+    return True
@@ -3,6 +3,8 @@
 from __future__ import annotations
 
 import contextlib
+import hashlib
+import json
 import logging
 import multiprocessing
 import os
@@ -10,14 +12,17 @@ import platform
 import re
 import subprocess
 import sys
+import threading
 import warnings
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from functools import cache
 from glob import glob
 from logging import getLogger
 from os.path import join, normpath
 from typing import TYPE_CHECKING
 
+from conda import __version__ as conda_version
 from conda.base.constants import (
     DEFAULTS_CHANNEL_NAME,
     UNKNOWN_CHANNEL,
@@ -40,11 +45,13 @@ from conda.models.channel import Channel
 from conda.models.match_spec import MatchSpec
 from conda.models.records import PackageRecord
 
-from . import utils
+from . import __version__ as conda_build_version
+from . import env_templates, utils
 from .exceptions import BuildLockError, DependencyNeedsBuildingError
 from .features import feature_list
-from .index import get_build_index
+from .index import get_build_index, get_index_state
 from .os_utils import external
+from .profiler import span
 from .utils import (
     CONDA_PACKAGE_EXTENSIONS,
     ensure_list,
@@ -825,9 +832,40 @@ cached_precs: dict[
 last_index_ts = 0
 
 
+def _solve_cache_path(bldpkgs_dirs, key: dict) -> str:
+    """Where the records of the solve described by ``key`` are cached on disk."""
+    digest = hashlib.sha256(
+        json.dumps(key, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+    return join(os.path.dirname(list(bldpkgs_dirs)[0]), "solve_cache", f"{digest}.json")
+
+
+def _load_cached_solve(path: str) -> list[PackageRecord] | None:
+    try:
+        with open(path) as fh:
+            return [PackageRecord(**record) for record in json.load(fh)]
+    except (OSError, ValueError, TypeError, CondaError):
+        # missing, or being replaced/corrupted by another process
+        return None
+
+
+def _store_cached_solve(path: str, precs: list[PackageRecord]) -> None:
+    # other processes only ever see a complete file
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, "w") as fh:
+            json.dump([prec.dump() for prec in precs], fh)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        utils.rm_rf(tmp_path)
+        utils.get_logger(__name__).debug("could not cache solve in %s: %s", path, e)
+
+
 # NOTE: The function has to retain the "get_install_actions" name for now since
 #       conda_libmamba_solver.solver.LibMambaSolver._called_from_conda_build
 #       checks for this name in the call stack explicitly.
+@span("solve", "environment")
 def get_install_actions(
     prefix: str | os.PathLike | Path,
     specs: Iterable[str | MatchSpec],
@@ -876,15 +914,43 @@ def get_install_actions(
         utils.ensure_valid_spec(spec) for spec in specs if not str(spec).endswith("@")
     )
 
+    key = (specs, env, subdir, channel_urls, disable_pip)
+    in_memory = key in cached_precs and last_index_ts >= index_ts
+    # solves are also cached on disk, keyed by everything the solve depends on, including
+    #   the state of the repodata of every channel
+    solve_cache_path = None
+    cached_solve = None
+    if specs and not in_memory:
+        solve_cache_path = _solve_cache_path(
+            bldpkgs_dirs,
+            {
+                "specs": [str(spec) for spec in specs],
+                "subdir": subdir,
+                "channel_urls": channel_urls,
+                "disable_pip": disable_pip,
+                "index_state": get_index_state(),
+                "channels": context.channels,
+                "channel_priority": context.channel_priority,
+                "pinned_packages": context.pinned_packages,
+                "solver": context.solver,
+                # e.g. __glibc and __cuda, which may be overridden with CONDA_OVERRIDE_*
+                "virtual_packages": sorted(
+                    (record.name, str(record.version), record.build)
+                    for record in context.plugin_manager.get_virtual_package_records()
+                ),
+                "conda": conda_version,
+                "conda_build": conda_build_version,
+            },
+        )
+        cached_solve = _load_cached_solve(solve_cache_path)
+
     precs: list[PackageRecord] = []
-    if (
-        specs,
-        env,
-        subdir,
-        channel_urls,
-        disable_pip,
-    ) in cached_precs and last_index_ts >= index_ts:
-        precs = cached_precs[(specs, env, subdir, channel_urls, disable_pip)].copy()
+    if in_memory:
+        precs = cached_precs[key].copy()
+    elif cached_solve is not None:
+        precs = cached_solve
+        cached_precs[key] = precs.copy()
+        last_index_ts = index_ts
     elif specs:
         # this is hiding output like:
         #    Fetching package metadata ...........
@@ -970,8 +1036,9 @@ def get_install_actions(
                     re.match(rf"^{pkg}(?:$|[\s=].*)", str(dep)) for dep in specs
                 ):
                     precs = [prec for prec in precs if prec.name != pkg]
-        cached_precs[(specs, env, subdir, channel_urls, disable_pip)] = precs.copy()
+        cached_precs[key] = precs.copy()
         last_index_ts = index_ts
+        _store_cached_solve(solve_cache_path, precs)
     return precs
 
 
@@ -979,6 +1046,7 @@ get_package_records = get_install_actions
 del get_install_actions
 
 
+@span("create_env", "environment")
 def create_env(
     prefix: str | os.PathLike | Path,
     specs_or_precs: Iterable[str | MatchSpec] | Iterable[PackageRecord],
@@ -1053,9 +1121,21 @@ def create_env(
                     if utils.on_win:
                         for k, v in os.environ.items():
                             os.environ[k] = str(v)
-                    with env_var("CONDA_QUIET", not config.verbose, reset_context):
-                        with env_var("CONDA_JSON", not config.verbose, reset_context):
-                            _execute_actions(prefix, precs)
+                    template = _template_key(config, precs, prefix)
+                    templates_dir = join(config.croot, "env_templates")
+                    if template and env_templates.clone(
+                        templates_dir, template, str(prefix)
+                    ):
+                        # conda may have cached the prefix's previous contents
+                        PrefixData._cache_.clear()
+                    else:
+                        with env_var("CONDA_QUIET", not config.verbose, reset_context):
+                            with env_var(
+                                "CONDA_JSON", not config.verbose, reset_context
+                            ):
+                                _execute_actions(prefix, precs)
+                        if template:
+                            env_templates.store(templates_dir, template, str(prefix))
             except (
                 SystemExit,
                 PaddingError,
@@ -1198,6 +1278,114 @@ def create_env(
                     raise
 
 
+def _template_key(config, precs, prefix) -> str | None:
+    if not config.env_templates or utils.on_win:
+        return None
+    return env_templates.template_key(precs, str(prefix))
+
+
+@span("create_envs", "environment")
+def create_envs(
+    envs: Iterable[tuple[str, str | os.PathLike | Path, Iterable[PackageRecord], str]],
+    config,
+    is_cross: bool = False,
+    is_conda: bool = False,
+) -> None:
+    """
+    Create several conda environments from already solved package records.
+
+    ``envs`` are ``(env, prefix, precs, subdir)`` tuples. The packages of all environments
+    are fetched and extracted in one go and the environments are then linked one after
+    another, or in parallel with ``config.concurrent_envs``, holding the conda operation
+    locks throughout. Should that fail, the environments are
+    created one after another with :func:`create_env`, which knows how to recover from
+    the various ways conda can fail.
+    """
+    envs = [(env, prefix, tuple(precs), subdir) for env, prefix, precs, subdir in envs]
+    if sum(1 for *_, precs, _ in envs if precs) < 2:
+        for env, prefix, precs, subdir in envs:
+            create_env(
+                prefix,
+                precs,
+                env=env,
+                config=config,
+                subdir=subdir,
+                is_cross=is_cross,
+                is_conda=is_conda,
+            )
+        return
+
+    log = utils.get_logger(__name__)
+    with utils.LoggingContext(logging.DEBUG if config.debug else logging.WARN):
+        for _, prefix, _, _ in envs:
+            if os.path.exists(prefix):
+                for entry in glob(os.path.join(prefix, "*")):
+                    utils.rm_rf(entry)
+
+        locks = utils.get_conda_operation_locks(
+            config.locking,
+            config.bldpkgs_dirs,
+            config.timeout,
+        )
+        try:
+            with utils.try_acquire_locks(locks, timeout=config.timeout):
+                templates_dir = join(config.croot, "env_templates")
+                actions = {}
+                templates = {}
+                for env, prefix, precs, subdir in envs:
+                    if not precs:
+                        continue
+                    log.debug("Creating %s environment in %s", env, prefix)
+                    _display_actions(prefix, precs)
+                    template = _template_key(config, precs, prefix)
+                    if template and env_templates.clone(
+                        templates_dir, template, str(prefix)
+                    ):
+                        continue
+                    actions[str(prefix)] = precs
+                    templates[str(prefix)] = template
+                # conda may have cached the prefixes' previous contents
+                PrefixData._cache_.clear()
+                if utils.on_win:
+                    for k, v in os.environ.items():
+                        os.environ[k] = str(v)
+                with env_var("CONDA_QUIET", not config.verbose, reset_context):
+                    with env_var("CONDA_JSON", not config.verbose, reset_context):
+                        _execute_actions_together(
+                            actions, concurrent=config.concurrent_envs
+                        )
+                for prefix, template in templates.items():
+                    if template:
+                        env_templates.store(templates_dir, template, prefix)
+        except (
+            SystemExit,
+            PaddingError,
+            LinkError,
+            CondaError,
+            BuildLockError,
+            LockError,
+            AssertionError,
+            OSError,
+            ValueError,
+            RuntimeError,
+        ) as exc:
+            log.warning(
+                "failed to create environments together, creating them one at a time.  "
+                "exception was: %s",
+                str(exc),
+            )
+            for env, prefix, precs, subdir in envs:
+                create_env(
+                    prefix,
+                    precs,
+                    env=env,
+                    config=config,
+                    subdir=subdir,
+                    is_cross=is_cross,
+                    is_conda=is_conda,
+                )
+
+
 def get_pkg_dirs_locks(dirs, config):
     return [utils.get_lock(folder, timeout=config.timeout) for folder in dirs]
 
@@ -1331,6 +1519,50 @@ def _execute_actions(prefix, precs):
     unlink_link_transaction.execute()
 
 
+def _execute_actions_together(
+    actions: dict[str, Iterable[PackageRecord]], concurrent: bool = False
+) -> None:
+    """
+    :func:`_execute_actions` for several prefixes (``{prefix: precs}``) at once: all
+    packages are fetched and extracted together and the prefixes are then linked one
+    after another, or in parallel threads if ``concurrent`` is set (opt-in, conda does
+    not promise that link transactions are thread-safe).
+    """
+    actions = {
+        prefix: [
+            *(prec for prec in precs if prec.name == "menuinst"),
+            *(prec for prec in precs if prec.name != "menuinst"),
+        ]
+        for prefix, precs in actions.items()
+    }
+    if not actions:
+        return
+
+    # the same package is often needed in several prefixes, fetch it only once
+    progressive_fetch_extract = ProgressiveFetchExtract(
+        list(dict.fromkeys(prec for precs in actions.values() for prec in precs))
+    )
+    progressive_fetch_extract.prepare()
+
+    transactions = [
+        UnlinkLinkTransaction(PrefixSetup(prefix, (), precs, (), [], ()))
+        for prefix, precs in actions.items()
+    ]
+
+    log.debug(" %s(%r)", "PROGRESSIVEFETCHEXTRACT", progressive_fetch_extract)
+    progressive_fetch_extract.execute()
+    if not concurrent:
+        for transaction in transactions:
+            log.debug(" %s(%r)", "UNLINKLINKTRANSACTION", transaction)
+            transaction.execute()
+        return
+    with ThreadPoolExecutor(len(transactions)) as executor:
+        futures = [executor.submit(transaction.execute) for transaction in transactions]
+        for transaction, future in zip(transactions, futures):
+            log.debug(" %s(%r)", "UNLINKLINKTRANSACTION", transaction)
+            future.result()
+
+
 def _display_actions(prefix, precs):
     # This is copied over from https://github.com/conda/conda/blob/23.11.0/conda/plan.py#L58
     # but reduced to only the functionality actually used within conda-build.
@@ -78,6 +78,14 @@ class DependencyNeedsBuildingError(CondaBuildException):
                 f"failed to parse packages from exception: {conda_exception}"
             )
 
+    def __reduce__(self):
+        # rebuild from the parsed packages, the conda exception may not pickle
+        return (
+            self.__class__,
+            (None, self.packages, self.subdir),
+            {"matchspecs": self.matchspecs},
+        )
+
     def __str__(self):
         return self.message
 
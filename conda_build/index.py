@@ -2,21 +2,36 @@
 # SPDX-License-Identifier: BSD-3-Clause
 from __future__ import annotations
 
+import hashlib
+import json
 import logging
 import os
 from functools import partial
-from os.path import dirname
+from os.path import basename, dirname, join
+from typing import TYPE_CHECKING
+from urllib.parse import urlparse
+from urllib.request import url2pathname
 
+import conda_package_handling.api
 from conda.base.context import context
 from conda.core.index import Index
+from conda.core.subdir_data import SubdirData
 from conda.exceptions import CondaHTTPError
+from conda.gateways.disk.create import TemporaryDirectory
+from conda.models.channel import Channel
 from conda.utils import url_path
 
 from . import utils
+from .profiler import span
 from .utils import (
     get_logger,
 )
 
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from conda.models.records import PackageRecord
+
 try:
     from conda_index.index import update_index as _update_index
 except ImportError:
@@ -33,11 +48,210 @@ cached_index = None
 local_subdir = ""
 local_output_folder = ""
 cached_channels = []
+# channels the cached index was loaded from, in priority order
+cached_index_channels = []
+# lookup tables of the records of the cached index, built on first use
+cached_index_records = None
 
 # TODO: this is to make sure that the index doesn't leak tokens.  It breaks use of private channels, though.
 # os.environ['CONDA_ADD_ANACONDA_TOKEN'] = "false"
 
+#: repodata files (as written by conda-index) that newly built packages are added to
+REPODATA_FILENAMES = (
+    "repodata.json",
+    "repodata_from_packages.json",
+)
+
+
+class LocalChannelIndex:
+    """
+    Deferred, incremental index of the local channels that built packages are written to.
+
+    Packages are recorded with :meth:`add` as they are created. :meth:`flush` then adds just
+    those packages to their subdir's repodata instead of re-indexing the whole channel, and
+    :func:`get_build_index` only flushes once a solve needs the local channel.
+    ``current_repodata.json`` is rebuilt from the new repodata and an existing
+    ``run_exports.json`` is updated as well. ``channeldata.json`` needs the metadata of
+    every package, so :meth:`finalize` leaves it to conda-index, once at the end.
+    """
+
+    def __init__(self):
+        # channel -> subdir -> filenames
+        self._pending: dict[str, dict[str, set[str]]] = {}
+        # (channel, subdir) -> (mtime of repodata.json, repodata)
+        self._repodata: dict[tuple[str, str], tuple[float, dict]] = {}
+        # channels that have been fully indexed by conda-index in this process
+        self.indexed: set[str] = set()
+        # channels whose channeldata.json is behind their repodata
+        self._stale: set[str] = set()
+
+    def add(self, package_path: str | os.PathLike) -> None:
+        """Record a package that was added to (or removed from) a local channel subdir."""
+        package_path = os.path.abspath(package_path)
+        subdir_path = dirname(package_path)
+        self._pending.setdefault(dirname(subdir_path), {}).setdefault(
+            basename(subdir_path), set()
+        ).add(basename(package_path))
+
+    def has_pending(self, channel: str | os.PathLike) -> bool:
+        return bool(self._pending.get(os.path.abspath(channel)))
+
+    def discard_pending(self, channel: str | os.PathLike) -> None:
+        """Forget pending packages, e.g. because the whole channel was just indexed."""
+        channel = os.path.abspath(channel)
+        self._pending.pop(channel, None)
+        self._stale.discard(channel)
+
+    def flush(self, channel: str | os.PathLike | None = None, verbose=False) -> None:
+        """Add the pending packages of ``channel`` (default: all channels) to the repodata."""
+        channels = (
+            [os.path.abspath(channel)] if channel else sorted(self._pending.keys())
+        )
+        for channel in channels:
+            for subdir, filenames in sorted(self._pending.pop(channel, {}).items()):
+                repodata = self._load_repodata(channel, subdir)
+                if repodata is None:
+                    # no index yet, let conda-index create it
+                    _delegated_update_index(
+                        join(channel, subdir), verbose=verbose, threads=1
+                    )
+                    continue
+                self._update_subdir(channel, subdir, repodata, filenames)
+                self._stale.add(channel)
+
+    def finalize(self, verbose=False) -> None:
+        """
+        Flush all pending packages, then have conda-index bring the whole index of every
+        channel that was updated incrementally up to date, including ``channeldata.json``.
+        """
+        self.flush(verbose=verbose)
+        for channel in sorted(self._stale):
+            _delegated_update_index(channel, verbose=verbose, threads=1)
+        self._stale.clear()
+
+    def _load_repodata(self, channel: str, subdir: str) -> dict | None:
+        """A local subdir's repodata.json, cached while unchanged (None if there is none)."""
+        path = join(channel, subdir, "repodata.json")
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        cached = self._repodata.get((channel, subdir))
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            with open(path) as fh:
+                repodata = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        self._repodata[(channel, subdir)] = (mtime, repodata)
+        return repodata
+
+    def _update_subdir(self, channel, subdir, repodata, filenames):
+        records = {}
+        run_exports = {}
+        for filename in sorted(filenames):
+            path = join(channel, subdir, filename)
+            if os.path.isfile(path):
+                records[filename], run_exports[filename] = _index_record(path)
+            else:
+                records[filename] = run_exports[filename] = None
+
+        for repodata_fn in REPODATA_FILENAMES:
+            path = join(channel, subdir, repodata_fn)
+            if repodata_fn == "repodata.json":
+                data = repodata
+            elif os.path.isfile(path):
+                with open(path) as fh:
+                    data = json.load(fh)
+            else:
+                continue
+            _update_packages(data, records)
+            _write_json(path, data)
+
+        path = join(channel, subdir, "current_repodata.json")
+        if os.path.isfile(path):
+            _write_json(path, _current_repodata(subdir, repodata))
+
+        # only written by conda-index on request, keep it in sync if it is there
+        path = join(channel, subdir, "run_exports.json")
+        if os.path.isfile(path):
+            with open(path) as fh:
+                data = json.load(fh)
+            _update_packages(
+                data,
+                {
+                    filename: None if exports is None else {"run_exports": exports}
+                    for filename, exports in run_exports.items()
+                },
+            )
+            _write_json(path, data)
+
+        self._repodata[(channel, subdir)] = (
+            os.path.getmtime(join(channel, subdir, "repodata.json")),
+            repodata,
+        )
+
+
+def _update_packages(data: dict, records: dict[str, dict | None]) -> None:
+    """Add records to (or remove them from, if None) repodata-like ``data``."""
+    for filename, record in records.items():
+        key = "packages.conda" if filename.endswith(".conda") else "packages"
+        if record is None:
+            data.get(key, {}).pop(filename, None)
+        else:
+            data.setdefault(key, {})[filename] = record
+
+
+def _write_json(path: str, data: dict) -> None:
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as fh:
+        json.dump(data, fh, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
 
+
+def _current_repodata(subdir: str, repodata: dict) -> dict:
+    """The current_repodata.json conda-index would write for ``repodata``."""
+    try:
+        from conda_index.index.current_repodata import build_current_repodata
+    except ImportError:
+        # older conda-index, every package is "current" then
+        return repodata
+    return build_current_repodata(subdir, repodata, pins=None)
+
+
+def _index_record(package_path: str) -> tuple[dict, dict]:
+    """
+    The repodata record conda-index would create for a package, and the package's
+    run_exports.
+    """
+    with TemporaryDirectory() as tmp:
+        conda_package_handling.api.extract(
+            package_path, dest_dir=tmp, components="info"
+        )
+        with open(join(tmp, "info", "index.json")) as fh:
+            record = json.load(fh)
+        try:
+            with open(join(tmp, "info", "run_exports.json")) as fh:
+                run_exports = json.load(fh)
+        except FileNotFoundError:
+            run_exports = {}
+    md5 = hashlib.md5()
+    sha256 = hashlib.sha256()
+    with open(package_path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            md5.update(block)
+            sha256.update(block)
+    record["md5"] = md5.hexdigest()
+    record["sha256"] = sha256.hexdigest()
+    record["size"] = os.path.getsize(package_path)
+    return record, run_exports
+
+
+local_channel_index = LocalChannelIndex()
+
+
+@span("get_build_index", "index")
 def get_build_index(
     subdir,
     bldpkgs_dir,
@@ -57,6 +271,8 @@ def get_build_index(
     global local_output_folder
     global cached_index
     global cached_channels
+    global cached_index_channels
+    global cached_index_records
     mtime = 0
 
     channel_urls = list(utils.ensure_list(channel_urls))
@@ -76,6 +292,7 @@ def get_build_index(
         or local_output_folder != output_folder
         or mtime > local_index_timestamp
         or cached_channels != channel_urls
+        or local_channel_index.has_pending(output_folder)
     ):
         # priority: (local as either croot or output_folder IF NOT EXPLICITLY IN CHANNEL ARGS),
         #     then channels passed as args (if local in this, it remains in same order),
@@ -101,7 +318,17 @@ def get_build_index(
                 if local_path not in urls:
                     urls.insert(0, local_path)
             _ensure_valid_channel(output_folder, subdir)
-            _delegated_update_index(output_folder, verbose=debug)
+            local_channel = os.path.abspath(output_folder)
+            if local_channel in local_channel_index.indexed and os.path.isfile(
+                index_file
+            ):
+                local_channel_index.flush(local_channel, verbose=debug)
+            else:
+                # index everything already in the channel once, after that only the
+                #     packages built by us need to be added
+                _delegated_update_index(output_folder, verbose=debug)
+                local_channel_index.indexed.add(local_channel)
+                local_channel_index.discard_pending(local_channel)
 
             # replace noarch with native subdir - this ends up building an index with both the
             #      native content and the noarch content.
@@ -133,9 +360,78 @@ def get_build_index(
         local_subdir = subdir
         local_output_folder = output_folder
         cached_channels = channel_urls
+        cached_index_channels = urls + (
+            list(context.channels) if not omit_defaults else []
+        )
+        cached_index_records = None
     return cached_index, local_index_timestamp, None
 
 
+class IndexRecords:
+    """
+    Records of an index from :func:`get_build_index` keyed by ``(name, version, build)``
+    and by filename. Where channels carry the same package, the record the index yields
+    first (the highest priority channel) wins.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.by_dist: dict[tuple[str, str, str], PackageRecord] = {}
+        self.by_fn: dict[str, PackageRecord] = {}
+        for rec in index:
+            self.by_dist.setdefault((rec.name, rec.version, rec.build), rec)
+            self.by_fn.setdefault(rec.fn, rec)
+
+    def get(self, name: str, version: str, build: str) -> PackageRecord | None:
+        return self.by_dist.get((name, version, build))
+
+    def get_by_fn(self, fn: str) -> PackageRecord | None:
+        return self.by_fn.get(fn)
+
+
+def get_index_records(index) -> IndexRecords:
+    """
+    Lookup tables for ``index``, built once per index :func:`get_build_index` returns.
+    """
+    global cached_index_records
+    if cached_index_records is None or cached_index_records.index is not index:
+        cached_index_records = IndexRecords(index)
+    return cached_index_records
+
+
+def get_index_state(
+    channels: Iterable[str] | None = None, subdir: str | None = None
+) -> str:
+    """
+    Digest of the repodata behind the index :func:`get_build_index` returned last, or
+    behind an index of ``channels`` for ``subdir`` (which need not be loaded yet).
+
+    It covers every subdir of every channel of the index: the repodata.json of local
+    channels (so the local channel's package set is included) and conda's cached repodata
+    of remote ones.
+    """
+    if channels is None:
+        channels = cached_index_channels
+    if subdir is None:
+        subdir = local_subdir
+    state = []
+    for channel in channels:
+        for url in Channel(channel).urls(
+            with_credentials=False, subdirs=(subdir, "noarch")
+        ):
+            if url.startswith("file:"):
+                path = join(url2pathname(urlparse(url).path), "repodata.json")
+            else:
+                path = SubdirData(Channel(url)).cache_path_json
+            try:
+                st = os.stat(path)
+            except OSError:
+                state.append([url, None])
+            else:
+                state.append([url, st.st_mtime_ns, st.st_size])
+    return hashlib.sha256(json.dumps(state).encode("utf-8")).hexdigest()
+
+
 def _ensure_valid_channel(local_folder, subdir):
     for folder in {subdir, "noarch"}:
         path = os.path.join(local_folder, folder)
@@ -143,6 +439,7 @@ def _ensure_valid_channel(local_folder, subdir):
             os.makedirs(path)
 
 
+@span("update_index", "index")
 def _delegated_update_index(
     dir_path,
     check_md5=False,
@@ -5,9 +5,10 @@ from __future__ import annotations
 import json
 import os
 import sys
+import threading
 from collections import defaultdict
 from itertools import groupby
-from operator import itemgetter
+from operator import is_, itemgetter
 from os.path import abspath, basename, dirname, exists, join, normcase
 from pathlib import Path
 from tempfile import TemporaryDirectory
@@ -65,9 +66,51 @@ def which_package(
     #       require case-sensitive matches (i.e., normcase on macOS is a no-op).
     normcase_path = normcase(path)
 
-    for prec in PrefixData(str(prefix)).iter_records():
-        if normcase_path in (normcase(file) for file in prec["files"]):
-            yield prec
+    yield from _get_ownership_index(prefix).get(normcase_path, ())
+
+
+#: per prefix: the conda-meta mtime and records an ownership index was built from,
+#:     and the index
+_ownership_indexes: dict[
+    str, tuple[int | None, tuple[PrefixRecord, ...], dict[str, list[PrefixRecord]]]
+] = {}
+_ownership_lock = threading.Lock()
+
+
+def _get_ownership_index(
+    prefix: str | os.PathLike | Path,
+) -> dict[str, list[PrefixRecord]]:
+    """Map the normcased path of every file installed in a prefix to its package(s).
+
+    Built once per prefix and shared by all :func:`which_package` calls, rebuilt when
+    the mtime of conda-meta or the prefix's records change.
+    """
+    prefix = str(prefix)
+    records = tuple(PrefixData(prefix).iter_records())
+    try:
+        mtime = os.stat(join(prefix, "conda-meta")).st_mtime_ns
+    except OSError:
+        mtime = None
+
+    with _ownership_lock:
+        if (cached := _ownership_indexes.get(prefix)) is not None:
+            cached_mtime, cached_records, index = cached
+            if (
+                cached_mtime == mtime
+                and len(cached_records) == len(records)
+                and all(map(is_, cached_records, records))
+            ):
+                return index
+
+        index = {}
+        for prec in records:
+            for file in prec["files"]:
+                owners = index.setdefault(normcase(file), [])
+                # a package listing the same file twice still owns it once
+                if not owners or owners[-1] is not prec:
+                    owners.append(prec)
+        _ownership_indexes[prefix] = (mtime, records, index)
+        return index
 
 
 def print_object_info(info, key):
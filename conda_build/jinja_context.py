@@ -8,6 +8,7 @@ import os
 import pathlib
 import re
 import time
+from collections import OrderedDict
 from functools import partial
 from io import StringIO, TextIOBase
 from subprocess import CalledProcessError
@@ -142,6 +143,103 @@ class FilteredLoader(jinja2.BaseLoader):
         )
 
 
+class CompiledTemplateCache(jinja2.BytecodeCache):
+    """
+    Process-wide cache of compiled templates.
+
+    Compiled code is kept per template (name and filename) and checksum of its source after
+    selectors were applied, so a template is compiled once per distinct filtered source
+    instead of once per render pass. Only the ``max_entries`` most recently used templates
+    are kept.
+    """
+
+    max_entries = 256
+
+    def __init__(self):
+        self._code = OrderedDict()
+
+    def _get(self, key):
+        code = self._code.get(key)
+        if code is not None:
+            self._code.move_to_end(key)
+        return code
+
+    def _set(self, key, code) -> None:
+        self._code[key] = code
+        self._code.move_to_end(key)
+        while len(self._code) > self.max_entries:
+            self._code.popitem(last=False)
+
+    def load_bytecode(self, bucket: jinja2.bccache.Bucket) -> None:
+        code = self._get((bucket.key, bucket.checksum))
+        if code is not None:
+            bucket.code = code
+
+    def dump_bytecode(self, bucket: jinja2.bccache.Bucket) -> None:
+        self._set((bucket.key, bucket.checksum), bucket.code)
+
+    def clear(self) -> None:
+        self._code.clear()
+
+    def from_string(self, environment: jinja2.Environment, source: str):
+        """Like :meth:`jinja2.Environment.from_string`, with the compiled code cached."""
+        key = ("<string>", self.get_source_checksum(source))
+        code = self._get(key)
+        if code is None:
+            code = environment.compile(source)
+            self._set(key, code)
+        return environment.template_class.from_code(
+            environment, code, environment.make_globals(None)
+        )
+
+
+#: compiled templates shared by all :func:`get_environment` environments
+template_cache = CompiledTemplateCache()
+
+_environments: dict[tuple, jinja2.Environment] = {}
+
+
+def get_environment(
+    recipe_dir: str,
+    conda_env_path: str | None,
+    undefined: type[jinja2.Undefined],
+    config,
+    globals: dict[str, Any],
+) -> jinja2.Environment:
+    """
+    Jinja2 environment for rendering a recipe in ``recipe_dir`` with ``config``.
+
+    A base environment is created once per loader search path and undefined type; each call
+    returns a lightweight overlay of it with its own selector-filtering loader and its own
+    ``globals``, so renders never see another recipe's config or globals. Templates are
+    looked up through the loader on every render (so changed files and selectors are picked
+    up) but compiled only once, see :data:`template_cache`.
+    """
+    key = (recipe_dir, conda_env_path, undefined)
+    base = _environments.get(key)
+    if base is None:
+        loaders = [  # search relative to '<conda_root>/Lib/site-packages/conda_build/templates'
+            jinja2.PackageLoader("conda_build"),
+            # search relative to RECIPE_DIR
+            jinja2.FileSystemLoader(recipe_dir),
+        ]
+        # search relative to current conda environment directory
+        if conda_env_path:
+            env_loader = jinja2.FileSystemLoader(conda_env_path)
+            loaders.append(jinja2.PrefixLoader({"$CONDA_DEFAULT_ENV": env_loader}))
+        base = _environments[key] = jinja2.Environment(
+            loader=jinja2.ChoiceLoader(loaders),
+            undefined=undefined,
+            # the filtered source depends on the config, only the compiled code is reused
+            cache_size=0,
+            bytecode_cache=template_cache,
+        )
+    env = base.overlay(loader=FilteredLoader(base.loader, config=config))
+    # overlays share the globals dict of their base, never modify it in place
+    env.globals = {**base.globals, **globals}
+    return env
+
+
 def load_setup_py_data(
     m,
     setup_file="setup.py",
@@ -2024,17 +2024,13 @@ class MetaData:
                                 evaluate to an emtpy string, without emitting an error.
         """
         from .jinja_context import (
-            FilteredLoader,
             UndefinedNeverFail,
             context_processor,
+            get_environment,
+            template_cache,
         )
 
         path, filename = os.path.split(self.meta_path)
-        loaders = [  # search relative to '<conda_root>/Lib/site-packages/conda_build/templates'
-            jinja2.PackageLoader("conda_build"),
-            # search relative to RECIPE_DIR
-            jinja2.FileSystemLoader(path),
-        ]
 
         # search relative to current conda environment directory
         conda_env_path = os.environ.get(
@@ -2043,8 +2039,8 @@ class MetaData:
         if conda_env_path and os.path.isdir(conda_env_path):
             conda_env_path = os.path.abspath(conda_env_path)
             conda_env_path = conda_env_path.replace("\\", "/")  # need unix-style path
-            env_loader = jinja2.FileSystemLoader(conda_env_path)
-            loaders.append(jinja2.PrefixLoader({"$CONDA_DEFAULT_ENV": env_loader}))
+        else:
+            conda_env_path = None
 
         undefined_type = jinja2.StrictUndefined
         if permit_undefined_jinja:
@@ -2053,15 +2049,13 @@ class MetaData:
             UndefinedNeverFail.all_undefined_names = []
             undefined_type = UndefinedNeverFail
 
-        loader = FilteredLoader(jinja2.ChoiceLoader(loaders), config=self.config)
-        env = jinja2.Environment(loader=loader, undefined=undefined_type)
-
         from .environ import get_dict
 
-        env.globals.update(get_selectors(self.config))
-        env.globals.update(get_dict(m=self, skip_build_id=skip_build_id))
-        env.globals.update({"CONDA_BUILD_STATE": "RENDER"})
-        env.globals.update(
+        env_globals = {}
+        env_globals.update(get_selectors(self.config))
+        env_globals.update(get_dict(m=self, skip_build_id=skip_build_id))
+        env_globals.update({"CONDA_BUILD_STATE": "RENDER"})
+        env_globals.update(
             context_processor(
                 self,
                 path,
@@ -2076,7 +2070,10 @@ class MetaData:
         # override PKG_NAME with custom value.  This gets used when an output needs to pretend
         #   that it is top-level when getting the top-level recipe data.
         if alt_name:
-            env.globals.update({"PKG_NAME": alt_name})
+            env_globals.update({"PKG_NAME": alt_name})
+        env = get_environment(
+            path, conda_env_path, undefined_type, self.config, env_globals
+        )
 
         # Future goal here.  Not supporting jinja2 on replaced sections right now.
 
@@ -2087,11 +2084,11 @@ class MetaData:
 
         try:
             if template_string:
-                template = env.from_string(template_string)
+                template = template_cache.from_string(env, template_string)
             elif filename:
                 template = env.get_or_select_template(filename)
             else:
-                template = env.from_string("")
+                template = template_cache.from_string(env, "")
 
             os.environ["CONDA_BUILD_STATE"] = "RENDER"
             rendered = template.render(environment=env)
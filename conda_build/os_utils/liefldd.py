@@ -5,8 +5,10 @@ from __future__ import annotations
 import hashlib
 import json
 import os
+import pickle
 import struct
 import threading
+import time
 from collections.abc import Hashable
 from fnmatch import fnmatch
 from functools import partial
@@ -15,7 +17,8 @@ from subprocess import PIPE, Popen
 
 from conda.models.version import VersionOrder
 
-from ..utils import on_mac, on_win, rec_glob
+from .. import __version__ as conda_build_version
+from ..utils import get_logger, on_mac, on_win, rec_glob, rm_rf
 from .external import find_executable
 
 # lief cannot handle files it doesn't know about gracefully
@@ -1174,31 +1177,94 @@ class memoized_by_arg0_filehash:
     If called later with the same arguments, the cached value is returned
     (not reevaluated).
 
-    The first argument is required to be an existing filename and it is
-    always converted to an inode number.
+    The first argument is required to be an existing filename. In-process, it is
+    converted to its real path and stat information (device, inode, size and mtime),
+    so a file is not read just to look up its cached results.
+
+    If :attr:`cache_dir` is set, the results of functions that only depend on the file
+    contents are also stored on disk, keyed by the sha1 of the contents, so they are
+    shared between builds and the files of dependency packages are not parsed again.
+    Results that depend on where the file is (such as linkages, which are resolved
+    against the libraries around it at the time) are only cached in-process. Results
+    that were not used for :attr:`max_age` seconds are removed by :meth:`prune`.
     """
 
-    def __init__(self, func):
+    #: where results are persisted, per function, ``None`` to keep them in-process
+    cache_dir: str | None = None
+    #: results on disk that were not used for this long (in seconds) are pruned
+    max_age = 30 * 24 * 60 * 60
+
+    def __init__(self, func, path_dependent=True):
         self.func = func
+        #: whether the results depend on the location of the file, not only its contents
+        self.path_dependent = path_dependent
         self.cache = {}
         self.lock = threading.Lock()
 
+    @classmethod
+    def prune(cls, cache_dir: str) -> None:
+        """Remove results from ``cache_dir`` that were not used for :attr:`max_age`."""
+        cutoff = time.time() - cls.max_age
+        for path in Path(cache_dir).glob("*/*.pickle"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError:
+                # removed by another process
+                pass
+
+    def _file_key(self, filename):
+        path = os.path.realpath(filename)
+        st = os.stat(path)
+        return (path, st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _persistent_path(self, path, args, kw):
+        sha1 = hashlib.sha1()
+        with open(path, "rb") as f:
+            while True:
+                data = f.read(65536)
+                if not data:
+                    break
+                sha1.update(data)
+        lief_version = lief.__version__ if have_lief else None
+        sha1.update(
+            repr((args, sorted(kw.items()), lief_version, conda_build_version)).encode(
+                "utf-8"
+            )
+        )
+        return os.path.join(
+            self.cache_dir, self.func.__name__, f"{sha1.hexdigest()}.pickle"
+        )
+
+    def _load(self, path):
+        try:
+            with open(path, "rb") as fh:
+                value = pickle.load(fh)
+            # keep results that are still used from being pruned
+            os.utime(path)
+            return True, value
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            # missing, or being replaced/corrupted by another process
+            return False, None
+
+    def _store(self, path, value):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as fh:
+                pickle.dump(value, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except (OSError, pickle.PicklingError) as e:
+            rm_rf(tmp_path)
+            get_logger(__name__).debug(
+                "could not cache %s in %s: %s", self.func.__name__, path, e
+            )
+
     def __call__(self, *args, **kw):
         newargs = []
         for arg in args:
             if arg is args[0]:
-                sha1 = hashlib.sha1()
-                with open(arg, "rb") as f:
-                    while True:
-                        data = f.read(65536)
-                        if not data:
-                            break
-                        sha1.update(data)
-                # update with file name, if its a different
-                # file with the same contents, we don't want
-                # to treat it as cached
-                sha1.update(os.path.realpath(arg).encode("utf-8"))
-                arg = sha1.hexdigest()
+                arg = self._file_key(arg)
             if isinstance(arg, list):
                 newargs.append(tuple(arg))
             elif not isinstance(arg, Hashable):
@@ -1212,28 +1278,38 @@ class memoized_by_arg0_filehash:
         with self.lock:
             if key in self.cache:
                 return self.cache[key]
-            else:
-                value = self.func(*args, **kw)
-                self.cache[key] = value
-                return value
 
+        # parse outside of the lock, so that different files are parsed concurrently
+        persistent_path = None
+        if self.cache_dir and not self.path_dependent:
+            persistent_path = self._persistent_path(newargs[0][0], newargs[1:], kw)
+            found, value = self._load(persistent_path)
+            if found:
+                with self.lock:
+                    return self.cache.setdefault(key, value)
+        value = self.func(*args, **kw)
+        if persistent_path:
+            self._store(persistent_path, value)
+        with self.lock:
+            return self.cache.setdefault(key, value)
 
-@memoized_by_arg0_filehash
+
+@partial(memoized_by_arg0_filehash, path_dependent=False)
 def get_exports_memoized(filename, arch="native", enable_static=False):
     return get_exports(filename, arch=arch, enable_static=enable_static)
 
 
-@memoized_by_arg0_filehash
+@partial(memoized_by_arg0_filehash, path_dependent=False)
 def get_imports_memoized(filename, arch="native"):
     return get_imports(filename, arch=arch)
 
 
-@memoized_by_arg0_filehash
+@partial(memoized_by_arg0_filehash, path_dependent=False)
 def get_relocations_memoized(filename, arch="native"):
     return get_relocations(filename, arch=arch)
 
 
-@memoized_by_arg0_filehash
+@partial(memoized_by_arg0_filehash, path_dependent=False)
 def get_symbols_memoized(filename, defined, undefined, arch):
     return get_symbols(filename, defined=defined, undefined=undefined, arch=arch)
 
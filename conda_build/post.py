@@ -11,6 +11,7 @@ import stat
 import sys
 import traceback
 from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from copy import copy
 from fnmatch import filter as fnmatch_filter
 from fnmatch import fnmatch
@@ -32,7 +33,7 @@ from os.path import (
     splitext,
 )
 from pathlib import Path
-from subprocess import CalledProcessError, call, check_output
+from subprocess import CalledProcessError, call, check_output, run
 from typing import TYPE_CHECKING
 
 from conda.core.prefix_data import PrefixData
@@ -55,8 +56,10 @@ from .os_utils.liefldd import (
     get_exports_memoized,
     get_linkages_memoized,
     get_rpaths_raw,
+    get_runpaths_or_rpaths_raw,
     get_runpaths_raw,
     have_lief,
+    memoized_by_arg0_filehash,
     set_rpath,
 )
 from .os_utils.pyldd import (
@@ -66,6 +69,7 @@ from .os_utils.pyldd import (
     elffile,
     machofile,
 )
+from .profiler import span
 from .utils import (
     FALLBACK_MENUINST_SCHEMA,
     VALID_SCHEMA_LOCATIONS,
@@ -283,7 +287,7 @@ def rm_share_info_dir(files, prefix):
             os.unlink(fn)
 
 
-def compile_missing_pyc(files, cwd, python_exe, skip_compile_pyc=()):
+def compile_missing_pyc(files, cwd, python_exe, skip_compile_pyc=(), max_workers=None):
     if not isfile(python_exe):
         return
     compile_files = []
@@ -291,7 +295,8 @@ def compile_missing_pyc(files, cwd, python_exe, skip_compile_pyc=()):
     skipped_files = set()
     for skip in skip_compile_pyc_n:
         skipped_files.update(set(fnmatch_filter(files, skip)))
-    unskipped_files = set(files) - skipped_files
+    all_files = set(files)
+    unskipped_files = all_files - skipped_files
     for fn in unskipped_files:
         # omit files in Library/bin, Scripts, and the root prefix - they are not generally imported
         if on_win:
@@ -308,7 +313,7 @@ def compile_missing_pyc(files, cwd, python_exe, skip_compile_pyc=()):
         cache_prefix = "__pycache__" + os.sep
         if (
             fn.endswith(".py")
-            and dirname(fn) + cache_prefix + basename(fn) + "c" not in files
+            and dirname(fn) + cache_prefix + basename(fn) + "c" not in all_files
         ):
             compile_files.append(fn)
 
@@ -317,28 +322,28 @@ def compile_missing_pyc(files, cwd, python_exe, skip_compile_pyc=()):
             print("compiling .pyc files... failed as no python interpreter was found")
         else:
             print("compiling .pyc files...")
-            # We avoid command lines longer than 8190
-            if on_win:
-                limit = 8190
-            else:
-                limit = 32760
-            limit -= len(compile_files) * 2
-            lower_limit = len(max(compile_files, key=len)) + 1
-            if limit < lower_limit:
-                limit = lower_limit
-            groups = [[]]
-            args = [python_exe, "-Wi", "-m", "py_compile"]
-            args_len = length = len(" ".join(args)) + 1
-            for f in compile_files:
-                length_this = len(f) + 1
-                if length_this + length > limit:
-                    groups.append([])
-                    length = args_len
-                else:
-                    length += length_this
-                groups[len(groups) - 1].append(f)
-            for group in groups:
-                call(args + group, cwd=cwd)
+            # compileall only compiles the contents of directories in parallel, so the
+            #   files are split between several interpreters instead. Their names are
+            #   passed on stdin, which avoids limits on the length of command lines.
+            #   Without --invalidation-mode, SOURCE_DATE_EPOCH selects checked hash-based
+            #   pycs (see py_compile), just like `python -m py_compile` did.
+            args = [python_exe, "-Wi", "-m", "compileall", "-q", "-f", "-i", "-"]
+            compile_files.sort()
+            max_workers = min(utils.get_max_workers(max_workers), len(compile_files))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [
+                    executor.submit(
+                        run,
+                        args,
+                        input=os.fsencode(
+                            "\n".join(compile_files[group::max_workers]) + "\n"
+                        ),
+                        cwd=cwd,
+                    )
+                    for group in range(max_workers)
+                ]
+                for future in futures:
+                    future.result()
 
 
 def check_dist_info_version(name, version, files):
@@ -589,20 +594,63 @@ def check_binary_patchers(elf, prefix, rpath):
 """
 
 
-def mk_relative_linux(f, prefix, rpaths=("lib",), method=None):
-    "Respects the original values and converts abs to $ORIGIN-relative"
+def _get_rpaths_linux(elf, method=None):
+    """
+    Read the rpaths of ``elf`` in-process with LIEF: DT_RPATH if LIEF is going to patch
+    it, otherwise DT_RUNPATH or DT_RPATH, as ``patchelf --print-rpath`` reports them.
+    Returns ``None`` if LIEF is not available or cannot parse the file.
+    """
+    if not have_lief:
+        return None
+    try:
+        if method and method.upper() == "LIEF":
+            rpaths, binary_format, _ = get_rpaths_raw(elf)
+        else:
+            rpaths, _, binary_format, _ = get_runpaths_or_rpaths_raw(elf)
+    except Exception as e:
+        if method == "LIEF":
+            print(
+                f"ERROR :: get_rpaths_raw({elf!r}) with LIEF failed: {e}, but LIEF was specified"
+            )
+            traceback.print_tb(e.__traceback__)
+        else:
+            print(
+                f"WARNING :: get_rpaths_raw({elf!r}) with LIEF failed: {e}, will proceed with patchelf"
+            )
+        return None
+    return rpaths if binary_format is not None else None
+
+
+def mk_relative_linux(
+    f,
+    prefix,
+    rpaths=("lib",),
+    method=None,
+    existing=None,
+    patchelf=None,
+    cross_check=False,
+):
+    """
+    Respects the original values and converts abs to $ORIGIN-relative
+
+    ``existing`` are the current rpaths of the file if they were already read (see
+    :func:`_get_rpaths_linux`), ``patchelf`` the patchelf executable if it was already
+    looked up. With ``cross_check``, the rpaths are also read with ``patchelf
+    --print-rpath`` and any disagreement with LIEF is reported.
+    """
 
     elf = join(prefix, f)
     origin = dirname(elf)
 
-    existing_pe = None
-    patchelf = external.find_executable("patchelf", prefix)
+    patchelf = patchelf or external.find_executable("patchelf", prefix)
     if not patchelf:
         print(
             f"ERROR :: You should install patchelf, will proceed with LIEF for {elf} (was {method})"
         )
         method = "LIEF"
-    else:
+    if existing is None:
+        existing = _get_rpaths_linux(elf, method)
+    if patchelf and (existing is None or cross_check):
         try:
             existing_pe = (
                 check_output([patchelf, "--print-rpath", elf])
@@ -610,40 +658,19 @@ def mk_relative_linux(f, prefix, rpaths=("lib",), method=None):
                 .splitlines()[0]
             )
         except CalledProcessError:
-            if method == "patchelf":
-                print(
-                    f"ERROR :: `patchelf --print-rpath` failed for {elf}, but patchelf was specified"
-                )
-            elif method != "LIEF":
-                print(
-                    f"WARNING :: `patchelf --print-rpath` failed for {elf}, will proceed with LIEF (was {method})"
-                )
-            method = "LIEF"
+            print(f"WARNING :: `patchelf --print-rpath` failed for {elf}")
         else:
             existing_pe = existing_pe.split(os.pathsep)
-    existing = existing_pe
-    if have_lief:
-        existing2 = None
-        try:
-            existing2, _, _ = get_rpaths_raw(elf)
-        except Exception as e:
-            if method == "LIEF":
+            if existing is None:
+                method = "patchelf"
+                existing = existing_pe
+            elif existing_pe != (existing or [""]):
                 print(
-                    f"ERROR :: get_rpaths_raw({elf!r}) with LIEF failed: {e}, but LIEF was specified"
+                    f"WARNING :: get_rpaths_raw()={existing} and patchelf={existing_pe} disagree for {elf} :: "
                 )
-                traceback.print_tb(e.__traceback__)
-            else:
-                print(
-                    f"WARNING :: get_rpaths_raw({elf!r}) with LIEF failed: {e}, will proceed with patchelf"
-                )
-            method = "patchelf"
-        if existing_pe and existing_pe != existing2:
-            print(
-                f"WARNING :: get_rpaths_raw()={existing2} and patchelf={existing_pe} disagree for {elf} :: "
-            )
-        # Use LIEF if method is LIEF to get the initial value?
-        if method == "LIEF":
-            existing = existing2
+    if existing is None:
+        print(f"ERROR :: Could not read the rpaths of {elf}")
+        existing = []
     new = []
     for old in existing:
         if old.startswith("$ORIGIN"):
@@ -900,6 +927,46 @@ def _get_dsolists(build_prefix, host_prefix, subdir):
     return result
 
 
+# below this many binaries the cost of starting worker processes outweighs parsing them
+_PARALLEL_PARSE_MIN_FILES = 16
+
+
+def _map_parse_jobs(func, jobs, max_workers=None):
+    """
+    ``[func(job) for job in jobs]``, in a process pool if there are enough binaries to
+    parse. Results are in the order of ``jobs``, however they were computed.
+    """
+    max_workers = min(utils.get_max_workers(max_workers), len(jobs))
+    if max_workers > 1 and len(jobs) >= _PARALLEL_PARSE_MIN_FILES:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            return list(
+                executor.map(
+                    func, jobs, chunksize=max(1, len(jobs) // (max_workers * 4))
+                )
+            )
+    return [func(job) for job in jobs]
+
+
+def _get_linkages_job(path, sysroot, envroot):
+    return get_linkages_memoized(
+        path,
+        resolve_filenames=True,
+        recurse=False,
+        sysroot=sysroot,
+        envroot=envroot,
+    )
+
+
+def _get_exports_job(path, enable_static, ignore_list_syms, cache_dir):
+    # the cache directory is not inherited by spawned worker processes
+    memoized_by_arg0_filehash.cache_dir = cache_dir
+    return {
+        e
+        for e in get_exports_memoized(path, enable_static=enable_static)
+        if not any(fnmatch(e, pattern) for pattern in ignore_list_syms)
+    }
+
+
 def _collect_needed_dsos(
     sysroots_files,
     files,
@@ -913,19 +980,20 @@ def _collect_needed_dsos(
     sysroots = ""
     if sysroots_files:
         sysroots = list(sysroots_files.keys())[0]
-    for f in files:
-        path = join(run_prefix, f)
-        if not codefile_class(path, skip_symlinks=True):
-            continue
-        build_prefix = build_prefix.replace(os.sep, "/")
-        run_prefix = run_prefix.replace(os.sep, "/")
-        needed = get_linkages_memoized(
-            path,
-            resolve_filenames=True,
-            recurse=False,
+    build_prefix = build_prefix.replace(os.sep, "/")
+    binaries = [
+        f for f in files if codefile_class(join(run_prefix, f), skip_symlinks=True)
+    ]
+    run_prefix = run_prefix.replace(os.sep, "/")
+    linkages = _map_parse_jobs(
+        partial(
+            _get_linkages_job,
             sysroot=sysroots,
             envroot=run_prefix,
-        )
+        ),
+        [join(run_prefix, f) for f in binaries],
+    )
+    for f, needed in zip(binaries, linkages):
         for lib, res in needed.items():
             resolved = res["resolved"].replace(os.sep, "/")
             for sysroot, sysroot_files in sysroots_files.items():
@@ -949,6 +1017,18 @@ def _collect_needed_dsos(
     return all_needed_dsos, needed_dsos_for_file
 
 
+def _library_patterns(path):
+    """
+    Whether ``path`` matches ``*.so*``, ``*.dylib*`` or ``*.dll`` and whether it matches
+    ``*.a`` or ``*.lib``, like :func:`fnmatch.fnmatch` would tell (but much faster).
+    """
+    path = os.path.normcase(path)
+    return (
+        ".so" in path or ".dylib" in path or path.endswith(".dll"),
+        path.endswith((".a", ".lib")),
+    )
+
+
 def _map_file_to_package(
     files,
     run_prefix,
@@ -966,7 +1046,10 @@ def _map_file_to_package(
     contains_static_libs = {}
     # Used for both dsos and static_libs
     all_lib_exports = {}
-    all_needed_dsos_lower = [w.lower() for w in all_needed_dsos]
+    all_needed_dsos_lower = {w.lower() for w in all_needed_dsos}
+    normpath_files = {normpath(w) for w in files}
+    # (prefix, file, path) of every library whose exports are needed
+    exports_jobs = []
 
     if all_needed_dsos:
         for prefix in (run_prefix, build_prefix):
@@ -975,19 +1058,23 @@ def _map_file_to_package(
             for subdir2, _, filez in os.walk(prefix):
                 for file in filez:
                     fp = join(subdir2, file)
-                    dynamic_lib = any(
-                        fnmatch(fp, ext) for ext in ("*.so*", "*.dylib*", "*.dll")
-                    ) and codefile_class(fp, skip_symlinks=False)
-                    static_lib = any(fnmatch(fp, ext) for ext in ("*.a", "*.lib"))
+                    dynamic_pattern, static_lib = _library_patterns(fp)
                     # Looking at all the files is very slow.
-                    if not dynamic_lib and not static_lib:
+                    if not dynamic_pattern and not static_lib:
                         continue
                     rp = normpath(relpath(fp, prefix)).replace("\\", "/")
-                    if dynamic_lib and not any(
-                        rp.lower() == w for w in all_needed_dsos_lower
-                    ):
-                        continue
-                    if any(rp == normpath(w) for w in all_lib_exports[prefix]):
+                    # only parse the headers of libraries which are actually needed
+                    if dynamic_pattern and rp.lower() not in all_needed_dsos_lower:
+                        if not static_lib or codefile_class(fp, skip_symlinks=False):
+                            continue
+                        dynamic_lib = False
+                    else:
+                        dynamic_lib = dynamic_pattern and codefile_class(
+                            fp, skip_symlinks=False
+                        )
+                        if not dynamic_lib and not static_lib:
+                            continue
+                    if rp in all_lib_exports[prefix]:
                         continue
                     rp_po = rp.replace("\\", "/")
                     owners = (
@@ -997,7 +1084,7 @@ def _map_file_to_package(
                     )
                     # Self-vendoring, not such a big deal but may as well report it?
                     if not len(owners):
-                        if any(rp == normpath(w) for w in files):
+                        if rp in normpath_files:
                             owners.append(pkg_vendored_dist)
                     new_pkgs = list(which_package(rp, prefix))
                     # Cannot filter here as this means the DSO (eg libomp.dylib) will not be found in any package
@@ -1008,16 +1095,9 @@ def _map_file_to_package(
                             owners.append(new_pkg)
                     prefix_owners[prefix][rp_po] = owners
                     if len(prefix_owners[prefix][rp_po]):
-                        exports = {
-                            e
-                            for e in get_exports_memoized(
-                                fp, enable_static=enable_static
-                            )
-                            if not any(
-                                fnmatch(e, pattern) for pattern in ignore_list_syms
-                            )
-                        }
-                        all_lib_exports[prefix][rp_po] = exports
+                        # filled in below, once the exports of all libraries are parsed
+                        all_lib_exports[prefix][rp_po] = None
+                        exports_jobs.append((prefix, rp_po, fp))
                         # Check codefile_class to filter out linker scripts.
                         if dynamic_lib:
                             contains_dsos[prefix_owners[prefix][rp_po][0]] = True
@@ -1036,6 +1116,18 @@ def _map_file_to_package(
                             # Hmm, not right, muddies the prefixes again.
                             contains_static_libs[prefix_owners[prefix][rp_po][0]] = True
 
+    exports = _map_parse_jobs(
+        partial(
+            _get_exports_job,
+            enable_static=enable_static,
+            ignore_list_syms=ignore_list_syms,
+            cache_dir=memoized_by_arg0_filehash.cache_dir,
+        ),
+        [fp for _, _, fp in exports_jobs],
+    )
+    for (prefix, rp_po, _), lib_exports in zip(exports_jobs, exports):
+        all_lib_exports[prefix][rp_po] = lib_exports
+
     return prefix_owners, contains_dsos, contains_static_libs, all_lib_exports
 
 
@@ -1654,7 +1746,12 @@ def check_overlinking_impl(
         return dict()
 
 
+@span("overlinking", "post")
 def check_overlinking(m: MetaData, files, host_prefix=None):
+    if memoized_by_arg0_filehash.cache_dir != m.config.lief_cache:
+        # once per process, drop results no build used for a while
+        memoized_by_arg0_filehash.prune(m.config.lief_cache)
+        memoized_by_arg0_filehash.cache_dir = m.config.lief_cache
     patterns = m.get_value("build/overlinking_ignore_patterns", [])
     files = [
         file
@@ -1714,6 +1811,51 @@ def post_process_shared_lib(m, f, files, host_prefix=None):
         mk_relative_osx(path, host_prefix, m, files=files, rpaths=rpaths)
 
 
+def post_process_shared_libs(m, fs, files, host_prefix=None):
+    """
+    :func:`post_process_shared_lib` for many files at once. The current rpaths of all ELF
+    files are read in a single in-process pass, then the files are rewritten concurrently,
+    with one patcher invocation each.
+    """
+    if not host_prefix:
+        host_prefix = m.config.host_prefix
+    elfs = []
+    for f in fs:
+        path = join(host_prefix, f)
+        codefile = codefile_class(path, skip_symlinks=True)
+        if codefile == elffile and not path.endswith(".debug"):
+            elfs.append(f)
+        elif codefile:
+            post_process_shared_lib(m, f, files, host_prefix)
+    if not elfs:
+        return
+
+    rpaths = m.get_value("build/rpaths", ["lib"])
+    method = m.get_value("build/rpaths_patcher", None)
+    patchelf = external.find_executable("patchelf", host_prefix)
+    existing = {
+        f: _get_rpaths_linux(join(host_prefix, f), method if patchelf else "LIEF")
+        for f in elfs
+    }
+    max_workers = min(utils.get_max_workers(), len(elfs))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(
+                mk_relative_linux,
+                f,
+                host_prefix,
+                rpaths=rpaths,
+                method=method,
+                existing=existing[f],
+                patchelf=patchelf,
+                cross_check=m.config.debug,
+            )
+            for f in elfs
+        ]
+        for future in futures:
+            future.result()
+
+
 def fix_permissions(files, prefix):
     print("Fixing permissions")
     for path in os.scandir(prefix):
@@ -1830,6 +1972,7 @@ def _check_one_menuinst_json(json_file):
         log.info("'%s' is a valid menuinst JSON document", json_file)
 
 
+@span("post_build", "post")
 def post_build(m, files, build_python, host_prefix=None, is_already_linked=False):
     print("number of files:", len(files))
 
@@ -1850,6 +1993,7 @@ def post_build(m, files, build_python, host_prefix=None, is_already_linked=False
         check_symlinks(files, host_prefix, m.config.croot)
         prefix_files = utils.prefix_files(host_prefix)
 
+        relocate = []
         for f in files:
             if f.startswith("bin/"):
                 fix_shebang(
@@ -1861,7 +2005,8 @@ def post_build(m, files, build_python, host_prefix=None, is_already_linked=False
             if binary_relocation is True or (
                 isinstance(binary_relocation, list) and f in binary_relocation
             ):
-                post_process_shared_lib(m, f, prefix_files, host_prefix)
+                relocate.append(f)
+        post_process_shared_libs(m, relocate, prefix_files, host_prefix)
     check_overlinking(m, files, host_prefix)
     check_menuinst_json(files, host_prefix)
 
@@ -0,0 +1,184 @@
+# Copyright (C) 2014 Anaconda, Inc
+# SPDX-License-Identifier: BSD-3-Clause
+"""
+Whole-build instrumentation.
+
+Phases of a build are wrapped in named spans with :func:`span` (usable as a context
+manager or a decorator). While the profiler is enabled (``--trace-file``, for one
+``build_tree`` run), every span records its monotonic start time and duration, the thread
+it ran on, the RSS high-water mark of conda-build and its finished subprocesses when it
+ended and any extra arguments, such as the output and variant it belongs to. The
+high-water mark covers the whole life of the process, so it never goes down from one span
+to the next. Spans nest by time on a thread, so the result can be exported as Chrome
+trace-event JSON (:meth:`Profiler.write_chrome_trace`) and loaded into
+``chrome://tracing``, Perfetto or speedscope.
+
+Only spans of the conda-build process itself are recorded. Work done in the worker
+processes of ``--package-workers`` and ``--render-workers`` shows up as the time the
+main process spends waiting for it.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from typing import Any
+
+    from .metadata import MetaData
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss() -> int:
+    """
+    Peak resident set size (in bytes) of this process and its waited-for children, since
+    the process started.
+    """
+    if resource is not None:
+        usage = max(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+        )
+        # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+        return usage if sys.platform == "darwin" else usage * 1024
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().peak_wset
+    except (ImportError, AttributeError):
+        return 0
+
+
+@dataclass
+class Span:
+    name: str
+    category: str
+    #: monotonic start time, in nanoseconds
+    start: int
+    #: duration, in nanoseconds
+    duration: int = 0
+    thread: int = 0
+    #: RSS high-water mark of the process when the span ended
+    peak_rss: int = 0
+    args: dict[str, Any] = field(default_factory=dict)
+
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def reset(self) -> None:
+        with self._lock:
+            self.spans = []
+
+    @contextmanager
+    def span(self, name: str, category: str = "build", **args) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        span = Span(
+            name, category, time.monotonic_ns(), thread=threading.get_ident(), args=args
+        )
+        try:
+            yield
+        finally:
+            span.duration = time.monotonic_ns() - span.start
+            span.peak_rss = peak_rss()
+            with self._lock:
+                self.spans.append(span)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """Total time (in seconds), number of calls and RSS high-water mark per span name."""
+        totals = {}
+        for span in self.spans:
+            total = totals.setdefault(span.name, {"time": 0.0, "count": 0, "rss": 0})
+            total["time"] += span.duration / 1e9
+            total["count"] += 1
+            total["rss"] = max(total["rss"], span.peak_rss)
+        return totals
+
+    def chrome_trace(self) -> dict[str, Any]:
+        """The recorded spans as a Chrome trace-event document."""
+        pid = os.getpid()
+        events = [
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": pid,
+                "args": {"name": "conda-build"},
+            }
+        ]
+        for span in sorted(self.spans, key=lambda span: (span.start, -span.duration)):
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": span.category,
+                    "ph": "X",
+                    # trace-event timestamps are in microseconds
+                    "ts": span.start / 1e3,
+                    "dur": span.duration / 1e3,
+                    "pid": pid,
+                    "tid": span.thread,
+                    "args": {**span.args, "rss_high_water_mark": span.peak_rss},
+                }
+            )
+            events.append(
+                {
+                    "name": "rss_high_water_mark",
+                    "ph": "C",
+                    "ts": (span.start + span.duration) / 1e3,
+                    "pid": pid,
+                    "args": {"bytes": span.peak_rss},
+                }
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path: str | os.PathLike) -> None:
+        with open(path, "w") as fh:
+            json.dump(self.chrome_trace(), fh)
+
+
+#: the profiler used by conda-build itself
+profiler = Profiler()
+
+
+def span(name: str, category: str = "build", **args):
+    """Record a span with the process-wide :data:`profiler`."""
+    return profiler.span(name, category, **args)
+
+
+def metadata_args(metadata: MetaData) -> dict[str, str]:
+    """
+    Span arguments identifying the output and variant ``metadata`` describes.
+
+    Empty while the profiler is disabled, finding the used variables is not free.
+    """
+    if not profiler.enabled:
+        return {}
+    used_vars = sorted(metadata.get_used_loop_vars())
+    return {
+        "output": metadata.name(),
+        "variant": "-".join(
+            f"{key}_{metadata.config.variant.get(key)}" for key in used_vars
+        ),
+    }
@@ -3,8 +3,10 @@
 from __future__ import annotations
 
 import functools
+import hashlib
 import json
 import os
+import pickle
 import random
 import re
 import string
@@ -12,6 +14,7 @@ import subprocess
 import sys
 import tarfile
 from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor, wait
 from contextlib import contextmanager
 from os.path import (
     isabs,
@@ -22,8 +25,11 @@ from os.path import (
 )
 from pathlib import Path
 from typing import TYPE_CHECKING
+from urllib.parse import urlparse
+from urllib.request import url2pathname
 
 import yaml
+from conda import __version__ as conda_version
 from conda.base.context import context
 from conda.cli.common import specs_from_url
 from conda.core.package_cache_data import ProgressiveFetchExtract
@@ -31,25 +37,29 @@ from conda.exceptions import NoPackagesFoundError, UnsatisfiableError
 from conda.gateways.disk.create import TemporaryDirectory
 from conda.models.records import PackageRecord
 from conda.models.version import VersionOrder
+from conda.utils import url_path
 
+from . import __version__ as conda_build_version
 from . import environ, exceptions, source, utils
 from .config import CondaPkgFormat
 from .exceptions import CondaBuildUserError, DependencyNeedsBuildingError
-from .index import get_build_index
+from .index import get_build_index, get_index_records, get_index_state
 from .metadata import MetaData, MetaDataTuple, combine_top_level_metadata_with_output
+from .profiler import span
 from .utils import (
     CONDA_PACKAGE_EXTENSION_V1,
+    CONDA_PACKAGE_EXTENSION_V2,
     package_record_to_requirement,
     tar_xf,
 )
 from .variants import (
     filter_by_key_value,
+    find_config_files,
     get_package_variants,
     list_of_dicts_to_dict_of_lists,
 )
 
 if TYPE_CHECKING:
-    import os
     from collections.abc import Iterable, Iterator
     from typing import Any
 
@@ -303,32 +313,159 @@ def _read_specs_from_package(pkg_loc, pkg_dist):
             with open(downstream_file + ".json") as f:
                 specs = json.load(f)
     if not specs and pkg_loc and isfile(pkg_loc):
-        # switching to json for consistency in conda-build 4
-        specs_yaml = utils.package_has_file(pkg_loc, "info/run_exports.yaml")
-        specs_json = utils.package_has_file(pkg_loc, "info/run_exports.json")
-        if hasattr(specs_json, "decode"):
-            specs_json = specs_json.decode("utf-8")
-
-        if specs_json:
-            specs = json.loads(specs_json)
-        elif specs_yaml:
-            specs = yaml.safe_load(specs_yaml)
-        else:
-            legacy_specs = utils.package_has_file(pkg_loc, "info/run_exports")
-            # exclude packages pinning themselves (makes no sense)
-            if legacy_specs:
-                weak_specs = set()
-                if hasattr(pkg_dist, "decode"):
-                    pkg_dist = pkg_dist.decode("utf-8")
-                for spec in legacy_specs.splitlines():
-                    if hasattr(spec, "decode"):
-                        spec = spec.decode("utf-8")
-                    if not spec.startswith(pkg_dist.rsplit("-", 2)[0]):
-                        weak_specs.add(spec.rstrip())
-                specs = {"weak": sorted(list(weak_specs))}
+        specs = _read_specs_from_info(
+            functools.partial(utils.package_has_file, pkg_loc), pkg_dist
+        )
+    return specs
+
+
+def _read_specs_from_info(read_file, pkg_dist):
+    """
+    run_exports of a package, given a function reading a file of the package (returning a
+    false value for missing files).
+    """
+    specs = {}
+    # switching to json for consistency in conda-build 4
+    specs_yaml = read_file("info/run_exports.yaml")
+    specs_json = read_file("info/run_exports.json")
+    if hasattr(specs_json, "decode"):
+        specs_json = specs_json.decode("utf-8")
+
+    if specs_json:
+        specs = json.loads(specs_json)
+    elif specs_yaml:
+        specs = yaml.safe_load(specs_yaml)
+    else:
+        legacy_specs = read_file("info/run_exports")
+        # exclude packages pinning themselves (makes no sense)
+        if legacy_specs:
+            weak_specs = set()
+            if hasattr(pkg_dist, "decode"):
+                pkg_dist = pkg_dist.decode("utf-8")
+            for spec in legacy_specs.splitlines():
+                if hasattr(spec, "decode"):
+                    spec = spec.decode("utf-8")
+                if not spec.startswith(pkg_dist.rsplit("-", 2)[0]):
+                    weak_specs.add(spec.rstrip())
+            specs = {"weak": sorted(list(weak_specs))}
     return specs
 
 
+def _run_exports_cache_path(config: Config, prec: PackageRecord) -> str | None:
+    """Where the run_exports of ``prec`` are cached on disk, keyed by filename and hash."""
+    digest = getattr(prec, "sha256", None) or getattr(prec, "md5", None)
+    if not digest:
+        return None
+    return join(config.croot, "run_exports_cache", f"{prec.fn}-{digest}.json")
+
+
+def _load_cached_run_exports(path: str) -> dict | None:
+    try:
+        with open(path) as fh:
+            return json.load(fh)["run_exports"]
+    except (OSError, ValueError, KeyError):
+        # missing, or being replaced/corrupted by another process
+        return None
+
+
+def _store_cached_run_exports(path: str, run_exports: dict) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w") as fh:
+            json.dump({"run_exports": run_exports}, fh)
+        os.replace(tmp, path)
+    except OSError:
+        utils.rm_rf(tmp)
+
+
+def _channel_run_exports(prec: PackageRecord) -> dict | None:
+    """run_exports of ``prec`` from its channel's run_exports.json, if it has one."""
+    if not prec.url:
+        return None
+    data = utils.download_run_exports(prec.url.rsplit("/", 1)[0])
+    packages = data.get(
+        "packages.conda"
+        if prec.fn.endswith(CONDA_PACKAGE_EXTENSION_V2)
+        else "packages",
+        {},
+    )
+    if prec.fn not in packages:
+        return None
+    return packages[prec.fn].get("run_exports") or {}
+
+
+def _stream_run_exports(prec: PackageRecord, pkg_dist: str) -> dict | None:
+    """
+    run_exports of a remote .conda package, fetching only its info/ member with HTTP range
+    requests.
+    """
+    if not prec.url or not prec.fn.endswith(CONDA_PACKAGE_EXTENSION_V2):
+        return None
+
+    from conda.gateways.connection.session import get_session
+    from conda_package_streaming.url import stream_conda_info
+
+    names = ("info/run_exports.json", "info/run_exports.yaml", "info/run_exports")
+    files = {}
+    try:
+        for tar, member in stream_conda_info(prec.url, session=get_session(prec.url)):
+            if member.name in names:
+                files[member.name] = tar.extractfile(member).read()
+    except Exception as e:
+        # servers without range request support, network errors, ...: only means the
+        #    whole package gets downloaded instead
+        utils.get_logger(__name__).debug(
+            "Could not stream the info of %s: %s", prec.url, e
+        )
+        return None
+    return _read_specs_from_info(files.get, pkg_dist)
+
+
+@span("run_exports", "render")
+def get_run_exports(
+    m: MetaData, prec: PackageRecord, precs, env: str
+) -> dict[str, list[str]]:
+    """
+    run_exports of ``prec``. In order, they are read from the run_exports cache in croot, a
+    copy of the package in the package caches or a local channel, the run_exports.json of
+    the package's channel or the info/ member of the remote .conda package. Only if all of
+    these fail, the whole package is downloaded.
+    """
+    pkg_dist = "-".join((prec.name, prec.version, prec.build))
+    cache_path = _run_exports_cache_path(m.config, prec)
+    if cache_path:
+        run_exports = _load_cached_run_exports(cache_path)
+        if run_exports is not None:
+            return run_exports
+
+    pkg_loc = find_pkg_dir_or_file_in_pkgs_dirs(pkg_dist, m)
+    if not pkg_loc and prec.url and prec.url.startswith("file:"):
+        # packages of local channels are read where they are
+        pkg_loc = url2pathname(urlparse(prec.url).path)
+        if not isfile(pkg_loc):
+            pkg_loc = None
+    if pkg_loc:
+        run_exports = _read_specs_from_package(pkg_loc, pkg_dist)
+    else:
+        run_exports = _channel_run_exports(prec)
+        if run_exports is None:
+            run_exports = _stream_run_exports(prec, pkg_dist)
+        if run_exports is None:
+            loc, dist = execute_download_actions(
+                m,
+                precs,
+                env=env,
+                package_subset=[prec],
+            )[prec]
+            run_exports = _read_specs_from_package(loc, dist)
+
+    if cache_path:
+        _store_cached_run_exports(cache_path, run_exports)
+    return run_exports
+
+
+@span("download_packages", "render")
 def execute_download_actions(m, precs, env, package_subset=None, require_files=False):
     subdir = getattr(m.config, f"{env}_subdir")
     index, _, _ = get_build_index(
@@ -385,12 +522,13 @@ def execute_download_actions(m, precs, env, package_subset=None, require_files=F
         # TODO: this is a vile hack reaching into conda's internals. Replace with
         #    proper conda API when available.
         if not pkg_loc:
-            link_prec = [
-                rec
-                for rec in index
-                if (rec.name, rec.version, rec.build)
-                == (prec.name, prec.version, prec.build)
-            ][0]
+            link_prec = get_index_records(index).get(
+                prec.name, prec.version, prec.build
+            )
+            if link_prec is None:
+                raise CondaBuildUserError(
+                    f"Could not find {pkg_dist} in the channels to download it."
+                )
             pfe = ProgressiveFetchExtract(link_prefs=(link_prec,))
             with utils.LoggingContext():
                 pfe.execute()
@@ -405,8 +543,8 @@ def execute_download_actions(m, precs, env, package_subset=None, require_files=F
 
 
 def get_upstream_pins(m: MetaData, precs, env):
-    """Download packages from specs, then inspect each downloaded package for additional
-    downstream dependency specs.  Return these additional specs."""
+    """Find the run_exports of the packages from specs (see :func:`get_run_exports`)
+    for additional downstream dependency specs.  Return these additional specs."""
     env_specs = m.get_value(f"requirements/{env}", [])
     explicit_specs = [req.split(" ")[0] for req in env_specs] if env_specs else []
     precs = [prec for prec in precs if prec.name in explicit_specs]
@@ -430,13 +568,7 @@ def get_upstream_pins(m: MetaData, precs, env):
                 pkg_data = channeldata["packages"].get(prec.name, {})
                 run_exports = pkg_data.get("run_exports", {}).get(prec.version, {})
         if run_exports is None:
-            loc, dist = execute_download_actions(
-                m,
-                precs,
-                env=env,
-                package_subset=[prec],
-            )[prec]
-            run_exports = _read_specs_from_package(loc, dist)
+            run_exports = get_run_exports(m, prec, precs, env)
         specs = _filter_run_exports(run_exports, ignore_list)
         if specs:
             additional_specs = utils.merge_dicts_of_lists(additional_specs, specs)
@@ -624,6 +756,7 @@ def _variants_match(first: dict, second: dict) -> bool:
     return True
 
 
+@span("finalize", "render")
 def finalize_metadata(
     m: MetaData,
     parent_metadata=None,
@@ -867,6 +1000,86 @@ def reparse(metadata):
     return metadata
 
 
+def _render_variant(
+    metadata: MetaData,
+    variant: dict[str, Any],
+    all_variants: list[dict[str, Any]],
+    used_variables: set[str],
+    allow_no_other_outputs: bool,
+    bypass_env_check: bool,
+) -> tuple[tuple[str, str, tuple[tuple[str, str], ...]], MetaDataTuple]:
+    """
+    Render one top-level variant of ``metadata`` for :func:`distribute_variants`.
+
+    Runs in a worker process with ``--render-workers``.
+    """
+    from .build import get_all_replacements
+
+    get_all_replacements(variant)
+    mv = metadata.copy()
+    mv.config.variant = variant
+    # start with shared list:
+    mv.config.variants = all_variants
+
+    pin_run_as_build = variant.get("pin_run_as_build", {})
+    if mv.numpy_xx and "numpy" not in pin_run_as_build:
+        pin_run_as_build["numpy"] = {"min_pin": "x.x", "max_pin": "x.x"}
+
+    conform_dict = {}
+    for key in used_variables:
+        # We use this variant in the top-level recipe.
+        # constrain the stored variants to only this version in the output
+        #     variant mapping
+        conform_dict[key] = variant[key]
+
+    for key, values in conform_dict.items():
+        mv.config.variants = (
+            filter_by_key_value(
+                mv.config.variants, key, values, "distribute_variants_reduction"
+            )
+            or mv.config.variants
+        )
+    # copy variants before we start modifying them,
+    # but after we've reduced the list via the conform_dict filter
+    mv.config.variants = mv.config.copy_variants()
+    get_all_replacements(mv.config.variants)
+    pin_run_as_build = variant.get("pin_run_as_build", {})
+    if mv.numpy_xx and "numpy" not in pin_run_as_build:
+        pin_run_as_build["numpy"] = {"min_pin": "x.x", "max_pin": "x.x"}
+
+    numpy_pinned_variants = []
+    for _variant in mv.config.variants:
+        _variant["pin_run_as_build"] = pin_run_as_build
+        numpy_pinned_variants.append(_variant)
+    mv.config.variants = numpy_pinned_variants
+
+    mv.config.squished_variants = list_of_dicts_to_dict_of_lists(mv.config.variants)
+
+    if mv.needs_source_for_render and mv.variant_in_source:
+        mv.parse_again()
+        utils.rm_rf(mv.config.work_dir)
+        source.provide(mv)
+        mv.parse_again()
+
+    try:
+        mv.parse_until_resolved(
+            allow_no_other_outputs=allow_no_other_outputs,
+            bypass_env_check=bypass_env_check,
+        )
+    except (SystemExit, CondaBuildUserError):
+        pass
+    need_source_download = not mv.needs_source_for_render or not mv.source_provided
+
+    return (
+        (
+            mv.dist(),
+            mv.config.variant.get("target_platform", mv.config.subdir),
+            tuple((var, mv.config.variant.get(var)) for var in mv.get_used_vars()),
+        ),
+        MetaDataTuple(mv, need_source_download, False),
+    )
+
+
 def distribute_variants(
     metadata: MetaData,
     variants,
@@ -877,7 +1090,6 @@ def distribute_variants(
     rendered_metadata: dict[
         tuple[str, str, tuple[tuple[str, str], ...]], MetaDataTuple
     ] = {}
-    need_source_download = True
 
     # don't bother distributing python if it's a noarch package, and figure out
     # which python version we prefer. `python_age` can use used to tweak which
@@ -914,71 +1126,59 @@ def distribute_variants(
     all_variants = metadata.config.variants
     metadata.config.variants = []
 
-    for variant in top_loop:
-        from .build import get_all_replacements
-
-        get_all_replacements(variant)
-        mv = metadata.copy()
-        mv.config.variant = variant
-        # start with shared list:
-        mv.config.variants = all_variants
-
-        pin_run_as_build = variant.get("pin_run_as_build", {})
-        if mv.numpy_xx and "numpy" not in pin_run_as_build:
-            pin_run_as_build["numpy"] = {"min_pin": "x.x", "max_pin": "x.x"}
-
-        conform_dict = {}
-        for key in used_variables:
-            # We use this variant in the top-level recipe.
-            # constrain the stored variants to only this version in the output
-            #     variant mapping
-            conform_dict[key] = variant[key]
-
-        for key, values in conform_dict.items():
-            mv.config.variants = (
-                filter_by_key_value(
-                    mv.config.variants, key, values, "distribute_variants_reduction"
+    render_workers = min(metadata.config.render_workers, len(top_loop))
+    # sources needed for rendering are provided into the one shared work dir
+    if render_workers > 1 and not metadata.needs_source_for_render:
+        with ProcessPoolExecutor(max_workers=render_workers) as executor:
+            futures = [
+                executor.submit(
+                    _render_variant,
+                    metadata,
+                    variant,
+                    all_variants,
+                    used_variables,
+                    allow_no_other_outputs,
+                    bypass_env_check,
+                )
+                for variant in top_loop
+            ]
+            wait(futures)
+        results = [future.exception() or future.result() for future in futures]
+    else:
+        results = []
+        for variant in top_loop:
+            try:
+                results.append(
+                    _render_variant(
+                        metadata,
+                        variant,
+                        all_variants,
+                        used_variables,
+                        allow_no_other_outputs,
+                        bypass_env_check,
+                    )
                 )
-                or mv.config.variants
+            except Exception as e:
+                results.append(e)
+
+    # every variant was rendered, report all failures and raise the first one
+    failures = [
+        (variant, result)
+        for variant, result in zip(top_loop, results)
+        if isinstance(result, BaseException)
+    ]
+    if failures:
+        log = utils.get_logger(__name__)
+        for variant, exc in failures:
+            log.error(
+                "Rendering variant %s failed: %s",
+                {key: variant.get(key) for key in sorted(used_variables)},
+                exc,
             )
-        # copy variants before we start modifying them,
-        # but after we've reduced the list via the conform_dict filter
-        mv.config.variants = mv.config.copy_variants()
-        get_all_replacements(mv.config.variants)
-        pin_run_as_build = variant.get("pin_run_as_build", {})
-        if mv.numpy_xx and "numpy" not in pin_run_as_build:
-            pin_run_as_build["numpy"] = {"min_pin": "x.x", "max_pin": "x.x"}
-
-        numpy_pinned_variants = []
-        for _variant in mv.config.variants:
-            _variant["pin_run_as_build"] = pin_run_as_build
-            numpy_pinned_variants.append(_variant)
-        mv.config.variants = numpy_pinned_variants
-
-        mv.config.squished_variants = list_of_dicts_to_dict_of_lists(mv.config.variants)
-
-        if mv.needs_source_for_render and mv.variant_in_source:
-            mv.parse_again()
-            utils.rm_rf(mv.config.work_dir)
-            source.provide(mv)
-            mv.parse_again()
+        raise failures[0][1]
 
-        try:
-            mv.parse_until_resolved(
-                allow_no_other_outputs=allow_no_other_outputs,
-                bypass_env_check=bypass_env_check,
-            )
-        except (SystemExit, CondaBuildUserError):
-            pass
-        need_source_download = not mv.needs_source_for_render or not mv.source_provided
-
-        rendered_metadata[
-            (
-                mv.dist(),
-                mv.config.variant.get("target_platform", mv.config.subdir),
-                tuple((var, mv.config.variant.get(var)) for var in mv.get_used_vars()),
-            )
-        ] = MetaDataTuple(mv, need_source_download, False)
+    for key, metadata_tuple in results:
+        rendered_metadata[key] = metadata_tuple
     # list of tuples.
     # each tuple item is a tuple of 3 items:
     #    metadata, need_download, need_reparse
@@ -1027,6 +1227,7 @@ def open_recipe(recipe: str | os.PathLike | Path) -> Iterator[Path]:
         sys.exit(f"Error: non-recipe: {recipe}")
 
 
+@span("render", "render")
 def render_recipe(
     recipe_dir: str | os.PathLike | Path,
     config: Config,
@@ -1137,6 +1338,140 @@ def render_metadata_tuples(
     return list(output_metas.values())
 
 
+#: environment variables which differ between shells without affecting rendering
+RENDER_CACHE_IGNORED_ENV = frozenset({"_", "OLDPWD", "SHLVL"})
+
+
+def _is_plain(value: Any) -> bool:
+    if isinstance(value, (str, int, float, bool, type(None))):
+        return True
+    if isinstance(value, (list, tuple, set)):
+        return all(_is_plain(item) for item in value)
+    if isinstance(value, dict):
+        return all(
+            isinstance(key, str) and _is_plain(item) for key, item in value.items()
+        )
+    return False
+
+
+def _update_digest(digest, path: str) -> None:
+    """Add the names and contents of ``path`` (a file or directory) to ``digest``."""
+    if isfile(path):
+        with open(path, "rb") as fh:
+            for chunk in iter(functools.partial(fh.read, 1 << 20), b""):
+                digest.update(chunk)
+        return
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if d != ".git")
+        for name in sorted(files):
+            file = join(root, name)
+            digest.update(os.path.relpath(file, path).encode("utf-8") + b"\0")
+            if not os.path.islink(file) or os.path.exists(file):
+                _update_digest(digest, file)
+
+
+def render_cache_key(
+    recipe_path: str | os.PathLike | Path,
+    config: Config,
+    variants: dict[str, Any] | None = None,
+    **options,
+) -> str | None:
+    """
+    Key of the metadata :func:`conda_build.api.render` renders for ``recipe_path``, or
+    ``None`` if there is no such recipe.
+
+    The key is a digest of the recipe, the variant config files that apply to it,
+    the plain settings of ``config`` and conda's context, the environment variables,
+    the repodata of the channels and the arguments of the render.
+    """
+    recipe = Path(recipe_path).absolute()
+    if not recipe.exists():
+        return None
+    if recipe.is_file() and recipe.suffix == ".yaml":
+        recipe = recipe.parent
+
+    digest = hashlib.sha256()
+    _update_digest(digest, str(recipe))
+    for cfg in find_config_files(recipe if recipe.is_dir() else None, config):
+        digest.update(cfg.encode("utf-8") + b"\0")
+        if isfile(cfg):
+            _update_digest(digest, cfg)
+
+    channels = [
+        url_path(config.output_folder),
+        *config.channel_urls,
+        *context.channels,
+    ]
+    key = {
+        "recipe": digest.hexdigest(),
+        "config": {
+            name: value
+            for name, value in vars(config).items()
+            # the build id is a timestamp
+            if name != "_build_id" and _is_plain(value)
+        },
+        "context": {
+            "channels": context.channels,
+            "channel_priority": context.channel_priority,
+            "subdir": context.subdir,
+            "pinned_packages": context.pinned_packages,
+            "solver": context.solver,
+        },
+        "environ": {
+            name: value
+            for name, value in os.environ.items()
+            if name not in RENDER_CACHE_IGNORED_ENV
+        },
+        "index_state": [
+            get_index_state(channels, subdir)
+            for subdir in sorted({config.host_subdir, config.build_subdir})
+        ],
+        "variants": variants,
+        "options": options,
+        "conda": conda_version,
+        "conda_build": conda_build_version,
+    }
+    return hashlib.sha256(
+        json.dumps(key, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def _render_cache_path(config: Config, key: str) -> str:
+    return join(config.croot, "render_cache", f"{key}.pickle")
+
+
+def load_cached_render(config: Config, key: str) -> list[MetaDataTuple] | None:
+    """The metadata :func:`store_cached_render` stored under ``key``, if any."""
+    try:
+        with open(_render_cache_path(config, key), "rb") as fh:
+            return pickle.load(fh)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        # missing, being replaced by another process or stored by another conda-build
+        return None
+
+
+def store_cached_render(
+    config: Config, key: str, metadata_tuples: list[MetaDataTuple]
+) -> None:
+    """
+    Store rendered metadata under ``key``. Metadata which needed the source to render
+    is not stored, the source may have changed by the time it is rendered again.
+    """
+    if any(metadata.needs_source_for_render for metadata, _, _ in metadata_tuples):
+        return
+    path = _render_cache_path(config, key)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp, "wb") as fh:
+            pickle.dump(metadata_tuples, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except (OSError, pickle.PicklingError, TypeError, AttributeError) as e:
+        utils.rm_rf(tmp)
+        log = utils.get_logger(__name__)
+        log.debug("could not cache rendered metadata in %s: %s", path, e)
+
+
 # Keep this out of the function below so it can be imported by other modules.
 FIELDS = [
     "package",
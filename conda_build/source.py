@@ -2,6 +2,7 @@
 # SPDX-License-Identifier: BSD-3-Clause
 from __future__ import annotations
 
+import json
 import locale
 import os
 import re
@@ -9,13 +10,14 @@ import shutil
 import sys
 import tempfile
 import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from os.path import abspath, basename, exists, expanduser, isdir, isfile, join, normpath
 from pathlib import Path
 from subprocess import CalledProcessError
 from typing import TYPE_CHECKING
 from urllib.parse import urljoin
 
-from conda.exceptions import CondaHTTPError
+from conda.exceptions import ChecksumMismatchError, CondaHTTPError
 from conda.gateways.connection.download import download
 from conda.gateways.disk.create import TemporaryDirectory
 from conda.gateways.disk.read import compute_sum
@@ -23,6 +25,7 @@ from conda.utils import url_path
 
 from .exceptions import MissingDependency
 from .os_utils import external
+from .profiler import span
 from .utils import (
     LoggingContext,
     check_call_env,
@@ -34,6 +37,7 @@ from .utils import (
     decompressible_exts,
     ensure_list,
     get_logger,
+    get_max_workers,
     on_win,
     rm_rf,
     safe_print_unicode,
@@ -82,10 +86,17 @@ def download_to_cache(cache_folder, recipe_path, source_dict, verbose=False):
             "Add hash to recipe to use source cache."
         )
 
+    # md5 and sha256 are verified by conda while the download is streamed
+    streamed_hashes = {
+        hash_type: source_dict[hash_type]
+        for hash_type in ("md5", "sha256")
+        if source_dict.get(hash_type)
+    }
     path = join(cache_folder, fn)
     if isfile(path):
         if verbose:
             log.info(f"Found source in cache: {fn}")
+        streamed_hashes = {}
     else:
         if verbose:
             log.info(f"Downloading source to cache: {fn}")
@@ -104,7 +115,12 @@ def download_to_cache(cache_folder, recipe_path, source_dict, verbose=False):
                 if verbose:
                     log.info(f"Downloading {url}")
                 with LoggingContext():
-                    download(url, path)
+                    download(url, path, **streamed_hashes)
+            except ChecksumMismatchError as e:
+                rm_rf(path)
+                raise RuntimeError(
+                    f"Hash mismatch for {unhashed_fn}: {str(e).strip()}"
+                ) from e
             except CondaHTTPError as e:
                 log.warning(f"Error: {str(e).strip()}")
                 rm_rf(path)
@@ -121,7 +137,7 @@ def download_to_cache(cache_folder, recipe_path, source_dict, verbose=False):
 
     hashed = None
     for hash_type in set(source_dict).intersection(ACCEPTED_HASH_TYPES):
-        if hash_type in source_dict:
+        if hash_type in source_dict and hash_type not in streamed_hashes:
             expected_hash = source_dict[hash_type]
             hashed = compute_sum(path, hash_type)
             if expected_hash != hashed:
@@ -168,9 +184,14 @@ def unpack(
     verbose=False,
     timeout=900,
     locking=True,
+    downloaded=None,
 ):
-    """Uncompress a downloaded source."""
-    src_path, unhashed_fn = download_to_cache(
+    """
+    Uncompress a downloaded source.
+
+    ``downloaded`` is the result of :func:`download_to_cache` if it was already called.
+    """
+    src_path, unhashed_fn = downloaded or download_to_cache(
         cache_folder, recipe_path, source_dict, verbose
     )
 
@@ -1026,122 +1047,253 @@ def apply_patch(src_dir, patch, config, git=None):
     )
 
 
+def _source_dir(metadata, source_dict):
+    folder = source_dict.get("folder")
+    return os.path.join(metadata.config.work_dir, folder if folder else "")
+
+
+def _overlapping_sources(metadata, sources):
+    """
+    Group the indices of sources that have to be provided one after the other.
+
+    Sources whose folders are the same or nested in each other (e.g. a source without a
+    folder and any other source) overlay each other, so their order matters. Sources
+    from the same repository share its mirror in the cache.
+    """
+    groups = []
+    for idx, source_dict in enumerate(sources):
+        src_dir = os.path.normpath(_source_dir(metadata, source_dict))
+        repos = {
+            source_dict[key]
+            for key in ("git_url", "hg_url", "svn_url")
+            if key in source_dict
+        }
+        overlapping = [
+            group
+            for group in groups
+            if repos & group["repos"]
+            or any(
+                src_dir == other
+                or src_dir.startswith(other + os.sep)
+                or other.startswith(src_dir + os.sep)
+                for other in group["dirs"]
+            )
+        ]
+        group = {"indices": [idx], "dirs": {src_dir}, "repos": repos}
+        for other in overlapping:
+            groups.remove(other)
+            group["indices"] = sorted(group["indices"] + other["indices"])
+            group["dirs"] |= other["dirs"]
+            group["repos"] |= other["repos"]
+        groups.append(group)
+    return sorted((group["indices"] for group in groups), key=lambda group: group[0])
+
+
+def _acquire_source(metadata, idx, source_dict, downloaded=None):
+    """Download/check out/copy source item #``idx`` and verify its content hash."""
+    folder = source_dict.get("folder")
+    src_dir = _source_dir(metadata, source_dict)
+    if any(k in source_dict for k in ("fn", "url")):
+        unpack(
+            source_dict,
+            src_dir,
+            metadata.config.src_cache,
+            recipe_path=metadata.path,
+            croot=metadata.config.croot,
+            verbose=metadata.config.verbose,
+            timeout=metadata.config.timeout,
+            locking=metadata.config.locking,
+            downloaded=downloaded.result() if downloaded else None,
+        )
+    elif "git_url" in source_dict:
+        git_source(
+            source_dict,
+            metadata.config.git_cache,
+            src_dir,
+            metadata.path,
+            verbose=metadata.config.verbose,
+        )
+    # build to make sure we have a work directory with source in it. We
+    #    want to make sure that whatever version that is does not
+    #    interfere with the test we run next.
+    elif "hg_url" in source_dict:
+        hg_source(
+            source_dict,
+            src_dir,
+            metadata.config.hg_cache,
+            verbose=metadata.config.verbose,
+        )
+    elif "svn_url" in source_dict:
+        svn_source(
+            source_dict,
+            src_dir,
+            metadata.config.svn_cache,
+            verbose=metadata.config.verbose,
+            timeout=metadata.config.timeout,
+            locking=metadata.config.locking,
+        )
+    elif "path" in source_dict:
+        source_path = os.path.expanduser(source_dict["path"])
+        path = normpath(abspath(join(metadata.path, source_path)))
+        path_via_symlink = "path_via_symlink" in source_dict
+        if path_via_symlink and not folder:
+            print(
+                "WARNING: `path_via_symlink` is too dangerous without specifying a folder,\n"
+                "  conda could end up changing - or deleting - your local source code!\n"
+                "  Going to make copies instead. When using `path_via_symlink` you should\n"
+                "  also take care to run the build outside of your local source code folder(s)\n"
+                "  unless that is your intention."
+            )
+            path_via_symlink = False
+            sys.exit(1)
+        if path_via_symlink:
+            src_dir_symlink = os.path.dirname(src_dir)
+            if not isdir(src_dir_symlink):
+                os.makedirs(src_dir_symlink)
+            if metadata.config.verbose:
+                print(f"Creating sybmolic link pointing to {path} at {src_dir}")
+            os.symlink(path, src_dir)
+        else:
+            if metadata.config.verbose:
+                print(f"Copying {path} to {src_dir}")
+            # careful here: we set test path to be outside of conda-build root in setup.cfg.
+            #    If you don't do that, this is a recursive function
+            copy_into(
+                path,
+                src_dir,
+                metadata.config.timeout,
+                symlinks=True,
+                locking=metadata.config.locking,
+                clobber=True,
+            )
+    else:  # no source
+        if not isdir(src_dir):
+            os.makedirs(src_dir, exist_ok=True)
+
+    for hash_type in CONTENT_HASH_KEYS:
+        if hash_type in source_dict:
+            expected_content_hash = source_dict[hash_type]
+            if expected_content_hash in (None, ""):
+                raise ValueError(
+                    f"Empty {hash_type} hash provided for source item #{idx}"
+                )
+            algorithm = hash_type[len("content_") :]
+            obtained_content_hash = compute_content_hash(
+                src_dir,
+                algorithm,
+                skip=ensure_list(source_dict.get("content_hash_skip") or ()),
+            )
+            if expected_content_hash != obtained_content_hash:
+                raise RuntimeError(
+                    f"{hash_type} mismatch in source item #{idx}: "
+                    f"obtained '{obtained_content_hash}' != "
+                    f"expected '{expected_content_hash}'"
+                )
+
+
+def _apply_patches(metadata, sources, idx):
+    source_dict = sources[idx]
+    src_dir = _source_dir(metadata, source_dict)
+    # patches of a source after a git source can be applied with git
+    git = None
+    if any("git_url" in other for other in sources[: idx + 1]):
+        git = external.find_executable("git")
+    patches = ensure_list(source_dict.get("patches", []))
+    patch_attributes_output = []
+    for patch in patches:
+        patch_attributes_output += [
+            apply_one_patch(src_dir, metadata.path, patch, metadata.config, git)
+        ]
+    _patch_attributes_debug_print(patch_attributes_output)
+
+
+def _download_fn(source_dict):
+    """The name a source is downloaded to in the source cache (before hashes are added)."""
+    if "fn" in source_dict:
+        return source_dict["fn"]
+    return basename(ensure_list(source_dict["url"])[0])
+
+
+def _download_serially(metadata, source_dicts, futures):
+    """
+    Download sources one after another, setting the result of each source's future. The
+    same file is only downloaded once.
+    """
+    outcomes = {}
+    for source_dict, future in zip(source_dicts, futures):
+        key = json.dumps(
+            [source_dict.get(k) for k in ("url", "fn", *ACCEPTED_HASH_TYPES)]
+        )
+        if key not in outcomes:
+            try:
+                outcomes[key] = (
+                    download_to_cache(
+                        metadata.config.src_cache,
+                        metadata.path,
+                        source_dict,
+                        metadata.config.verbose,
+                    ),
+                    None,
+                )
+            except Exception as e:
+                outcomes[key] = (None, e)
+        result, exception = outcomes[key]
+        if exception is None:
+            future.set_result(result)
+        else:
+            future.set_exception(exception)
+
+
+@span("source", "source")
 def provide(metadata):
     """
     given a recipe_dir:
       - download (if necessary)
       - unpack
       - apply patches (if any)
+
+    Downloads run concurrently. Sources that do not overlap each other are also unpacked
+    (or checked out, copied) concurrently, then the patches are applied in recipe order.
     """
     os.makedirs(metadata.config.build_folder, exist_ok=True)
-    git = None
+    sources = metadata.get_section("source")
+    groups = _overlapping_sources(metadata, sources)
+
+    def provide_group(indices, downloads):
+        for idx in indices:
+            _acquire_source(metadata, idx, sources[idx], downloads.get(idx))
+            if idx != indices[-1]:
+                # a later source overlays this one, patch before that happens
+                _apply_patches(metadata, sources, idx)
 
     try:
-        for idx, source_dict in enumerate(metadata.get_section("source")):
-            folder = source_dict.get("folder")
-            src_dir = os.path.join(metadata.config.work_dir, folder if folder else "")
-            if any(k in source_dict for k in ("fn", "url")):
-                unpack(
-                    source_dict,
-                    src_dir,
-                    metadata.config.src_cache,
-                    recipe_path=metadata.path,
-                    croot=metadata.config.croot,
-                    verbose=metadata.config.verbose,
-                    timeout=metadata.config.timeout,
-                    locking=metadata.config.locking,
-                )
-            elif "git_url" in source_dict:
-                git = git_source(
-                    source_dict,
-                    metadata.config.git_cache,
-                    src_dir,
-                    metadata.path,
-                    verbose=metadata.config.verbose,
+        max_workers = min(get_max_workers(), max(len(sources), 1))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            downloads = {}
+            # sources are downloaded to (and hashed, moved in) the cache by name, so
+            #     downloads of the same name run one after another
+            by_fn = {}
+            for idx, source_dict in enumerate(sources):
+                if any(k in source_dict for k in ("fn", "url")):
+                    downloads[idx] = Future()
+                    by_fn.setdefault(_download_fn(source_dict), []).append(idx)
+            for indices in by_fn.values():
+                executor.submit(
+                    _download_serially,
+                    metadata,
+                    [sources[idx] for idx in indices],
+                    [downloads[idx] for idx in indices],
                 )
-            # build to make sure we have a work directory with source in it. We
-            #    want to make sure that whatever version that is does not
-            #    interfere with the test we run next.
-            elif "hg_url" in source_dict:
-                hg_source(
-                    source_dict,
-                    src_dir,
-                    metadata.config.hg_cache,
-                    verbose=metadata.config.verbose,
-                )
-            elif "svn_url" in source_dict:
-                svn_source(
-                    source_dict,
-                    src_dir,
-                    metadata.config.svn_cache,
-                    verbose=metadata.config.verbose,
-                    timeout=metadata.config.timeout,
-                    locking=metadata.config.locking,
-                )
-            elif "path" in source_dict:
-                source_path = os.path.expanduser(source_dict["path"])
-                path = normpath(abspath(join(metadata.path, source_path)))
-                path_via_symlink = "path_via_symlink" in source_dict
-                if path_via_symlink and not folder:
-                    print(
-                        "WARNING: `path_via_symlink` is too dangerous without specifying a folder,\n"
-                        "  conda could end up changing - or deleting - your local source code!\n"
-                        "  Going to make copies instead. When using `path_via_symlink` you should\n"
-                        "  also take care to run the build outside of your local source code folder(s)\n"
-                        "  unless that is your intention."
-                    )
-                    path_via_symlink = False
-                    sys.exit(1)
-                if path_via_symlink:
-                    src_dir_symlink = os.path.dirname(src_dir)
-                    if not isdir(src_dir_symlink):
-                        os.makedirs(src_dir_symlink)
-                    if metadata.config.verbose:
-                        print(f"Creating sybmolic link pointing to {path} at {src_dir}")
-                    os.symlink(path, src_dir)
-                else:
-                    if metadata.config.verbose:
-                        print(f"Copying {path} to {src_dir}")
-                    # careful here: we set test path to be outside of conda-build root in setup.cfg.
-                    #    If you don't do that, this is a recursive function
-                    copy_into(
-                        path,
-                        src_dir,
-                        metadata.config.timeout,
-                        symlinks=True,
-                        locking=metadata.config.locking,
-                        clobber=True,
-                    )
-            else:  # no source
-                if not isdir(src_dir):
-                    os.makedirs(src_dir)
-
-            for hash_type in CONTENT_HASH_KEYS:
-                if hash_type in source_dict:
-                    expected_content_hash = source_dict[hash_type]
-                    if expected_content_hash in (None, ""):
-                        raise ValueError(
-                            f"Empty {hash_type} hash provided for source item #{idx}"
-                        )
-                    algorithm = hash_type[len("content_") :]
-                    obtained_content_hash = compute_content_hash(
-                        src_dir,
-                        algorithm,
-                        skip=ensure_list(source_dict.get("content_hash_skip") or ()),
-                    )
-                    if expected_content_hash != obtained_content_hash:
-                        raise RuntimeError(
-                            f"{hash_type} mismatch in source item #{idx}: "
-                            f"obtained '{obtained_content_hash}' != "
-                            f"expected '{expected_content_hash}'"
-                        )
-            patches = ensure_list(source_dict.get("patches", []))
-            patch_attributes_output = []
-            for patch in patches:
-                patch_attributes_output += [
-                    apply_one_patch(src_dir, metadata.path, patch, metadata.config, git)
-                ]
-            _patch_attributes_debug_print(patch_attributes_output)
+            futures = [
+                executor.submit(provide_group, indices, downloads) for indices in groups
+            ]
+            # wait for everything, then raise the first error in recipe order
+            wait(futures)
+            for future in futures:
+                future.result()
+
+        for idx in sorted(indices[-1] for indices in groups):
+            _apply_patches(metadata, sources, idx)
 
     except CalledProcessError:
         shutil.move(
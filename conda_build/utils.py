@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import contextlib
+import copy
 import fnmatch
 import hashlib
 import json
@@ -13,6 +14,7 @@ import os
 import re
 import secrets
 import shutil
+import sqlite3
 import stat
 import subprocess
 import sys
@@ -43,7 +45,7 @@ from os.path import (
     join,
 )
 from pathlib import Path
-from threading import Thread
+from threading import RLock, Thread
 from typing import TYPE_CHECKING, overload
 
 import conda_package_handling.api
@@ -86,6 +88,7 @@ on_linux = sys.platform == "linux"
 
 codec = getpreferredencoding() or "utf-8"
 mmap_MAP_PRIVATE = 0 if on_win else mmap.MAP_PRIVATE
+mmap_MAP_SHARED = 0 if on_win else mmap.MAP_SHARED
 mmap_PROT_READ = 0 if on_win else mmap.PROT_READ
 mmap_PROT_WRITE = 0 if on_win else mmap.PROT_WRITE
 
@@ -1269,14 +1272,19 @@ def islist(
         return False
 
 
+# the working directory is shared by all threads, so only one of them may change it
+_chdir_lock = RLock()
+
+
 @contextlib.contextmanager
 def tmp_chdir(dest):
-    curdir = os.getcwd()
-    try:
-        os.chdir(dest)
-        yield
-    finally:
-        os.chdir(curdir)
+    with _chdir_lock:
+        curdir = os.getcwd()
+        try:
+            os.chdir(dest)
+            yield
+        finally:
+            os.chdir(curdir)
 
 
 def expand_globs(
@@ -1802,6 +1810,95 @@ def prefix_files(prefix: str | os.PathLike | Path) -> set[str]:
     return prefix_files
 
 
+class PrefixSnapshot:
+    """
+    Incremental snapshot of all files in a prefix, see :func:`prefix_files`.
+
+    The prefix is walked with ``os.scandir`` and the entries of every directory are cached
+    alongside the directory's mtime. :meth:`refresh` only re-scans directories that are new
+    or whose mtime changed, so repeated snapshots of a large, mostly unchanged prefix only
+    cost one ``stat`` per directory.
+    """
+
+    #: directories modified this close (in ns) to a scan are always re-scanned next time,
+    #: to cope with filesystems that have coarse timestamps
+    racy_window = 2_000_000_000
+
+    def __init__(self, prefix: str | os.PathLike | Path):
+        self.prefix = os.path.abspath(prefix)
+        # relative directory -> (mtime_ns, racy, files, subdirectories)
+        self._dirs: dict[str, tuple[int, bool, tuple[str, ...], tuple[str, ...]]] = {}
+        self._files: set[str] | None = None
+        self.refresh()
+
+    def _scandir(self, reldir: str) -> tuple[tuple[str, ...], tuple[str, ...]]:
+        files = []
+        subdirs = []
+        try:
+            with os.scandir(join(self.prefix, reldir)) as entries:
+                for entry in entries:
+                    relpath = join(reldir, entry.name) if reldir else entry.name
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                    except OSError:
+                        is_dir = False
+                    # symlinks (even to directories) are "files"
+                    (subdirs if is_dir else files).append(relpath)
+        except OSError:
+            pass
+        return tuple(files), tuple(subdirs)
+
+    def refresh(self) -> PrefixSnapshot:
+        """Update the snapshot in place, re-scanning only the changed directories."""
+        scan_start = time.time_ns()
+        dirs = {}
+        stack = [""]
+        while stack:
+            reldir = stack.pop()
+            try:
+                mtime = os.stat(join(self.prefix, reldir)).st_mtime_ns
+            except OSError:
+                continue
+            cached = self._dirs.get(reldir)
+            if cached and cached[0] == mtime and not cached[1]:
+                files, subdirs = cached[2], cached[3]
+            else:
+                files, subdirs = self._scandir(reldir)
+            dirs[reldir] = (
+                mtime,
+                mtime >= scan_start - self.racy_window,
+                files,
+                subdirs,
+            )
+            stack.extend(subdirs)
+        self._dirs = dirs
+        self._files = None
+        return self
+
+    @property
+    def files(self) -> set[str]:
+        """All files in the prefix as of the last refresh (a new set on each refresh)."""
+        if self._files is None:
+            self._files = {
+                file for _, _, files, _ in self._dirs.values() for file in files
+            }
+        return self._files
+
+    def copy(self) -> PrefixSnapshot:
+        """Return a frozen copy, e.g. to diff against after a later :meth:`refresh`."""
+        new = copy.copy(self)
+        new._dirs = dict(self._dirs)
+        return new
+
+    def difference(self, other: PrefixSnapshot | Iterable[str]) -> set[str]:
+        """Files in this snapshot that are not in ``other``."""
+        if isinstance(other, PrefixSnapshot):
+            other = other.files
+        return self.files.difference(other)
+
+    __sub__ = difference
+
+
 def mmap_mmap(
     fileno,
     length,
@@ -2023,6 +2120,132 @@ def sha256_checksum(filename, buffersize=65536):
     return sha256.hexdigest()
 
 
+class FileHashCache:
+    """
+    Persistent cache of the sha256 checksums of files, stored in a small sqlite database.
+
+    Entries are keyed by ``(st_dev, st_ino, st_size, st_mtime_ns)`` of the (resolved) file
+    and also record its size and type, so an unchanged file is never re-hashed while a
+    modified or replaced one gets a new key. Only the entries of the files being hashed are
+    read and only new entries are written. Misses are hashed on a thread pool since hashlib
+    releases the GIL.
+    """
+
+    #: the oldest entries are dropped when the database grows beyond this
+    max_entries = 500_000
+    #: keys looked up per query, below SQLite's default limit on query parameters
+    batch_size = 500
+
+    def __init__(self, cache_dir: str | os.PathLike | Path | None = None):
+        self.path = join(cache_dir, "sha256.db") if cache_dir else None
+        self._new_entries = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=60)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS sha256 "
+            "(key TEXT PRIMARY KEY, sha256 TEXT, size INTEGER, type TEXT)"
+        )
+        return connection
+
+    def _load(self, keys: Iterable[str]) -> dict[str, str]:
+        """Look up the checksums of ``keys`` in the database."""
+        keys = list(keys)
+        if not self.path or not keys:
+            return {}
+        found = {}
+        try:
+            with contextlib.closing(self._connect()) as connection:
+                for start in range(0, len(keys), self.batch_size):
+                    batch = keys[start : start + self.batch_size]
+                    found.update(
+                        connection.execute(
+                            "SELECT key, sha256 FROM sha256 WHERE key IN "
+                            f"({', '.join('?' * len(batch))})",
+                            batch,
+                        )
+                    )
+        except sqlite3.Error as e:
+            get_logger(__name__).debug("Unable to read file hash cache: %s", e)
+        return found
+
+    @staticmethod
+    def key(st: os.stat_result) -> str:
+        return f"{st.st_dev}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}"
+
+    def sha256_checksum(self, path: str | os.PathLike) -> str | None:
+        """Cached equivalent of :func:`sha256_checksum`."""
+        return self.sha256_checksums([path])[os.fspath(path)]
+
+    def sha256_checksums(
+        self, paths: Iterable[str | os.PathLike], max_workers: int | None = None
+    ) -> dict[str, str | None]:
+        """Cached equivalent of :func:`sha256_checksum` for many paths."""
+        checksums = {}
+        keys = {}
+        for path in map(os.fspath, paths):
+            try:
+                st = os.stat(path)
+            except OSError:
+                st = None
+            if st is None or not stat.S_ISREG(st.st_mode):
+                # symlinks to nowhere (or to directories) and non-files
+                checksums[path] = sha256_checksum(path)
+                continue
+            keys.setdefault(self.key(st), (st, []))[1].append(path)
+
+        cached = self._load(key for key in keys if key not in self._new_entries)
+        misses = {}
+        for key, (st, paths) in keys.items():
+            entry = self._new_entries.get(key)
+            sha256 = entry["sha256"] if entry else cached.get(key)
+            if sha256:
+                checksums.update(dict.fromkeys(paths, sha256))
+            else:
+                misses[key] = (st, paths)
+
+        if misses:
+            from concurrent.futures import ThreadPoolExecutor
+
+            with ThreadPoolExecutor(get_max_workers(max_workers)) as executor:
+                hashes = executor.map(
+                    lambda paths: sha256_checksum(paths[0]),
+                    (paths for _, paths in misses.values()),
+                )
+                for (key, (st, paths)), sha256 in zip(misses.items(), hashes):
+                    self._new_entries[key] = {
+                        "sha256": sha256,
+                        "size": st.st_size,
+                        "type": "file",
+                    }
+                    checksums.update(dict.fromkeys(paths, sha256))
+        return checksums
+
+    def save(self) -> None:
+        """Write new entries to the database, which may be updated concurrently."""
+        if not self.path or not self._new_entries:
+            return
+        try:
+            os.makedirs(dirname(self.path), exist_ok=True)
+            with contextlib.closing(self._connect()) as connection, connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO sha256 VALUES (?, ?, ?, ?)",
+                    (
+                        (key, entry["sha256"], entry["size"], entry["type"])
+                        for key, entry in self._new_entries.items()
+                    ),
+                )
+                # rowids only grow, so this drops the oldest entries
+                connection.execute(
+                    "DELETE FROM sha256 WHERE rowid <= "
+                    "(SELECT MAX(rowid) FROM sha256) - ?",
+                    (self.max_entries,),
+                )
+        except (OSError, sqlite3.Error) as e:
+            get_logger(__name__).debug("Unable to save file hash cache: %s", e)
+        self._new_entries = {}
+
+
 def compute_content_hash(
     directory: str | Path, algorithm="sha256", skip: Iterable[str] = ()
 ) -> str:
@@ -2230,6 +2453,27 @@ def download_channeldata(channel_url):
     return data
 
 
+run_exports_cache = {}
+
+
+def download_run_exports(subdir_url):
+    """
+    The run_exports.json (CEP 12) of a channel subdir, or an empty dict if the channel
+    does not provide one.
+    """
+    if subdir_url.startswith("file://") or subdir_url not in run_exports_cache:
+        with TemporaryDirectory() as td:
+            tf = os.path.join(td, "run_exports.json")
+            try:
+                download(subdir_url + "/run_exports.json", tf)
+                with open(tf) as f:
+                    data = json.load(f)
+            except (JSONDecodeError, CondaHTTPError):
+                data = {}
+        run_exports_cache[subdir_url] = data
+    return run_exports_cache[subdir_url]
+
+
 def shutil_move_more_retrying(src, dest, debug_name):
     log = get_logger(__name__)
     log.info(f"Renaming {debug_name} directory '{src}' to '{dest}'")
@@ -2311,3 +2555,18 @@ def create_file_with_permissions(path: str, permissions: int):
             yield fh
 
         shutil.move(tmp_path, path)
+
+
+def get_max_workers(max_workers: int | None = None) -> int:
+    """
+    Number of workers to use for conda-build's own thread and process pools.
+
+    An explicit value wins, then ``CPU_COUNT`` (the variable recipes already use to
+    size their own builds), then the number of CPUs on the machine.
+    """
+    if max_workers:
+        return max(1, int(max_workers))
+    try:
+        return max(1, int(os.getenv("CPU_COUNT", "")))
+    except ValueError:
+        return os.cpu_count() or 1
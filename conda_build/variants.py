@@ -10,6 +10,7 @@ import re
 import sys
 from collections import OrderedDict
 from copy import copy
+from dataclasses import dataclass, field
 from functools import cache
 from itertools import product
 from pathlib import Path
@@ -571,6 +572,19 @@ def explode_variants(spec):
     :return: Exploded specification
     :rtype: `list` of `dict`
     """
+    return list(_iter_variants(*_explode_dimensions(spec)))
+
+
+def _explode_dimensions(spec):
+    """
+    Split `spec` into the values shared by all variants and the dimensions the variants
+    are exploded along.
+
+    :param spec: Specification to explode
+    :type spec: `dict`
+    :return: Passthru values and, for every exploded key or zip group, its choices
+    :rtype: `tuple` of `dict` and `dict` of `tuple` to `list`
+    """
     zip_keys = _get_zip_keys(spec)
 
     # key/values from spec that do not explode
@@ -587,18 +601,49 @@ def explode_variants(spec):
         {zg: list(zip(*(ensure_list(spec[k]) for k in zg))) for zg in zip_keys}
     )
     trim_empty_keys(explode)
+    return passthru, explode
+
 
+def _iter_variants(passthru, explode):
+    """Lazily yield the Cartesian product of the dimensions from :func:`_explode_dimensions`."""
     # Cartesian Product of dict of lists
     # http://stackoverflow.com/a/5228294/1170370
     # dict.keys() and dict.values() orders are the same even prior to Python 3.6
-    variants = []
     for values in product(*explode.values()):
         variant = {k: copy(v) for k, v in passthru.items()}
         variant.update(
             {k: v for zg, zv in zip(explode, values) for k, v in zip(zg, zv)}
         )
-        variants.append(variant)
-    return variants
+        yield variant
+
+
+def _filter_dimension_by_key_value(explode, key, values, source_name):
+    """
+    :func:`filter_by_key_value` on the dimensions from :func:`_explode_dimensions`.
+
+    Every variant takes `key` from the one dimension `key` is part of, so filtering that
+    dimension's choices is the same as filtering the exploded variants, without exploding.
+    Like ``filter_by_key_value(...) or variants``, filtering out every choice is ignored.
+    """
+    if hasattr(values, "keys"):
+        return
+    for keys, choices in explode.items():
+        if key not in keys:
+            continue
+        reduced_choices = []
+        for choice in choices:
+            value = dict(zip(keys, choice)).get(key)
+            if value is not None and value in values:
+                reduced_choices.append(choice)
+            else:
+                log = get_logger(__name__)
+                log.debug(
+                    f"Filtering variants with key {key} not matching target value(s) "
+                    f"({values}) from {source_name}, actual {value}"
+                )
+        if reduced_choices:
+            explode[keys] = reduced_choices
+        return
 
 
 # temporary backport for other places in cond_build
@@ -694,8 +739,9 @@ def filter_combined_spec_to_used_keys(combined_spec, specs):
     specs = specs.copy()
     del specs["internal_defaults"]
 
-    # TODO: act here?
-    combined_spec = explode_variants(combined_spec)
+    # filter the choices of each exploded key (or zip group) before exploding them, so only
+    #   the variants that survive filtering are ever created
+    passthru, explode = _explode_dimensions(combined_spec)
     # seen_keys makes sure that a setting from a lower-priority spec doesn't clobber
     # the same setting that has been redefined in a higher-priority spec.
     seen_keys = set()
@@ -706,12 +752,9 @@ def filter_combined_spec_to_used_keys(combined_spec, specs):
                 # when filtering ends up killing off all variants, we just ignore that.  Generally,
                 #    this arises when a later variant config overrides, rather than selects a
                 #    subspace of earlier configs
-                combined_spec = (
-                    filter_by_key_value(combined_spec, k, vs, source_name=source)
-                    or combined_spec
-                )
+                _filter_dimension_by_key_value(explode, k, vs, source_name=source)
                 seen_keys.add(k)
-    return combined_spec
+    return list(_iter_variants(passthru, explode))
 
 
 def get_package_variants(recipedir_or_metadata, config=None, variants=None):
@@ -743,76 +786,218 @@ def get_vars(
     }
 
 
+#: variant keys the scanner in :func:`_scan_used_variables` can find
+_PLAIN_KEY_RE = re.compile(r"[A-Za-z0-9_]+")
+_WORD_RE = re.compile(r"[A-Za-z0-9_]+")
+_SELECTOR_WORD_RE = re.compile(r"\w+")
+# `{{ var ...}}` and `{{ pin_subpackage('var' ...}}`
+_EXPRESSION_RE = re.compile(r"\{\s*([A-Za-z0-9_]+)")
+_PIN_EXPRESSION_RE = re.compile(r"\{\s*pin_[a-z]+\(\s*['\"]([A-Za-z0-9_]+)")
+_STATEMENT_RE = re.compile(r"(?<!\{)\{%\s*(elif|if|for|set)")
+_FOR_IN_RE = re.compile(r"(?=in\s*([A-Za-z0-9_]+))")
+_COMPILER_RE = re.compile(r"\{\s*(compiler|stdlib)\(['\"]([^'\"]*)['\"]")
+_REQUIREMENT_RE = re.compile(r"\s+-\s+(\S+)(.*)")
+_TARGET_RE = re.compile(r"(.*?)_(compiler|stdlib)(_version)?$")
+
+
+@dataclass
+class _VariableUsage:
+    """Where identifiers are used in a recipe text, see :func:`_scan_used_variables`."""
+
+    lines: list[str]
+    #: identifiers used in jinja2 expressions, statements or selectors, and their lines
+    identifiers: dict[str, list[int]] = field(default_factory=dict)
+    #: requirement names (with dashes as underscores) and their lines
+    requirements: dict[str, list[int]] = field(default_factory=dict)
+    #: the parts of `{% if %}` conditions variables are looked for in, NUL separated
+    conditions: str = ""
+    #: (kind, language) of `{{ compiler('language') }}` and `{{ stdlib('language') }}`
+    compilers: set[tuple[str, str]] = field(default_factory=set)
+    #: whether `{{ cdt(...) }}` is used
+    cdt: bool = False
+
+    def add(self, index: dict[str, list[int]], name: str, lineno: int) -> None:
+        index.setdefault(name, []).append(lineno)
+
+
+def _closes_statement(line: str, end: int) -> bool:
+    """Whether the first `%` from ``end`` on closes a jinja2 statement."""
+    percent = line.find("%", end)
+    return percent != -1 and line.startswith("}", percent + 1)
+
+
+def _scan_selector(usage: _VariableUsage, line: str, lineno: int) -> None:
+    # the selector is the first `[`, preceded by whitespace or by `# `
+    start = min((i for i in (line.find("#"), line.find("[")) if i != -1), default=-1)
+    if start == -1:
+        return
+    if line[start] == "[":
+        if not start or not line[start - 1].isspace():
+            return
+    elif line[start + 1 : start + 2].isspace() and line[start + 2 : start + 3] == "[":
+        start += 2
+    else:
+        return
+    end = line.find("]", start)
+    for match in _SELECTOR_WORD_RE.finditer(
+        line, start + 1, len(line) if end == -1 else end
+    ):
+        follow = line[match.end() : match.end() + 1]
+        if follow and (follow in "=<>!]" or follow.isspace()):
+            usage.add(usage.identifiers, match.group(), lineno)
+
+
+def _scan_jinja(usage: _VariableUsage, line: str, lineno: int) -> None:
+    for regex in (_EXPRESSION_RE, _PIN_EXPRESSION_RE):
+        for match in regex.finditer(line):
+            end = match.end(1)
+            if end < len(line) and line.find("}}", end + 1) != -1:
+                usage.add(usage.identifiers, match.group(1), lineno)
+
+    for match in _COMPILER_RE.finditer(line):
+        close = line.find("}", match.end())
+        if close != -1 and "{" not in line[match.end() : close]:
+            usage.compilers.add(match.groups())
+
+    statements = {}
+    for match in _STATEMENT_RE.finditer(line):
+        kind = "if" if match.group(1) == "elif" else match.group(1)
+        statements.setdefault(kind, match.end())
+
+    if "if" in statements:
+        # anything up to a `%}` may contain the variable, even as part of a longer name
+        parts = line[statements["if"] :].split("%")
+        conditions = [
+            part
+            for part, following in zip(parts, parts[1:])
+            if following.startswith("}")
+        ]
+        if conditions:
+            usage.conditions += "\0" + "\0".join(conditions)
+    if "for" in statements:
+        for match in _FOR_IN_RE.finditer(line, statements["for"]):
+            if _closes_statement(line, match.end(1)):
+                usage.add(usage.identifiers, match.group(1), lineno)
+    if "set" in statements and (equals := line.find("=", statements["set"])) != -1:
+        for match in _WORD_RE.finditer(line, equals + 1):
+            if _closes_statement(line, match.end()):
+                usage.add(usage.identifiers, match.group(), lineno)
+
+
 @cache
+def _scan_used_variables(recipe_text: str, selectors_only: bool) -> _VariableUsage:
+    """
+    Tokenize ``recipe_text`` once into an index of the identifiers it uses, so that
+    the variables used out of any set of variant keys can be looked up directly.
+
+    Without ``selectors_only`` identifiers are collected from jinja2 expressions,
+    `{% if %}`, `{% for %}` and `{% set %}` statements and requirement lines, with
+    ``selectors_only`` only from selectors.
+    """
+    usage = _VariableUsage(recipe_text.splitlines())
+    for lineno, line in enumerate(usage.lines):
+        if "{{" in line and "cdt(" in line and re.search(r"\{\{\s*cdt\(", line):
+            usage.cdt = True
+        if selectors_only:
+            if "[" in line:
+                _scan_selector(usage, line, lineno)
+            continue
+        if "{" in line:
+            _scan_jinja(usage, line, lineno)
+        if "-" in line and (match := _REQUIREMENT_RE.match(line)):
+            rest = match.group(2).lstrip()
+            if not rest or rest[0] in "[#":
+                name = match.group(1).replace("-", "_")
+                usage.add(usage.requirements, name, lineno)
+    return usage
+
+
+def _find_used_variable_by_regex(v, recipe_lines, selectors_only=False) -> bool:
+    all_res = []
+    target_match = _TARGET_RE.match(v)
+    if target_match and not selectors_only:
+        target_lang = target_match.group(1)
+        target_kind = target_match.group(2)
+        target_lang_regex = re.escape(target_lang)
+        target_regex = (
+            rf"\{{\s*{target_kind}\([\'\"]{target_lang_regex}[\"\'][^\{{]*?\}}"
+        )
+        all_res.append(target_regex)
+        variant_lines = [
+            line for line in recipe_lines if v in line or target_lang in line
+        ]
+    elif v.startswith("cdt_"):
+        variant_lines = [line for line in recipe_lines if v in line or "cdt(" in line]
+        all_res.append(r"\{{\s*cdt\(")
+    else:
+        variant_lines = [line for line in recipe_lines if v in line.replace("-", "_")]
+    if not variant_lines:
+        return False
+    v_regex = re.escape(v)
+    v_req_regex = "[-_]".join(map(re.escape, v.split("_")))
+    variant_regex = rf"\{{\s*(?:pin_[a-z]+\(\s*?['\"])?{v_regex}[^_0-9a-zA-Z].*?\}}\}}"
+    selector_regex = rf"^[^#\[]*?\#?\s\[[^\]]*?(?<![_\w\d]){v_regex}[=\s<>!\]]"
+    # NOTE: why use a regex instead of the jinja2 parser/AST?
+    # One can ask the jinja2 parser for undefined variables, but conda-build moves whole
+    # blocks of text around when searching for variables and applies selectors to the text.
+    # So the text that reaches this function is not necessarily valid jinja2 syntax. :/
+    conditional_regex = (
+        r"(?:^|[^\{])\{%\s*(?:el)?if\s*.*" + v_regex + r"\s*(?:[^%]*?)?%\}"
+    )
+    # TODO: this `for` regex won't catch some common cases like lists of vars, multiline
+    # jinja2 blocks, if filters on the for loop, etc.
+    for_regex = (
+        r"(?:^|[^\{])\{%\s*for\s*.*\s*in\s*"
+        + v_regex
+        + r"(?![a-zA-Z_0-9])(?:[^%]*?)?%\}"
+    )
+    set_regex = (
+        r"(?:^|[^\{])\{%\s*set\s*.*\s*=\s*.*"
+        r"(?<![a-zA-Z_0-9])" + v_regex + r"(?![a-zA-Z_0-9])(?:[^%]*?)?%\}"
+    )
+    # plain req name, no version spec.  Look for end of line after name, or comment or selector
+    requirement_regex = rf"^\s+\-\s+{v_req_regex}\s*(?:\s[\[#]|$)"
+    if selectors_only:
+        all_res.insert(0, selector_regex)
+    else:
+        all_res.extend(
+            [
+                variant_regex,
+                requirement_regex,
+                conditional_regex,
+                for_regex,
+                set_regex,
+            ]
+        )
+    # consolidate all re's into one big one for speedup
+    all_res = r"|".join(all_res)
+    return any(re.search(all_res, line) for line in variant_lines)
+
+
 def find_used_variables_in_text(variant, recipe_text, selectors_only=False):
+    usage = _scan_used_variables(recipe_text, selectors_only)
     used_variables = set()
-    recipe_lines = recipe_text.splitlines()
     for v in variant:
-        all_res = []
-        target_match = re.match(r"(.*?)_(compiler|stdlib)(_version)?$", v)
-        if target_match and not selectors_only:
-            target_lang = target_match.group(1)
-            target_kind = target_match.group(2)
-            target_lang_regex = re.escape(target_lang)
-            target_regex = (
-                rf"\{{\s*{target_kind}\([\'\"]{target_lang_regex}[\"\'][^\{{]*?\}}"
+        target_match = not selectors_only and _TARGET_RE.match(v)
+        if not _PLAIN_KEY_RE.fullmatch(v):
+            # keys the scanner cannot tokenize are rare, look for them line by line
+            used = _find_used_variable_by_regex(v, usage.lines, selectors_only)
+        elif v in usage.identifiers or v in usage.conditions:
+            used = True
+        elif target_match:
+            target_lang, target_kind = target_match.group(1, 2)
+            used = (target_kind, target_lang) in usage.compilers or any(
+                v in usage.lines[lineno] or target_lang in usage.lines[lineno]
+                for lineno in usage.requirements.get(v, ())
             )
-            all_res.append(target_regex)
-            variant_lines = [
-                line for line in recipe_lines if v in line or target_lang in line
-            ]
         elif v.startswith("cdt_"):
-            variant_lines = [
-                line for line in recipe_lines if v in line or "cdt(" in line
-            ]
-            all_res.append(r"\{{\s*cdt\(")
-        else:
-            variant_lines = [
-                line for line in recipe_lines if v in line.replace("-", "_")
-            ]
-        if not variant_lines:
-            continue
-        v_regex = re.escape(v)
-        v_req_regex = "[-_]".join(map(re.escape, v.split("_")))
-        variant_regex = (
-            rf"\{{\s*(?:pin_[a-z]+\(\s*?['\"])?{v_regex}[^_0-9a-zA-Z].*?\}}\}}"
-        )
-        selector_regex = rf"^[^#\[]*?\#?\s\[[^\]]*?(?<![_\w\d]){v_regex}[=\s<>!\]]"
-        # NOTE: why use a regex instead of the jinja2 parser/AST?
-        # One can ask the jinja2 parser for undefined variables, but conda-build moves whole
-        # blocks of text around when searching for variables and applies selectors to the text.
-        # So the text that reaches this function is not necessarily valid jinja2 syntax. :/
-        conditional_regex = (
-            r"(?:^|[^\{])\{%\s*(?:el)?if\s*.*" + v_regex + r"\s*(?:[^%]*?)?%\}"
-        )
-        # TODO: this `for` regex won't catch some common cases like lists of vars, multiline
-        # jinja2 blocks, if filters on the for loop, etc.
-        for_regex = (
-            r"(?:^|[^\{])\{%\s*for\s*.*\s*in\s*"
-            + v_regex
-            + r"(?![a-zA-Z_0-9])(?:[^%]*?)?%\}"
-        )
-        set_regex = (
-            r"(?:^|[^\{])\{%\s*set\s*.*\s*=\s*.*"
-            r"(?<![a-zA-Z_0-9])" + v_regex + r"(?![a-zA-Z_0-9])(?:[^%]*?)?%\}"
-        )
-        # plain req name, no version spec.  Look for end of line after name, or comment or selector
-        requirement_regex = rf"^\s+\-\s+{v_req_regex}\s*(?:\s[\[#]|$)"
-        if selectors_only:
-            all_res.insert(0, selector_regex)
-        else:
-            all_res.extend(
-                [
-                    variant_regex,
-                    requirement_regex,
-                    conditional_regex,
-                    for_regex,
-                    set_regex,
-                ]
+            used = usage.cdt or any(
+                v in usage.lines[lineno] or "cdt(" in usage.lines[lineno]
+                for lineno in usage.requirements.get(v, ())
             )
-        # consolidate all re's into one big one for speedup
-        all_res = r"|".join(all_res)
-        if any(re.search(all_res, line) for line in variant_lines):
+        else:
+            used = v in usage.requirements
+        if used:
             used_variables.add(v)
             if v in ("c_stdlib", "c_compiler", "cxx_compiler"):
                 if "CONDA_BUILD_SYSROOT" in variant:
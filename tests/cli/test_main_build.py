@@ -15,6 +15,9 @@ from conda_build import api
 from conda_build.cli import main_build, main_render
 from conda_build.config import (
     Config,
+    env_templates_default,
+    package_workers_default,
+    render_workers_default,
     zstd_compression_level_default,
 )
 from conda_build.exceptions import CondaBuildUserError, DependencyNeedsBuildingError
@@ -532,6 +535,38 @@ def test_zstd_compression_level(
         assert config.zstd_compression_level == zstd_compression_level_default
 
 
+def test_package_workers():
+    _, args = main_build.parse_args(["non_existing_recipe"])
+    assert Config(**args.__dict__).package_workers == package_workers_default
+
+    _, args = main_build.parse_args(["non_existing_recipe", "--package-workers=4"])
+    assert Config(**args.__dict__).package_workers == 4
+
+
+def test_env_templates():
+    _, args = main_build.parse_args(["non_existing_recipe"])
+    assert Config(**args.__dict__).env_templates is (env_templates_default == "true")
+
+    _, args = main_build.parse_args(["non_existing_recipe", "--env-templates"])
+    assert Config(**args.__dict__).env_templates
+
+
+def test_render_cache():
+    _, args = main_build.parse_args(["non_existing_recipe"])
+    assert not Config(**args.__dict__).render_cache
+
+    _, args = main_build.parse_args(["non_existing_recipe", "--render-cache"])
+    assert Config(**args.__dict__).render_cache
+
+
+def test_render_workers():
+    _, args = main_build.parse_args(["non_existing_recipe"])
+    assert Config(**args.__dict__).render_workers == render_workers_default
+
+    _, args = main_build.parse_args(["non_existing_recipe", "--render-workers=4"])
+    assert Config(**args.__dict__).render_workers == 4
+
+
 def test_user_warning(tmpdir, recwarn):
     dir_recipe_path = tmpdir.mkdir("recipe-path")
     recipe = dir_recipe_path.join("meta.yaml")
@@ -0,0 +1,76 @@
+# Copyright (C) 2014 Anaconda, Inc
+# SPDX-License-Identifier: BSD-3-Clause
+from __future__ import annotations
+
+import os
+import time
+from functools import partial
+from typing import TYPE_CHECKING
+
+from conda_build.os_utils.liefldd import memoized_by_arg0_filehash
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from pytest import MonkeyPatch
+
+
+def test_memoized_by_arg0_filehash(tmp_path: Path, monkeypatch: MonkeyPatch):
+    calls = []
+
+    def parse(filename, arch="native"):
+        calls.append(filename)
+        with open(filename) as fh:
+            return [fh.read(), arch]
+
+    memoized = partial(memoized_by_arg0_filehash, path_dependent=False)(parse)
+    lib = tmp_path / "lib" / "libfoo.so"
+    lib.parent.mkdir()
+    lib.write_text("foo")
+
+    # in-process, files are looked up by their stat information
+    assert memoized(str(lib)) == ["foo", "native"]
+    assert memoized(str(lib)) == ["foo", "native"]
+    assert memoized(str(lib), arch="arm64") == ["foo", "arm64"]
+    assert len(calls) == 2
+
+    lib.write_text("bar")
+    os.utime(lib, ns=(0, 0))
+    assert memoized(str(lib)) == ["bar", "native"]
+    assert len(calls) == 3
+
+    # on disk, results are keyed by the contents of files
+    monkeypatch.setattr(memoized_by_arg0_filehash, "cache_dir", str(tmp_path / "cache"))
+    assert memoized(str(lib)) == ["bar", "native"]
+    assert len(calls) == 3  # still cached in-process
+    other = tmp_path / "other" / "libfoo.so"
+    other.parent.mkdir()
+    other.write_text("bar")
+    assert memoized(str(other)) == ["bar", "native"]
+    assert len(calls) == 4  # parsed, and stored on disk
+
+    # a new process reuses the results, for files with the same contents anywhere
+    memoized = partial(memoized_by_arg0_filehash, path_dependent=False)(parse)
+    assert memoized(str(lib)) == ["bar", "native"]
+    assert len(calls) == 4
+
+    # unless they depend on where the file is (and on the files around it)
+    memoized = memoized_by_arg0_filehash(parse)
+    assert memoized(str(other)) == ["bar", "native"]
+    assert memoized(str(lib)) == ["bar", "native"]
+    assert len(calls) == 6
+    memoized = memoized_by_arg0_filehash(parse)
+    assert memoized(str(lib)) == ["bar", "native"]
+    assert len(calls) == 7
+
+
+def test_memoized_by_arg0_filehash_prune(tmp_path: Path):
+    (used := tmp_path / "parse" / "used.pickle").parent.mkdir()
+    used.write_bytes(b"")
+    (unused := tmp_path / "parse" / "unused.pickle").write_bytes(b"")
+    old = time.time() - memoized_by_arg0_filehash.max_age - 60
+    os.utime(unused, (old, old))
+
+    memoized_by_arg0_filehash.prune(str(tmp_path))
+    assert used.exists()
+    assert not unused.exists()
@@ -47,6 +47,7 @@ from conda_build.exceptions import (
     RecipeError,
 )
 from conda_build.os_utils.external import find_executable
+from conda_build.profiler import profiler
 from conda_build.render import finalize_metadata
 from conda_build.utils import (
     check_call_env,
@@ -594,6 +595,44 @@ def test_failed_tests_exit_build(testing_config):
         )
 
 
+def test_failed_build_writes_stats_and_trace(
+    testing_config, tmp_path: Path, monkeypatch: MonkeyPatch
+):
+    monkeypatch.setattr(profiler, "enabled", False)
+    monkeypatch.setattr(profiler, "spans", [])
+    testing_config.stats_file = str(tmp_path / "stats.json")
+    testing_config.trace_file = str(tmp_path / "trace.json")
+    with pytest.raises(CondaBuildUserError, match="TESTS FAILED"):
+        api.build(
+            os.path.join(metadata_dir, "_test_failed_test_exits"), config=testing_config
+        )
+
+    assert "spans" in json.loads(Path(testing_config.stats_file).read_text())
+    trace = json.loads(Path(testing_config.trace_file).read_text())
+    assert "build" in {event["name"] for event in trace["traceEvents"]}
+    assert not profiler.enabled
+
+
+def test_trace_file_per_build(testing_config, tmp_path: Path, monkeypatch: MonkeyPatch):
+    monkeypatch.setattr(profiler, "enabled", False)
+    monkeypatch.setattr(profiler, "spans", [])
+    recipe = str(metadata_path / "empty_sections")
+
+    for name in ("first", "second"):
+        testing_config.trace_file = str(tmp_path / f"{name}.json")
+        api.build(recipe, config=testing_config, notest=True)
+        assert not profiler.enabled
+        trace = json.loads(Path(testing_config.trace_file).read_text())
+        # each trace only has the spans of its own build
+        assert [event["name"] for event in trace["traceEvents"]].count("build") == 1
+
+    # without a trace file, nothing is recorded
+    spans = list(profiler.spans)
+    testing_config.trace_file = None
+    api.build(recipe, config=testing_config, notest=True)
+    assert profiler.spans == spans
+
+
 @pytest.mark.sanity
 def test_requirements_txt_for_run_reqs(testing_config):
     """
@@ -116,6 +116,27 @@ def test_output_without_jinja_does_not_download(mocker, testing_config):
     mock.assert_not_called()
 
 
+def test_render_cache(testing_workdir, testing_config, mocker):
+    recipe = os.path.join(testing_workdir, "recipe")
+    os.makedirs(recipe)
+    with open(os.path.join(recipe, "meta.yaml"), "w") as f:
+        f.write("package:\n  name: render-cache\n  version: 1.0\n")
+    testing_config.render_cache = True
+    render_recipe = mocker.spy(render, "render_recipe")
+
+    metadata = api.render(recipe, config=testing_config)[0][0]
+    cached = api.render(recipe, config=testing_config)[0][0]
+
+    assert render_recipe.call_count == 1
+    assert cached.dist() == metadata.dist()
+
+    # a changed recipe is rendered again
+    with open(os.path.join(recipe, "meta.yaml"), "w") as f:
+        f.write("package:\n  name: render-cache\n  version: 2.0\n")
+    assert api.render(recipe, config=testing_config)[0][0].version() == "2.0"
+    assert render_recipe.call_count == 2
+
+
 def test_pin_compatible_semver(testing_config):
     recipe_dir = os.path.join(metadata_dir, "_pin_compatible")
     metadata = api.render(recipe_dir, config=testing_config)[0][0]
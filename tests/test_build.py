@@ -9,6 +9,7 @@ from __future__ import annotations
 
 import json
 import os
+import shutil
 import sys
 from contextlib import nullcontext
 from pathlib import Path
@@ -389,3 +390,170 @@ def test_tests_failed(testing_metadata: MetaData, tmp_path: Path):
             broken_dir=tmp_path,
             config=testing_metadata.config,
         )
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_scan_prefix_files(tmp_path: Path, max_workers: int, monkeypatch):
+    monkeypatch.setattr(build, "_PARALLEL_SCAN_MIN_FILES", 1)
+    prefix = str(tmp_path)
+    (tmp_path / "text").write_bytes(f"{prefix}/lib hello".encode())
+    (tmp_path / "binary").write_bytes(f"{prefix}\x00hello".encode())
+    (tmp_path / "empty").touch()
+    (tmp_path / "other").write_bytes(b"hello hello")
+    files = ["binary", "empty", "other", "text"]
+    prefix_re = f"({prefix})".encode()
+    replacements = [
+        {
+            "tag": "hello",
+            "glob_patterns": ["*"],
+            "regex_re": "(hel)lo",
+            "replacement_re": "bye",
+        }
+    ]
+
+    files_with_prefix, match_records = build.scan_prefix_files(
+        files,
+        prefix,
+        prefix_re=prefix_re,
+        prefix_files=["binary", "empty", "text"],
+        replacements=replacements,
+        max_workers=max_workers,
+    )
+
+    assert files_with_prefix == [
+        (prefix, "binary", "binary"),
+        (prefix, "text", "text"),
+    ]
+    # same records as the per-regex scan, which never looks at binaries
+    assert match_records == build.regex_files_py(
+        files,
+        prefix,
+        "hello",
+        b"(hel)lo",
+        "bye",
+        match_records={},
+    )
+    assert list(match_records) == ["other", "text"]
+
+
+@pytest.mark.skipif(not shutil.which("rg"), reason="requires ripgrep")
+def test_scan_prefix_files_rg(tmp_path: Path):
+    prefix = str(tmp_path)
+    (tmp_path / "text").write_bytes(f"{prefix}/lib".encode())
+    (tmp_path / "binary").write_bytes(f"{prefix}\x00".encode())
+    (tmp_path / "empty").touch()
+    (tmp_path / "a.pc").write_bytes(b'Libs: -L/opt/sysroot/lib -I"/a/sysroot/inc"')
+    (tmp_path / "b.pc").write_bytes(b"\x00-L/opt/sysroot/lib")
+    files = ["a.pc", "b.pc", "binary", "empty", "text"]
+    kwargs = {
+        "prefix_re": f"({prefix})".encode(),
+        "prefix_files": ["binary", "empty", "text"],
+        "replacements": [
+            {
+                "tag": "pkg-config build metadata",
+                "glob_patterns": ["*.pc"],
+                "regex_re": r"(?:-L|-I)?\"?([^;\s]+\/sysroot\/)",
+                "replacement_re": "$(CONDA_BUILD_SYSROOT_S)",
+                # a broader pre-filter for rg, tightened with regex_re
+                "regex_rg": r'([^;\s"]+/sysroot/)',
+            }
+        ],
+    }
+
+    files_with_prefix, match_records = build.scan_prefix_files(
+        files, prefix, rg=shutil.which("rg"), **kwargs
+    )
+
+    assert files_with_prefix == [
+        (prefix, "binary", "binary"),
+        (prefix, "text", "text"),
+    ]
+    assert list(match_records) == ["a.pc"]
+    assert [
+        (submatch["text"], submatch["start"], submatch["end"])
+        for submatch in match_records["a.pc"]["submatches"]
+    ] == [(b"/opt/sysroot/", 8, 21), (b"/a/sysroot/", 28, 39)]
+    # the same as without ripgrep
+    assert (files_with_prefix, match_records) == build.scan_prefix_files(
+        files, prefix, **kwargs
+    )
+
+
+@pytest.mark.skipif(not shutil.which("rg"), reason="requires ripgrep")
+def test_regex_files_rg(tmp_path: Path):
+    (tmp_path / "text").write_bytes(b"hello hello")
+    (tmp_path / "binary").write_bytes(b"\x00hello")
+    (tmp_path / "other").write_bytes(b"bye")
+    # repeated files are searched by several rg processes but only recorded once
+    files = ["binary", "other", "text"] * 5000
+
+    match_records = build.regex_files_rg(
+        files,
+        str(tmp_path),
+        "hello",
+        shutil.which("rg"),
+        b"(hel)lo",
+        "bye",
+        also_binaries=True,
+        match_records={},
+        max_workers=4,
+    )
+
+    assert list(match_records) == ["binary", "text"]
+    assert match_records["binary"]["type"] == "binary"
+    assert match_records["text"]["type"] == "text"
+    assert [
+        (submatch["start"], submatch["end"])
+        for submatch in match_records["text"]["submatches"]
+    ] == [(0, 5), (6, 11)]
+
+    # like regex_files_py, only with also_binaries
+    assert list(
+        build.regex_files_rg(
+            files,
+            str(tmp_path),
+            "hello",
+            shutil.which("rg"),
+            b"hello",
+            "bye",
+            match_records={},
+        )
+    ) == ["text"]
+
+
+def test_perform_replacements(tmp_path: Path):
+    old, new = b"/old/prefix", b"/new"
+    text = b"path=/old/prefix/bin\n" * 2000
+    binary = b"\x00/old/prefix/lib\x00" * 2000
+    (tmp_path / "text").write_bytes(text)
+    (tmp_path / "binary").write_bytes(binary)
+    (tmp_path / "hardlink").hardlink_to(tmp_path / "binary")
+
+    def matches(data, type_):
+        return {
+            "type": type_,
+            "submatches": [
+                {
+                    "tag": "prefix",
+                    "text": old,
+                    "start": start,
+                    "end": start + len(old),
+                    "regex_re": old,
+                    "replacement_re": new,
+                }
+                for start in range(data.index(old), len(data), len(data) // 2000)
+            ],
+        }
+
+    build.perform_replacements(
+        {"binary": matches(binary, "binary"), "text": matches(text, "text")},
+        str(tmp_path),
+        max_workers=2,
+    )
+
+    assert (tmp_path / "text").read_bytes() == text.replace(old, new)
+    assert (tmp_path / "binary").read_bytes() == binary.replace(
+        old, new.ljust(len(old), b"\x00")
+    )
+    # the other links of a rewritten file are left alone
+    assert (tmp_path / "hardlink").read_bytes() == binary
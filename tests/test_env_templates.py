@@ -0,0 +1,69 @@
+# Copyright (C) 2014 Anaconda, Inc
+# SPDX-License-Identifier: BSD-3-Clause
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING
+
+import pytest
+from conda.models.records import PackageRecord
+
+from conda_build import env_templates
+from conda_build.utils import on_win
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+pytestmark = pytest.mark.skipif(on_win, reason="environment templates are POSIX only")
+
+
+def record(name: str, sha256: str | None = "0" * 64) -> PackageRecord:
+    return PackageRecord(
+        name=name,
+        version="1.0",
+        build="0",
+        build_number=0,
+        channel="conda-forge",
+        subdir="noarch",
+        fn=f"{name}-1.0-0.conda",
+        sha256=sha256,
+    )
+
+
+def test_template_key() -> None:
+    prefix = "/tmp/a/_h_env_placehold"
+    key = env_templates.template_key([record("a"), record("b")], prefix)
+    assert key == env_templates.template_key([record("b"), record("a")], prefix)
+    assert key != env_templates.template_key([record("a")], prefix)
+    assert key != env_templates.template_key([record("a"), record("b")], prefix + "_")
+    assert env_templates.template_key([record("a", sha256=None)], prefix) is None
+
+
+def test_store_and_clone(tmp_path: Path) -> None:
+    pkgs = tmp_path / "pkgs"
+    pkgs.mkdir()
+    (pkgs / "libfoo.so").write_bytes(b"\x7fELF")
+
+    old = tmp_path / "build_1" / "_h_env_placehold"
+    new = tmp_path / "build_2" / "_h_env_placehold"
+    (old / "lib").mkdir(parents=True)
+    (old / "bin").mkdir()
+    os.link(pkgs / "libfoo.so", old / "lib" / "libfoo.so")
+    os.symlink("libfoo.so", old / "lib" / "libfoo.so.1")
+    (old / "bin" / "foo").write_text(f"#!{old}/bin/python\n")
+    (old / "bin" / "foo").chmod(0o755)
+    (old / "lib" / "foo.dat").write_bytes(b"\0" + bytes(old) + b"/lib\0")
+
+    templates = str(tmp_path / "templates")
+    key = env_templates.template_key([record("foo")], str(old))
+    env_templates.store(templates, key, str(old))
+    assert env_templates.clone(templates, key, str(new))
+
+    assert (new / "bin" / "foo").read_text() == f"#!{new}/bin/python\n"
+    assert os.access(new / "bin" / "foo", os.X_OK)
+    assert (new / "lib" / "foo.dat").read_bytes() == b"\0" + bytes(new) + b"/lib\0"
+    assert os.readlink(new / "lib" / "libfoo.so.1") == "libfoo.so"
+    assert (new / "lib" / "libfoo.so").read_bytes() == b"\x7fELF"
+
+    # prefixes of another length need their own template
+    assert not env_templates.clone(templates, key, f"{new}_")
@@ -4,7 +4,10 @@ import os
 import platform
 
 import pytest
+from conda.base.context import context
+from conda.models.records import PackageRecord
 
+from conda_build import environ
 from conda_build.environ import create_env, os_vars
 
 on_linux = platform.system() == "Linux"
@@ -50,3 +53,88 @@ def test_build_variable_defaults_to_architecture_based_distro(testing_metadata):
 
     # Verify BUILD uses default cos6 or cos7 (not a custom cdt_name)
     assert "conda_cos6" in env_vars["BUILD"] or "conda_cos7" in env_vars["BUILD"]
+
+
+def test_get_package_records_solve_cache(testing_workdir, testing_config, mocker):
+    install_actions = mocker.spy(environ, "_install_actions")
+    kwargs = {
+        "subdir": testing_config.host_subdir,
+        "bldpkgs_dirs": tuple(testing_config.bldpkgs_dirs),
+        "output_folder": testing_config.output_folder,
+        "channel_urls": tuple(testing_config.channel_urls),
+    }
+
+    precs = environ.get_package_records(testing_workdir, ["zlib"], "host", **kwargs)
+    # a new process only has the solve cache on disk
+    mocker.patch.object(environ, "cached_precs", {})
+    cached = environ.get_package_records(testing_workdir, ["zlib"], "host", **kwargs)
+
+    assert install_actions.call_count == 1
+    assert [prec.dist_str() for prec in cached] == [prec.dist_str() for prec in precs]
+    assert [prec.url for prec in cached] == [prec.url for prec in precs]
+
+    # the solve depends on the virtual packages of the system as well
+    mocker.patch.object(environ, "cached_precs", {})
+    records = context.plugin_manager.get_virtual_package_records()
+    mocker.patch.object(
+        context.plugin_manager,
+        "get_virtual_package_records",
+        return_value=(*records, PackageRecord.from_objects(records[0], version="99")),
+    )
+    environ.get_package_records(testing_workdir, ["zlib"], "host", **kwargs)
+    assert install_actions.call_count == 2
+
+
+@pytest.mark.parametrize("concurrent_envs", [False, True])
+def test_create_envs(testing_workdir, testing_config, mocker, concurrent_envs):
+    testing_config.concurrent_envs = concurrent_envs
+    create_env = mocker.spy(environ, "create_env")
+    kwargs = {
+        "subdir": testing_config.host_subdir,
+        "bldpkgs_dirs": tuple(testing_config.bldpkgs_dirs),
+        "output_folder": testing_config.output_folder,
+        "channel_urls": tuple(testing_config.channel_urls),
+    }
+    build_prefix = os.path.join(testing_workdir, "build")
+    host_prefix = os.path.join(testing_workdir, "host")
+    build_precs = environ.get_package_records(build_prefix, ["zlib"], "build", **kwargs)
+    host_precs = environ.get_package_records(host_prefix, ["python"], "host", **kwargs)
+
+    environ.create_envs(
+        [
+            ("host", host_prefix, host_precs, testing_config.host_subdir),
+            ("build", build_prefix, build_precs, testing_config.host_subdir),
+        ],
+        config=testing_config,
+    )
+
+    # created together, not one at a time
+    assert not create_env.called
+    for prefix, precs in ((build_prefix, build_precs), (host_prefix, host_precs)):
+        for prec in precs:
+            assert os.path.isfile(
+                os.path.join(
+                    prefix,
+                    "conda-meta",
+                    f"{prec.name}-{prec.version}-{prec.build}.json",
+                )
+            )
+
+
+def test_create_envs_falls_back_to_create_env(testing_config, mocker):
+    mocker.patch.object(
+        environ, "_execute_actions_together", side_effect=OSError("conda failed")
+    )
+    mocker.patch.object(environ, "_display_actions")
+    create_env = mocker.patch.object(environ, "create_env")
+    envs = [
+        ("host", "host_prefix", ["host_prec"], "linux-64"),
+        ("build", "build_prefix", ["build_prec"], "linux-64"),
+    ]
+
+    environ.create_envs(envs, config=testing_config)
+
+    assert [call.args[0] for call in create_env.call_args_list] == [
+        "host_prefix",
+        "build_prefix",
+    ]
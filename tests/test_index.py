@@ -2,14 +2,26 @@
 # SPDX-License-Identifier: BSD-3-Clause
 from __future__ import annotations
 
+import json
+import shutil
 from typing import TYPE_CHECKING
 
 import pytest
 from conda.base.context import context
+from conda.models.records import PackageRecord
 
-from conda_build.index import get_build_index
+from conda_build.index import (
+    LocalChannelIndex,
+    _delegated_update_index,
+    get_build_index,
+    get_index_records,
+)
+
+from .utils import tests_path
 
 if TYPE_CHECKING:
+    from pathlib import Path
+
     from conda_build.metadata import MetaData
 
 
@@ -23,3 +35,69 @@ def test_get_build_index(testing_metadata: MetaData) -> None:
         omit_defaults=True,
         channel_urls=["local", "conda-forge", "defaults"],
     )
+
+
+def test_local_channel_index(tmp_path: Path) -> None:
+    channel = tmp_path / "channel"
+    (channel / "osx-64").mkdir(parents=True)
+    (channel / "noarch").mkdir()
+    _delegated_update_index(channel, threads=1)
+
+    package = channel / "osx-64" / "revoke_test-1.0-0.tar.bz2"
+    shutil.copy(tests_path / "index_hotfix_pkgs" / "osx-64" / package.name, package)
+
+    local_index = LocalChannelIndex()
+    local_index.add(package)
+    assert local_index.has_pending(channel)
+    local_index.flush(channel)
+    assert not local_index.has_pending(channel)
+
+    repodata = json.loads((channel / "osx-64" / "repodata.json").read_text())
+    record = repodata["packages"][package.name]
+    assert record["name"] == "revoke_test"
+    assert record["size"] == package.stat().st_size
+    assert len(record["sha256"]) == 64
+    # current_repodata.json is rebuilt from the new repodata
+    current_repodata = json.loads(
+        (channel / "osx-64" / "current_repodata.json").read_text()
+    )
+    assert package.name in current_repodata["packages"]
+
+    # conda-index brings channeldata.json up to date at the end
+    channeldata = channel / "channeldata.json"
+    assert "revoke_test" not in json.loads(channeldata.read_text())["packages"]
+    local_index.finalize()
+    assert "revoke_test" in json.loads(channeldata.read_text())["packages"]
+
+    # removed packages are dropped from the index again
+    package.unlink()
+    local_index.add(package)
+    local_index.flush()
+    repodata = json.loads((channel / "osx-64" / "repodata.json").read_text())
+    assert package.name not in repodata["packages"]
+
+
+def test_get_index_records() -> None:
+    def record(version: str, channel: str) -> PackageRecord:
+        return PackageRecord(
+            name="foo",
+            version=version,
+            build="0",
+            build_number=0,
+            channel=channel,
+            subdir="noarch",
+            fn=f"foo-{version}-0.conda",
+        )
+
+    index = [record("1.0", "local"), record("2.0", "local"), record("1.0", "defaults")]
+    records = get_index_records(index)
+    assert get_index_records(index) is records
+
+    # the first, highest priority, record wins
+    assert records.get("foo", "1.0", "0") is index[0]
+    assert records.get("foo", "2.0", "0") is index[1]
+    assert records.get("foo", "3.0", "0") is None
+    assert records.get_by_fn("foo-2.0-0.conda") is index[1]
+
+    # a new index gets new lookup tables
+    assert get_index_records(index[1:]).get("foo", "1.0", "0") is index[2]
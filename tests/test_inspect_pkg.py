@@ -10,6 +10,7 @@ from uuid import uuid4
 import pytest
 from conda.core.prefix_data import PrefixData
 
+from conda_build import inspect_pkg
 from conda_build.exceptions import CondaBuildUserError
 from conda_build.inspect_pkg import inspect_linkages, inspect_objects, which_package
 from conda_build.utils import on_mac, on_win
@@ -295,3 +296,41 @@ def test_inspect_linkages_not_installed():
 def test_inspect_objects_not_on_mac():
     with pytest.raises(CondaBuildUserError):
         inspect_objects([])
+
+
+def test_which_package_ownership_index(tmp_path: Path):
+    (tmp_path / "conda-meta").mkdir()
+    (tmp_path / "conda-meta" / "history").touch()
+
+    def add_package(name: str, files: list[str]) -> None:
+        (tmp_path / "conda-meta" / f"{name}-1-0.json").write_text(
+            json.dumps(
+                {
+                    "build": "0",
+                    "build_number": 0,
+                    "channel": f"{name}-channel",
+                    "files": files,
+                    "name": name,
+                    "version": "1",
+                }
+            )
+        )
+
+    add_package("packageA", ["lib/a", "lib/shared"])
+    PrefixData._cache_.clear()
+
+    assert [prec.name for prec in which_package(tmp_path / "lib/a", tmp_path)] == [
+        "packageA"
+    ]
+    index = inspect_pkg._get_ownership_index(tmp_path)
+    # built once and shared by every lookup
+    assert inspect_pkg._get_ownership_index(tmp_path) is index
+
+    # rebuilt when the prefix's packages change
+    add_package("packageB", ["lib/b", "lib/shared"])
+    PrefixData._cache_.clear()
+    assert inspect_pkg._get_ownership_index(tmp_path) is not index
+    assert {prec.name for prec in which_package("lib/shared", tmp_path)} == {
+        "packageA",
+        "packageB",
+    }
@@ -4,6 +4,7 @@ from __future__ import annotations
 
 from typing import TYPE_CHECKING
 
+import jinja2
 import pytest
 from frozendict import deepfreeze
 
@@ -169,3 +170,42 @@ def test_load_file_data(
         jinja_context.load_file_data(str(path), fmt, config=testing_metadata.config)
         == expected
     )
+
+
+def test_get_environment(testing_config, tmp_path: Path, mocker):
+    (tmp_path / "meta.yaml").write_text(
+        "{{ name }}  # [linux]\n{{ name }}-win  # [win]\n"
+    )
+    compile = mocker.spy(jinja2.Environment, "compile")
+
+    first_env = jinja_context.get_environment(
+        str(tmp_path), None, jinja2.StrictUndefined, testing_config, {"name": "one"}
+    )
+    second_env = jinja_context.get_environment(
+        str(tmp_path), None, jinja2.StrictUndefined, testing_config, {"name": "two"}
+    )
+    assert first_env is not second_env
+    assert first_env.linked_to is second_env.linked_to
+
+    # interleaved renders each see their own globals
+    first_template = first_env.get_or_select_template("meta.yaml")
+    second = second_env.get_or_select_template("meta.yaml").render()
+    first = first_template.render()
+
+    assert first.replace("one", "two") == second
+    assert "name" not in first_env.linked_to.globals
+    # the filtered template was compiled once
+    assert compile.call_count == 1
+
+
+def test_compiled_template_cache_bounded(mocker):
+    mocker.patch.object(jinja_context.CompiledTemplateCache, "max_entries", 2)
+    cache = jinja_context.CompiledTemplateCache()
+    env = jinja2.Environment()
+
+    assert cache.from_string(env, "{{ 1 }}").render() == "1"
+    cache.from_string(env, "{{ 2 }}")
+    cache.from_string(env, "{{ 1 }}")  # most recently used again
+    cache.from_string(env, "{{ 3 }}")
+    assert len(cache._code) == 2
+    assert ("<string>", cache.get_source_checksum("{{ 1 }}")) in cache._code
@@ -484,6 +484,44 @@ def test_config_member_decoupling(testing_metadata):
     assert b.config.some_member != testing_metadata.config.some_member
 
 
+def test_meta_copy_decoupling(testing_metadata):
+    testing_metadata.meta.setdefault("requirements", {})["build"] = ["python"]
+    testing_metadata.config.variants = [{"python": ["3.12"]}]
+    b = testing_metadata.copy()
+    assert b.meta["requirements"] is not testing_metadata.meta["requirements"]
+
+    b.meta["requirements"]["build"].append("numpy")
+    b.config.variants[0]["python"].append("3.13")
+    assert testing_metadata.meta["requirements"]["build"] == ["python"]
+    assert testing_metadata.config.variants == [{"python": ["3.12"]}]
+    assert b.meta["requirements"]["build"] == ["python", "numpy"]
+
+
+def test_meta_copy_output_dicts(testing_config, tmp_path):
+    (tmp_path / "meta.yaml").write_text(
+        textwrap.dedent(
+            """
+            package:
+              name: a
+              version: 1.0
+            requirements:
+              run:
+                - python
+            outputs:
+              - name: a
+              - name: b
+            """
+        )
+    )
+    metadata = MetaData(str(tmp_path), config=testing_config).copy()
+    get_output_dicts_from_metadata(metadata)
+    # the outputs are updated in place, for the copy only
+    output = metadata.meta["outputs"][0]
+    assert output["requirements"]["run"] == ["python"]
+    assert metadata.meta["requirements"] is output["requirements"]
+    assert metadata.copy().meta["outputs"][0]["requirements"]["run"] == ["python"]
+
+
 # ensure that numbers are not interpreted as ints or floats, doing so trips up versions
 # with trailing zeros
 def test_yamlize_zero():
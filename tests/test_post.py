@@ -5,6 +5,7 @@ import logging
 import os
 import shutil
 import sys
+from fnmatch import fnmatch
 from pathlib import Path
 
 import pytest
@@ -22,11 +23,8 @@ from conda_build.utils import (
 from .utils import add_mangling, metadata_dir, subpackage_path
 
 
-@pytest.mark.skipif(
-    sys.version_info >= (3, 10),
-    reason="Python 3.10+, py_compile terminates once it finds an invalid file",
-)
-def test_compile_missing_pyc(testing_workdir):
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_compile_missing_pyc(testing_workdir, max_workers: int):
     good_files = ["f1.py", "f3.py"]
     bad_file = "f2_bad.py"
     tmp = os.path.join(testing_workdir, "tmp")
@@ -36,7 +34,10 @@ def test_compile_missing_pyc(testing_workdir):
         ),
         tmp,
     )
-    post.compile_missing_pyc(os.listdir(tmp), cwd=tmp, python_exe=sys.executable)
+    # an invalid file does not stop the others from being compiled
+    post.compile_missing_pyc(
+        os.listdir(tmp), cwd=tmp, python_exe=sys.executable, max_workers=max_workers
+    )
     for f in good_files:
         assert os.path.isfile(os.path.join(tmp, add_mangling(f)))
     assert not os.path.isfile(os.path.join(tmp, add_mangling(bad_file)))
@@ -220,3 +221,68 @@ def test_rpath_symlink(mocker, testing_config):
     )
     # Should only be called on the actual binary, not its symlinks. (once per variant)
     assert mk_relative.call_count == 2
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "lib/libz.so",
+        "lib/libz.so.1.3",
+        "lib/libz.dylib",
+        "lib/libz.1.dylib",
+        "lib/z.dll",
+        "Library/bin/Z.DLL",
+        "lib/libz.a",
+        "Library/lib/z.lib",
+        "lib/libz.so.a",
+        "lib/python3.12/site-packages/zlib.py",
+        "lib/libz.la",
+        "share/z.solution/README",
+    ],
+)
+def test_library_patterns(path: str):
+    assert post._library_patterns(path) == (
+        any(fnmatch(path, pattern) for pattern in ("*.so*", "*.dylib*", "*.dll")),
+        any(fnmatch(path, pattern) for pattern in ("*.a", "*.lib")),
+    )
+
+
+@pytest.mark.parametrize("jobs", [2, 64])
+def test_map_parse_jobs(jobs: int):
+    # results are in order, whether they are computed in a process pool or not
+    values = list(range(-jobs, 0))
+    assert post._map_parse_jobs(abs, values, max_workers=4) == list(map(abs, values))
+
+
+def test_mk_relative_linux(mocker, tmp_path: Path):
+    call = mocker.patch("conda_build.post.call")
+    check_output = mocker.patch(
+        "conda_build.post.check_output", return_value=b"/elsewhere/lib\n"
+    )
+    prefix = str(tmp_path)
+    existing = [f"{prefix}/lib", "$ORIGIN/../foo", "/usr/lib"]
+
+    # rpaths which were already read are rewritten with a single patchelf call
+    post.mk_relative_linux(
+        "lib/python/foo.so", prefix, existing=existing, patchelf="patchelf"
+    )
+    check_output.assert_not_called()
+    call.assert_called_once_with(
+        [
+            "patchelf",
+            "--force-rpath",
+            "--set-rpath",
+            "$ORIGIN/..:$ORIGIN/../foo",
+            os.path.join(prefix, "lib/python/foo.so"),
+        ]
+    )
+
+    # patchelf only reads them again to cross-check
+    post.mk_relative_linux(
+        "lib/python/foo.so",
+        prefix,
+        existing=existing,
+        patchelf="patchelf",
+        cross_check=True,
+    )
+    check_output.assert_called_once()
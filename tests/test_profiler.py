@@ -0,0 +1,66 @@
+# Copyright (C) 2014 Anaconda, Inc
+# SPDX-License-Identifier: BSD-3-Clause
+from __future__ import annotations
+
+import json
+from typing import TYPE_CHECKING
+
+from conda_build.profiler import Profiler, metadata_args, profiler
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from pytest import MonkeyPatch
+    from pytest_mock import MockerFixture
+
+    from conda_build.metadata import MetaData
+
+
+def test_profiler_disabled():
+    profiler = Profiler()
+    with profiler.span("render"):
+        pass
+    assert profiler.spans == []
+
+
+def test_profiler_chrome_trace(tmp_path: Path):
+    profiler = Profiler()
+    profiler.enable()
+
+    @profiler.span("solve", "environment")
+    def solve():
+        pass
+
+    with profiler.span("build", "output", output="pkg", variant="python_3.12"):
+        solve()
+        solve()
+
+    assert [span.name for span in profiler.spans] == ["solve", "solve", "build"]
+    assert profiler.summary()["solve"]["count"] == 2
+
+    trace_file = tmp_path / "trace.json"
+    profiler.write_chrome_trace(trace_file)
+    events = [
+        event
+        for event in json.loads(trace_file.read_text())["traceEvents"]
+        if event["ph"] == "X"
+    ]
+    # sorted by start, the outer span first
+    assert [event["name"] for event in events] == ["build", "solve", "solve"]
+    build, solve, _ = events
+    assert build["args"]["output"] == "pkg"
+    assert build["args"]["rss_high_water_mark"] > 0
+    assert build["ts"] <= solve["ts"]
+    assert solve["ts"] + solve["dur"] <= build["ts"] + build["dur"]
+
+
+def test_metadata_args(
+    testing_metadata: MetaData, monkeypatch: MonkeyPatch, mocker: MockerFixture
+):
+    get_used_loop_vars = mocker.spy(testing_metadata, "get_used_loop_vars")
+    monkeypatch.setattr(profiler, "enabled", False)
+    assert metadata_args(testing_metadata) == {}
+    assert not get_used_loop_vars.called
+
+    monkeypatch.setattr(profiler, "enabled", True)
+    assert metadata_args(testing_metadata)["output"] == testing_metadata.name()
@@ -9,22 +9,26 @@ from typing import TYPE_CHECKING
 from uuid import uuid4
 
 import pytest
+from conda.models.records import PackageRecord
 
 from conda_build.api import get_output_file_paths
 from conda_build.render import (
     _simplify_to_exact_constraints,
     find_pkg_dir_or_file_in_pkgs_dirs,
     get_pin_from_build,
+    get_run_exports,
     open_recipe,
     render_recipe,
 )
 from conda_build.utils import CONDA_PACKAGE_EXTENSION_V1, on_linux
 
-from .utils import metadata_path
+from .utils import metadata_path, variants_path
 
 if TYPE_CHECKING:
     from pathlib import Path
 
+    from pytest_mock import MockerFixture
+
     from conda_build.config import Config
     from conda_build.metadata import MetaData
 
@@ -148,3 +152,61 @@ def test_render_recipe(testing_config: Config) -> None:
         assert len(recipes) == 48
     else:
         assert len(recipes) == 16
+
+
+def test_render_workers(testing_config: Config) -> None:
+    recipe = variants_path / "01_basic_templating"
+    serial = render_recipe(
+        recipe, config=testing_config, permit_unsatisfiable_variants=True
+    )
+
+    testing_config.render_workers = 2
+    parallel = render_recipe(
+        recipe, config=testing_config, permit_unsatisfiable_variants=True
+    )
+    assert len(parallel) == 2
+    assert [m.dist() for m, _, _ in parallel] == [m.dist() for m, _, _ in serial]
+    assert [m.config.variant["something"] for m, _, _ in parallel] == [
+        m.config.variant["something"] for m, _, _ in serial
+    ]
+
+
+def test_get_run_exports(
+    testing_metadata: MetaData, tmp_path: Path, mocker: MockerFixture
+) -> None:
+    testing_metadata.config.croot = tmp_path
+    url = "https://conda.anaconda.org/conda-forge/linux-64/foo-1.0-0.conda"
+    prec = PackageRecord(
+        name="foo",
+        version="1.0",
+        build="0",
+        build_number=0,
+        channel="conda-forge",
+        subdir="linux-64",
+        fn="foo-1.0-0.conda",
+        url=url,
+        sha256="0" * 64,
+    )
+    run_exports = {"weak": ["foo >=1.0,<2"]}
+    mocker.patch(
+        "conda_build.render.find_pkg_dir_or_file_in_pkgs_dirs", return_value=None
+    )
+    download_run_exports = mocker.patch(
+        "conda_build.utils.download_run_exports",
+        return_value={"packages.conda": {prec.fn: {"run_exports": run_exports}}},
+    )
+    stream_run_exports = mocker.patch("conda_build.render._stream_run_exports")
+    execute_download_actions = mocker.patch(
+        "conda_build.render.execute_download_actions"
+    )
+
+    # from the channel's run_exports.json, without downloading the package
+    assert get_run_exports(testing_metadata, prec, [prec], "host") == run_exports
+    download_run_exports.assert_called_once_with(url.rsplit("/", 1)[0])
+
+    # then from the cache in croot
+    download_run_exports.reset_mock()
+    assert get_run_exports(testing_metadata, prec, [prec], "host") == run_exports
+    download_run_exports.assert_not_called()
+    stream_run_exports.assert_not_called()
+    execute_download_actions.assert_not_called()
@@ -1,6 +1,7 @@
 # Copyright (C) 2014 Anaconda, Inc
 # SPDX-License-Identifier: BSD-3-Clause
 import os
+import shutil
 import subprocess
 import tarfile
 
@@ -209,3 +210,52 @@ def test_empty_archive(tmp_path, testing_metadata):
 
     # Just make sure that it doesn't fail
     source.provide(testing_metadata)
+
+
+def test_overlapping_sources(testing_metadata):
+    archive = os.path.join(thisdir, "archives", "a.tar.bz2")
+    sources = [
+        {"folder": "f1", "url": archive},
+        {"folder": "f2", "git_url": "https://example.com/repo.git"},
+        {"folder": "f1/sub", "url": archive},
+        {"folder": "f3", "git_url": "https://example.com/repo.git"},
+        {"folder": "f4", "url": archive},
+    ]
+    assert source._overlapping_sources(testing_metadata, sources) == [
+        [0, 2],
+        [1, 3],
+        [4],
+    ]
+    # a source without a folder overlays all others
+    assert source._overlapping_sources(testing_metadata, [*sources, {}]) == [
+        [0, 1, 2, 3, 4, 5]
+    ]
+
+
+def test_download_hash_mismatch(testing_metadata):
+    testing_metadata.meta["source"] = [
+        {"folder": "f1", "url": os.path.join(thisdir, "archives", "a.tar.bz2")},
+        {
+            "folder": "f2",
+            "url": os.path.join(thisdir, "archives", "b.tar.bz2"),
+            "sha256": "0" * 64,
+        },
+    ]
+    with pytest.raises(RuntimeError, match="mismatch"):
+        source.provide(testing_metadata)
+
+
+def test_downloads_with_same_name(tmp_path, testing_metadata):
+    # unhashed sources of the same name share a cache path while they are downloaded
+    sources = []
+    for name in ("a", "b"):
+        archive = tmp_path / name / "v1.0.tar.bz2"
+        archive.parent.mkdir()
+        shutil.copy(os.path.join(thisdir, "archives", f"{name}.tar.bz2"), archive)
+        sources.append({"folder": name, "url": str(archive)})
+    testing_metadata.meta["source"] = sources
+    source.provide(testing_metadata)
+    for name in ("a", "b"):
+        assert os.listdir(os.path.join(testing_metadata.config.work_dir, name)) == [
+            name
+        ]
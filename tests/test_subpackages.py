@@ -129,6 +129,15 @@ def test_intradependencies(testing_config):
     )
 
 
+def test_intradependencies_package_workers(testing_config):
+    recipe = os.path.join(subpackage_dir, "_intradependencies")
+    outputs1 = api.get_output_file_paths(recipe, config=testing_config)
+    testing_config.package_workers = 2
+    outputs2 = api.build(recipe, config=testing_config)
+    assert sorted(outputs1) == sorted(outputs2)
+    assert all(os.path.isfile(output) for output in outputs2)
+
+
 def test_git_in_output_version(testing_config, conda_build_test_recipe_envvar: str):
     recipe = os.path.join(subpackage_dir, "_git_in_output_version")
     metadata_tuples = api.render(
@@ -479,3 +479,71 @@ def test_prefix_files(tmp_path: Path):
 
     paths = {str(path.relative_to(prefix)) for path in (file1, file2, file3, link1)}
     assert paths == utils.prefix_files(str(prefix))
+
+
+def test_file_hash_cache(tmp_path: Path, monkeypatch: MonkeyPatch):
+    (cache_dir := tmp_path / "cache").mkdir()
+    (file1 := tmp_path / "file1").write_text("one")
+    (file2 := tmp_path / "file2").write_text("two")
+    (link := tmp_path / "link").symlink_to(tmp_path / "nowhere")
+    paths = [str(file1), str(file2), str(link)]
+
+    expected = {path: utils.sha256_checksum(path) for path in paths}
+    cache = utils.FileHashCache(cache_dir)
+    assert cache.sha256_checksums(paths) == expected
+    cache.save()
+
+    # unchanged files are served from the database without being read
+    def sha256_checksum(path, *args, **kwargs):
+        assert path == str(file2), "unchanged file was re-hashed"
+        return "changed"
+
+    monkeypatch.setattr(utils, "sha256_checksum", sha256_checksum)
+    file2.write_text("changed contents")
+    cache = utils.FileHashCache(cache_dir)
+    assert cache.sha256_checksum(file1) == expected[str(file1)]
+    assert cache.sha256_checksum(file2) == "changed"
+    cache.save()
+
+    # only new entries are written, the oldest are dropped beyond max_entries
+    monkeypatch.setattr(utils, "sha256_checksum", lambda path, *args, **kwargs: "new")
+    monkeypatch.setattr(utils.FileHashCache, "max_entries", 2)
+    (file3 := tmp_path / "file3").write_text("three")
+    cache = utils.FileHashCache(cache_dir)
+    assert cache.sha256_checksums([file1, file3]) == {
+        str(file1): expected[str(file1)],
+        str(file3): "new",
+    }
+    assert list(cache._new_entries) == [cache.key(file3.stat())]
+    cache.save()
+
+    cache = utils.FileHashCache(cache_dir)
+    assert cache.sha256_checksums([file2, file3]) == {
+        str(file2): "changed",
+        str(file3): "new",
+    }
+    assert cache.sha256_checksum(file1) == "new"
+
+
+def test_prefix_snapshot(tmp_path: Path):
+    (prefix := tmp_path / "prefix").mkdir()
+    (prefix / "file1").touch()
+    (dirA := prefix / "dirA").mkdir()
+    (dirA / "file2").touch()
+    (prefix / "linkA").symlink_to(dirA)
+
+    snapshot = utils.PrefixSnapshot(prefix)
+    assert snapshot.files == utils.prefix_files(prefix)
+    before = snapshot.copy()
+
+    # unchanged directories are not re-scanned, changed ones are
+    (dirA / "file3").touch()
+    (dirB := prefix / "dirB").mkdir()
+    (dirB / "file4").touch()
+    (prefix / "file1").unlink()
+    assert snapshot.refresh().files == utils.prefix_files(prefix)
+    assert snapshot - before == {
+        os.path.join("dirA", "file3"),
+        os.path.join("dirB", "file4"),
+    }
+    assert before - snapshot == {"file1"}
@@ -807,6 +807,21 @@ def test_zip_key_filtering(
     assert filter_combined_spec_to_used_keys(combined_spec, specs=specs) == expected
 
 
+def test_filter_before_exploding():
+    # exploding all of these before filtering would create 10**12 variants
+    combined_spec = {f"pkg_{i}": [str(v) for v in range(10)] for i in range(12)}
+    specs = {
+        "internal_defaults": {},
+        "config": combined_spec,
+        "recipe": {f"pkg_{i}": ["1", "2"] if i == 0 else ["3"] for i in range(12)},
+    }
+
+    variants = filter_combined_spec_to_used_keys(combined_spec, specs=specs)
+
+    assert [variant["pkg_0"] for variant in variants] == ["1", "2"]
+    assert all(variant["pkg_11"] == "3" for variant in variants)
+
+
 def test_get_vars():
     variants = [
         {
@@ -893,6 +908,33 @@ def test_find_used_variables_in_text(vars, text, found_vars):
     assert find_used_variables_in_text(vars, text) == found_vars
 
 
+@pytest.mark.parametrize(
+    "text,selectors_only,found_vars",
+    [
+        ("  - zlib  # [xz]", True, {"xz"}),
+        ("  - zlib  # [not xz]", False, {"zlib"}),
+        ("  - a-b", False, {"a_b"}),
+        ("  - a-b >=1", False, set()),
+        ("{% for x in zlib %}", False, {"zlib"}),
+        ("{% if xz %}", False, {"xz"}),
+        ("{{ compiler('c') }}", False, {"c_compiler", "CONDA_BUILD_SYSROOT"}),
+        ("{{ stdlib('c') }}", False, {"c_stdlib", "CONDA_BUILD_SYSROOT"}),
+        ("{{ cdt('libx11') }}", False, {"cdt_name"}),
+    ],
+)
+def test_find_used_variables_in_text_kinds(text, selectors_only, found_vars):
+    variant_keys = (
+        "a_b",
+        "c_compiler",
+        "c_stdlib",
+        "cdt_name",
+        "CONDA_BUILD_SYSROOT",
+        "xz",
+        "zlib",
+    )
+    assert find_used_variables_in_text(variant_keys, text, selectors_only) == found_vars
+
+
 def test_find_used_variables_in_shell_script(tmp_path: Path) -> None:
     variants = ("FOO", "BAR", "BAZ", "QUX")
     (script := tmp_path / "script.sh").write_text(